@@ -0,0 +1,81 @@
+"""Время сохранения и размер PPTX для каждого пресета сжатия.
+
+Колода из слайдов с текстом и фотографиями (JPEG) и скриншотами (PNG)
+собирается один раз, затем сохраняется с каждым пресетом.
+
+Запуск::
+
+    python benchmarks/bench_compression.py [количество_слайдов]
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from PIL import Image
+from pptx import Presentation
+
+from md2pptx.builder import ImagePartIndex, _add_slide
+from md2pptx.models import ImageRecord, SlideRecord, TextRecord
+from md2pptx.package import COMPRESSION_PRESETS, save_package
+from md2pptx.templates import LayoutIndex
+
+
+def make_images(directory: Path, count: int) -> list:
+    rng = random.Random(0)
+    paths = []
+    for n in range(count):
+        image = Image.effect_noise((800, 600), 40 + n).convert("RGB")
+        if n % 2:
+            path = directory / f"photo{n}.jpg"
+            image.save(path, quality=85)
+        else:
+            image = image.quantize(16).convert("RGB")
+            path = directory / f"shot{n}.png"
+            image.save(path)
+        paths.append(str(path))
+    rng.shuffle(paths)
+    return paths
+
+
+def build(count: int, images: list):
+    prs = Presentation()
+    layouts, index = LayoutIndex(prs), ImagePartIndex(prs.part.package)
+    for n in range(count):
+        slide = SlideRecord(
+            title=f"Слайд {n + 1}",
+            blocks=[
+                TextRecord(text="", bullets=[f"Пункт {k} слайда {n}" for k in range(5)]),
+                TextRecord(text="Параграф с текстом " * 10),
+                ImageRecord(src=images[n % len(images)], alt=""),
+            ],
+            notes=f"Заметки {n}",
+        )
+        _add_slide(prs, slide, n, index, layouts)
+    return prs
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        prs = build(count, make_images(Path(tmp), 20))
+        for name in COMPRESSION_PRESETS:
+            best, size = float("inf"), 0
+            for _ in range(3):
+                buffer = BytesIO()
+                start = time.perf_counter()
+                save_package(prs, buffer, name)
+                best = min(best, time.perf_counter() - start)
+                size = len(buffer.getvalue())
+            print(f"{name:>8}: {best * 1000:8.1f} ms, {size / 1024 / 1024:7.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Стоимость создания 10 000 блоков: модели pydantic против компактных записей.
+
+Запуск::
+
+    python benchmarks/bench_models.py [количество_блоков]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx.models import TextBlock, TextRecord
+
+
+def construct(cls, count: int) -> list:
+    return [cls(text=f"Параграф {n}", bullets=["a", "b"]) for n in range(count)]
+
+
+def bench_time(cls, count: int, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        construct(cls, count)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_memory(cls, count: int) -> int:
+    tracemalloc.start()
+    blocks = construct(cls, count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del blocks
+    return size
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    results = {}
+    for cls in (TextBlock, TextRecord):
+        results[cls] = (bench_time(cls, count), bench_memory(cls, count))
+        seconds, size = results[cls]
+        print(f"{cls.__name__:>10}: {seconds * 1000:7.2f} ms, {size / 1024:8.0f} KiB на {count} блоков")
+
+    (model_time, model_size), (record_time, record_size) = results[TextBlock], results[TextRecord]
+    print(f"создание быстрее в {model_time / record_time:.2f}x, память меньше в {model_size / record_size:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Сравнение скорости движков парсера: ``tree`` против ``html``.
+
+Запуск::
+
+    python benchmarks/bench_parser.py [количество_слайдов]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx.parser import ENGINES, parse_markdown
+
+SLIDE = """# Слайд {n}: Заголовок
+
+Вводный параграф с *курсивом*, **жирным** и `кодом`.
+
+- Первый пункт
+- Второй пункт с [ссылкой](https://example.com)
+- Третий пункт
+
+Заключительный параграф слайда {n}.
+"""
+
+
+def make_deck(count: int) -> str:
+    return "\n---\n".join(SLIDE.format(n=n) for n in range(count))
+
+
+def bench(text: str, engine: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_markdown(text, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    text = make_deck(count)
+    assert parse_markdown(text, engine="tree") == parse_markdown(text, engine="html")
+
+    results = {engine: bench(text, engine) for engine in ENGINES}
+    for engine, seconds in results.items():
+        print(f"{engine:>5}: {seconds * 1000:8.1f} ms  ({count / seconds:8.0f} слайдов/с)")
+    print(f"ускорение tree/html: {results['html'] / results['tree']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,35 @@ __version__ = "1.0.0"
 __author__ = "Your Name"
 __email__ = "your.email@example.com"
 
-from .parser import parse_markdown
+from .parser import parse_markdown, iter_slides
 from .builder import build_presentation
-from .fetcher import fetch_markdown
-from .models import SlideModel, TextBlock, ImageBlock
+from .fetcher import fetch_markdown, fetch_markdown_async, fetch_many, fetch_many_async, iter_markdown
+from .includes import IncludeResolver, resolve_includes
+from .models import SlideModel, TextBlock, ImageBlock, DiagramBlock
+from .templates import TemplatePool
+from .pipeline import convert, convert_markdown
 
 # Экспортируем версию для внешнего доступа
 version = __version__
 
 __all__ = [
     "parse_markdown",
+    "iter_slides",
     "build_presentation", 
     "fetch_markdown",
+    "fetch_markdown_async",
+    "fetch_many",
+    "fetch_many_async",
+    "iter_markdown",
+    "IncludeResolver",
+    "resolve_includes",
     "SlideModel",
     "TextBlock",
     "ImageBlock",
+    "DiagramBlock",
+    "TemplatePool",
+    "convert",
+    "convert_markdown",
     "__version__",
     "version",
 ]
\ No newline at end of file
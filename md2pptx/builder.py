@@ -1,38 +1,452 @@
 from __future__ import annotations
 
+import hashlib
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from typing import List, Optional
+from typing import IO, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 from pptx import Presentation
-from pptx.util import Inches
+from pptx.enum.dml import MSO_LINE
+from pptx.enum.shapes import MSO_CONNECTOR, MSO_SHAPE
+from pptx.enum.text import PP_ALIGN
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.util import Inches, Pt
 
-from .models import SlideModel, TextBlock, ImageBlock
+from .compat import (
+    PPTX_INTERNALS,
+    Image,
+    ImagePart,
+    add_arrowhead,
+    add_picture_part,
+    connect_to_site,
+    native_size,
+    set_sha1,
+)
+from .diagrams import MERMAID, DiagramError, layout_flowchart, parse_flowchart
+from .images import fit_size, probe_image
+from .models import Slide, is_diagram, is_image, is_text
+from .package import DEFAULT_COMPRESSION, StreamingPackageWriter, merge_packages, save_package
+from .templates import LayoutIndex, TemplatePool
 
+# Минимум слайдов на шард: меньшие колоды быстрее собрать в одном процессе
+SHARD_MIN_SLIDES = 64
 
-def build_presentation(slides: List[SlideModel], out_file: Path, template: Optional[str] = None) -> None:
+# Оформление блок-схем, нарисованных фигурами PPTX
+FLOW_FONT_SIZE = Pt(12)
+FLOW_LABEL_FONT_SIZE = Pt(10)
+FLOW_LABEL_SIZE = (Inches(1.2), Inches(0.3))
+FLOW_THICK_LINE = Pt(2.25)
+_FLOW_SHAPES = {
+    "rect": MSO_SHAPE.RECTANGLE,
+    "round": MSO_SHAPE.ROUNDED_RECTANGLE,
+    "stadium": MSO_SHAPE.FLOWCHART_TERMINATOR,
+    "circle": MSO_SHAPE.OVAL,
+    "diamond": MSO_SHAPE.DIAMOND,
+}
+# Номера точек соединения сторон фигуры; у эллипса их восемь, а не четыре
+_CXN_SITES = {"top": 0, "left": 1, "bottom": 2, "right": 3}
+_OVAL_CXN_SITES = {"top": 0, "left": 2, "bottom": 4, "right": 6}
+# Область картинок и блок-схем, если размер плейсхолдера тела неизвестен
+DEFAULT_BODY_BOX = (Inches(1), Inches(2), Inches(8), Inches(5))
+
+# Раскладка картинок и блок-схем на слайде: примерная высота строки
+# текста тела, наибольшая доля области тела под текст и зазор между ячейками
+TEXT_LINE_HEIGHT = Pt(40)
+MAX_TEXT_SHARE = 0.5
+PICTURE_GAP = Inches(0.2)
+
+
+def slide_size(template: Optional[str] = None) -> Tuple[int, int]:
+    """Размер слайда шаблона (ширина, высота) в EMU"""
     prs = Presentation(template) if template else Presentation()
-    for idx, slide in enumerate(slides):
-        layout = prs.slide_layouts[0] if idx == 0 else prs.slide_layouts[1]
-        pptx_slide = prs.slides.add_slide(layout)
-        if slide.title:
-            title_placeholder = pptx_slide.shapes.title
-            title_placeholder.text = slide.title
-        body = pptx_slide.placeholders[1] if len(pptx_slide.placeholders) > 1 else None
-        if body:
-            tf = body.text_frame
-            for block in slide.blocks:
-                if isinstance(block, TextBlock):
-                    if block.bullets:
-                        for bullet in block.bullets:
-                            p = tf.add_paragraph()
-                            p.text = bullet
-                            p.level = 0
-                    else:
+    return prs.slide_width, prs.slide_height
+
+
+class ImagePartIndex:
+    """Индекс изображений пакета для дедупликации без повторного чтения файлов.
+
+    python-pptx для каждой картинки перечитывает и хэширует файл, а затем
+    ищет такую же часть перебором всех частей пакета. Здесь каждый путь
+    читается и хэшируется один раз (путь -> sha1), часть изображения
+    находится по хэшу за O(1), а имена новых частей выдаются счетчиком.
+    Размер изображения читается из заголовков файла один раз на хэш.
+    """
+    
+    def __init__(self, package) -> None:
+        self._package = package
+        self._sha1_by_path: Dict[str, str] = {}
+        self._parts: Dict[str, ImagePart] = {}
+        self._native_sizes: Dict[str, Tuple[int, int]] = {}
+        self._next_idx = 1
+        if not PPTX_INTERNALS:
+            # Без закрытых API картинки добавляет shapes.add_picture, индекс не нужен
+            return
+        for part in package.iter_parts():
+            if isinstance(part, ImagePart):
+                self._parts.setdefault(part.sha1, part)
+            if part.partname.startswith("/ppt/media/image") and part.partname.idx is not None:
+                self._next_idx = max(self._next_idx, part.partname.idx + 1)
+    
+    def get_or_add(self, src: str) -> Tuple[ImagePart, Tuple[int, int]]:
+        """Возвращает часть изображения для файла и его исходный размер в EMU"""
+        sha1 = self._sha1_by_path.get(src)
+        if sha1 is None:
+            with open(src, "rb") as f:
+                blob = f.read()
+            sha1 = hashlib.sha1(blob).hexdigest()
+            self._sha1_by_path[src] = sha1
+            if sha1 not in self._parts:
+                self._parts[sha1] = self._new_part(blob, os.path.basename(src), sha1)
+        
+        part = self._parts[sha1]
+        if sha1 not in self._native_sizes:
+            info = probe_image(part.blob)
+            self._native_sizes[sha1] = info.native_size if info else native_size(part)
+        return part, self._native_sizes[sha1]
+    
+    def _new_part(self, blob: bytes, filename: str, sha1: str) -> ImagePart:
+        image = Image.from_blob(blob, filename)
+        partname = PackURI(f"/ppt/media/image{self._next_idx}.{image.ext}")
+        self._next_idx += 1
+        part = ImagePart(partname, image.content_type, self._package, blob, filename)
+        set_sha1(part, sha1)
+        return part
+
+
+def add_picture(
+    pptx_slide,
+    images: ImagePartIndex,
+    src: str,
+    left: int,
+    top: int,
+    box: Optional[Tuple[int, int]] = None,
+):
+    """Добавляет картинку на слайд через индекс изображений (аналог shapes.add_picture).
+
+    С ``box`` (ширина, высота) картинка уменьшается с сохранением пропорций,
+    чтобы поместиться в эту область. Если закрытые API python-pptx
+    недоступны (см. ``compat``), используется ``shapes.add_picture``.
+    """
+    if not PPTX_INTERNALS:
+        info = probe_image(src)
+        width = height = None
+        if info is not None:
+            width, height = info.native_size
+            if box is not None:
+                width, height = fit_size((width, height), box)
+        return pptx_slide.shapes.add_picture(src, left, top, width, height)
+    
+    part, (width, height) = images.get_or_add(src)
+    if box is not None:
+        width, height = fit_size((width, height), box)
+    rId = pptx_slide.part.relate_to(part, RT.IMAGE)
+    return add_picture_part(pptx_slide.shapes, part, rId, left, top, width, height)
+
+
+def _side_point(box: Tuple[int, int, int, int], side: str) -> Tuple[int, int]:
+    left, top, width, height = box
+    return {
+        "top": (left + width // 2, top),
+        "left": (left, top + height // 2),
+        "bottom": (left + width // 2, top + height),
+        "right": (left + width, top + height // 2),
+    }[side]
+
+
+def _edge_sides(
+    horizontal: bool,
+    source: Tuple[int, int, int, int],
+    target: Tuple[int, int, int, int],
+) -> Tuple[str, str]:
+    """Стороны фигур, которые соединяет связь: по оси схемы, внутри слоя - поперек"""
+    if source == target:
+        return "right", "top"
+    sx, sy = source[0] + source[2] // 2, source[1] + source[3] // 2
+    tx, ty = target[0] + target[2] // 2, target[1] + target[3] // 2
+    along_x = sx != tx if horizontal else sy == ty
+    if along_x:
+        return ("right", "left") if tx > sx else ("left", "right")
+    return ("bottom", "top") if ty > sy else ("top", "bottom")
+
+
+def _set_text(text_frame, text: str, size) -> None:
+    text_frame.text = text
+    text_frame.word_wrap = True
+    for paragraph in text_frame.paragraphs:
+        paragraph.alignment = PP_ALIGN.CENTER
+        paragraph.font.size = size
+
+
+def add_flowchart(pptx_slide, code: str, box: Tuple[int, int, int, int]):
+    """Рисует блок-схему Mermaid в области ``box`` фигурами и соединителями PPTX.
+
+    Схема собирается в группу: узлы - автофигуры с текстом, связи -
+    соединители, привязанные к точкам соединения фигур (при перемещении
+    узла в PowerPoint связи следуют за ним). Ошибки синтаксиса - ``DiagramError``.
+    Без закрытых API python-pptx (``compat.PPTX_INTERNALS``) связи с
+    эллипсами не привязываются, а стрелки не рисуются.
+    """
+    chart = parse_flowchart(code)
+    boxes = layout_flowchart(chart, box)
+    group = pptx_slide.shapes.add_group_shape()
+    shapes = group.shapes
+    
+    drawn = {}
+    for node in chart.nodes.values():
+        shape = shapes.add_shape(_FLOW_SHAPES[node.shape], *boxes[node.id])
+        _set_text(shape.text_frame, node.label, FLOW_FONT_SIZE)
+        drawn[node.id] = shape
+    
+    horizontal = chart.direction in ("LR", "RL")
+    for edge in chart.edges:
+        begin_side, end_side = _edge_sides(horizontal, boxes[edge.source], boxes[edge.target])
+        begin = _side_point(boxes[edge.source], begin_side)
+        end = _side_point(boxes[edge.target], end_side)
+        connector = shapes.add_connector(MSO_CONNECTOR.STRAIGHT, *begin, *end)
+        for shape_id, side, connect, at_begin in (
+            (edge.source, begin_side, connector.begin_connect, True),
+            (edge.target, end_side, connector.end_connect, False),
+        ):
+            if chart.nodes[shape_id].shape != "circle":
+                connect(drawn[shape_id], _CXN_SITES[side])
+            elif PPTX_INTERNALS:
+                # Точки 4-7 эллипса публичный API не поддерживает;
+                # без закрытого API связь с эллипсом остается непривязанной
+                connect_to_site(connector, at_begin, drawn[shape_id], _OVAL_CXN_SITES[side])
+        if edge.style == "dotted":
+            connector.line.dash_style = MSO_LINE.DASH
+        elif edge.style == "thick":
+            connector.line.width = FLOW_THICK_LINE
+        if edge.arrow and PPTX_INTERNALS:
+            add_arrowhead(connector)
+        if edge.label:
+            width, height = FLOW_LABEL_SIZE
+            label = shapes.add_textbox(
+                (begin[0] + end[0] - width) // 2, (begin[1] + end[1] - height) // 2, width, height
+            )
+            _set_text(label.text_frame, edge.label, FLOW_LABEL_FONT_SIZE)
+    return group
+
+
+def _split_body(box: Tuple[int, int, int, int], text_lines: int) -> Tuple[int, int]:
+    """Делит высоту области тела между текстом и картинками под ним.
+
+    Возвращает (высота текста, высота картинок); текст получает не больше
+    ``MAX_TEXT_SHARE`` области, без текста все место отдается картинкам.
+    """
+    height = box[3]
+    if not text_lines:
+        return 0, height
+    text_height = min(text_lines * TEXT_LINE_HEIGHT, int(height * MAX_TEXT_SHARE))
+    return text_height, max(0, height - text_height - PICTURE_GAP)
+
+
+def _tile_box(box: Tuple[int, int, int, int], count: int) -> List[Tuple[int, int, int, int]]:
+    """Делит область на ``count`` непересекающихся ячеек сеткой, близкой к квадратной"""
+    left, top, width, height = box
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    cell_width = max(1, (width - PICTURE_GAP * (columns - 1)) // columns)
+    cell_height = max(1, (height - PICTURE_GAP * (rows - 1)) // rows)
+    return [
+        (
+            left + (n % columns) * (cell_width + PICTURE_GAP),
+            top + (n // columns) * (cell_height + PICTURE_GAP),
+            cell_width,
+            cell_height,
+        )
+        for n in range(count)
+    ]
+
+
+def _add_media(
+    pptx_slide,
+    images: ImagePartIndex,
+    blocks: List,
+    body,
+    box: Optional[Tuple[int, int, int, int]],
+) -> None:
+    """Раскладывает картинки и блок-схемы слайда сеткой под его текстом.
+
+    Каждый блок получает свою ячейку; плейсхолдер тела сжимается до высоты
+    текста, чтобы картинки и схемы его не перекрывали.
+    """
+    text_lines = sum(1 for p in body.text_frame.paragraphs if p.text)
+    left, top, width, height = box or DEFAULT_BODY_BOX
+    text_height, media_height = _split_body((left, top, width, height), text_lines)
+    if text_height and box is not None:
+        body.left, body.top, body.width, body.height = left, top, width, text_height
+    area = (left, top + height - media_height, width, media_height)
+    for block, cell in zip(blocks, _tile_box(area, len(blocks))):
+        if is_image(block):
+            cell_left, cell_top, cell_width, cell_height = cell
+            add_picture(pptx_slide, images, block.src, cell_left, cell_top, (cell_width, cell_height))
+        else:
+            add_flowchart(pptx_slide, block.code, cell)
+
+
+def _add_slide(prs, slide: Slide, idx: int, images: ImagePartIndex, layouts: LayoutIndex):
+    info = layouts.title if idx == 0 else layouts.content
+    pptx_slide = prs.slides.add_slide(prs.slide_layouts[info.position])
+    if slide.title:
+        title_placeholder = pptx_slide.shapes.title
+        title_placeholder.text = slide.title
+    body = pptx_slide.placeholders[info.body_idx] if info.body_idx is not None else None
+    if body:
+        tf = body.text_frame
+        media = []
+        for block in slide.blocks:
+            if is_text(block):
+                if block.bullets:
+                    for bullet in block.bullets:
                         p = tf.add_paragraph()
-                        p.text = block.text
-                elif isinstance(block, ImageBlock):
-                    pptx_slide.shapes.add_picture(block.src, Inches(1), Inches(2))
-        if slide.notes:
-            notes_frame = pptx_slide.notes_slide.notes_text_frame
-            notes_frame.text = slide.notes
-    prs.save(out_file)
+                        p.text = bullet
+                        p.level = 0
+                else:
+                    p = tf.add_paragraph()
+                    p.text = block.text
+            elif is_image(block):
+                media.append(block)
+            elif is_diagram(block) and block.lang == MERMAID:
+                # Ошибочные схемы отсеиваются до раскладки, чтобы не оставлять пустых ячеек
+                try:
+                    parse_flowchart(block.code)
+                except DiagramError as e:
+                    print(f"⚠️  Диаграмма пропущена: {e}")
+                else:
+                    media.append(block)
+        if media:
+            _add_media(pptx_slide, images, media, body, info.body_box)
+    if slide.notes:
+        notes_frame = pptx_slide.notes_slide.notes_text_frame
+        notes_frame.text = slide.notes
+    return pptx_slide
+
+
+def build_presentation(
+    slides: Iterable[Slide],
+    out_file: Union[str, Path, IO[bytes], None] = None,
+    template: Optional[str] = None,
+    streaming: bool = False,
+    pool: Optional[TemplatePool] = None,
+    workers: Optional[int] = 1,
+    compression: str = DEFAULT_COMPRESSION,
+) -> Optional[bytes]:
+    """Собирает презентацию из слайдов и сохраняет ее в ``out_file``.
+
+    ``out_file`` - путь или любой двоичный поток, открытый на запись
+    (в том числе без поддержки seek). Без ``out_file`` файл собирается в
+    памяти и возвращается как ``bytes``.
+
+    В режиме ``streaming`` слайды потребляются из итератора и каждый
+    готовый слайд с его изображениями сразу пишется в архив, так что
+    память не растет с числом слайдов (см. ``StreamingPackageWriter``).
+    Без поддерживаемой версии python-pptx (``compat.PPTX_INTERNALS``)
+    колода собирается обычным способом.
+    
+    С ``pool`` шаблон берется из пула (``TemplatePool``) и не читается
+    с диска повторно.
+    
+    При ``workers`` больше 1 (``None`` - по числу ядер) колода делится на
+    шарды не меньше ``SHARD_MIN_SLIDES`` слайдов, которые собираются в
+    пуле процессов и склеиваются на уровне zip (см. ``merge_packages``).
+    С ``pool`` первый шард собирается в текущем процессе из шаблона пула,
+    остальные процессы читают шаблон сами. Потоковый режим всегда
+    собирает в одном процессе.
+    
+    ``compression`` - пресет сжатия частей архива (``COMPRESSION_PRESETS``):
+    ``"default"`` как у ``Presentation.save``, ``"fast"`` и ``"small"``
+    хранят изображения без сжатия и сжимают XML быстро или сильно,
+    ``"store"`` не сжимает ничего.
+    """
+    if out_file is None:
+        buffer = BytesIO()
+        build_presentation(slides, buffer, template, streaming, pool, workers, compression)
+        return buffer.getvalue()
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and not streaming:
+        slides = list(slides)
+        shards = min(workers, len(slides) // SHARD_MIN_SLIDES)
+        if shards > 1:
+            _build_sharded(slides, out_file, template, shards, compression, pool)
+            return
+    
+    if pool is not None:
+        prs, layouts = pool.acquire(template)
+    else:
+        prs = Presentation(template) if template else Presentation()
+        layouts = LayoutIndex(prs)
+    images = ImagePartIndex(prs.part.package)
+    if streaming and PPTX_INTERNALS:
+        with StreamingPackageWriter(prs, out_file, compression) as writer:
+            for idx, slide in enumerate(slides):
+                writer.flush_slide(_add_slide(prs, slide, idx, images, layouts))
+        return
+    
+    for idx, slide in enumerate(slides):
+        _add_slide(prs, slide, idx, images, layouts)
+    save_package(prs, out_file, compression)
+
+
+def _build_shard(
+    slides: Sequence[Slide],
+    offset: int,
+    template: Optional[str],
+    with_notes: bool,
+    out_file: str,
+    pool: Optional[TemplatePool] = None,
+) -> str:
+    """Собирает часть колоды, начиная со слайда ``offset``, в отдельный пакет"""
+    if pool is not None:
+        prs, layouts = pool.acquire(template)
+    else:
+        prs = Presentation(template) if template else Presentation()
+        layouts = LayoutIndex(prs)
+    if with_notes:
+        # Шаблон заметок должен быть одинаковым во всех шардах, см. merge_packages
+        prs.notes_master
+    images = ImagePartIndex(prs.part.package)
+    for idx, slide in enumerate(slides, start=offset):
+        _add_slide(prs, slide, idx, images, layouts)
+    # Шард сразу читается при склейке, сжимать его незачем
+    save_package(prs, out_file, "store")
+    return out_file
+
+
+def _build_sharded(
+    slides: List[Slide],
+    out_file: Union[str, Path, IO[bytes]],
+    template: Optional[str],
+    shards: int,
+    compression: str,
+    pool: Optional[TemplatePool] = None,
+) -> None:
+    """Собирает шарды колоды в пуле процессов и склеивает их в один PPTX.
+
+    С ``pool`` первый шард собирается в текущем процессе, пока остальные
+    собираются в пуле процессов.
+    """
+    with_notes = any(slide.notes for slide in slides)
+    bounds = [len(slides) * i // shards for i in range(shards + 1)]
+    parts = [(slides[start:end], start) for start, end in zip(bounds, bounds[1:])]
+    local = parts[:1] if pool is not None else []
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor(max_workers=shards - len(local)) as executor:
+        futures = [
+            executor.submit(
+                _build_shard, part, start, template, with_notes, os.path.join(tmp, f"shard{start}.pptx")
+            )
+            for part, start in parts[len(local):]
+        ]
+        paths = [
+            _build_shard(part, start, template, with_notes, os.path.join(tmp, f"shard{start}.pptx"), pool)
+            for part, start in local
+        ]
+        paths += [future.result() for future in futures]
+        merge_packages(paths, out_file, compression)
@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from typing import Dict, Iterator, Mapping, NamedTuple, Optional, Union
+
+import requests
+
+from .httpclient import CHUNK_SIZE, iter_limited, read_limited
+from .models import Slide, SlideRecord, slide_from_dict, slide_to_dict
+
+DEFAULT_SLIDE_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_HTTP_CACHE_BYTES = 512 * 1024 * 1024
+
+# Эвристическая свежесть по Last-Modified (RFC 9111, 4.2.2) и ее верхняя граница
+HEURISTIC_FRESHNESS_FRACTION = 0.1
+MAX_HEURISTIC_FRESHNESS = 24 * 60 * 60
+
+
+def default_cache_dir() -> Path:
+    """Каталог кэша по умолчанию: $XDG_CACHE_HOME/md2pptx или ~/.cache/md2pptx"""
+    base = os.getenv("XDG_CACHE_HOME")
+    return (Path(base) if base else Path.home() / ".cache") / "md2pptx"
+
+
+_temp_dir: Optional[TemporaryDirectory] = None
+_temp_dir_lock = threading.Lock()
+
+
+def process_temp_dir() -> Path:
+    """Общий временный каталог процесса для файлов вне сборки и вне кэша.
+
+    Используется, когда вызывающий не передал свой каталог (загруженные
+    изображения, отрисованные диаграммы); удаляется при завершении
+    интерпретатора.
+    """
+    global _temp_dir
+    with _temp_dir_lock:
+        if _temp_dir is None:
+            _temp_dir = TemporaryDirectory(prefix="md2pptx-")
+        return Path(_temp_dir.name)
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Записывает файл через временный файл, чтобы читатели не видели обрывков"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = NamedTemporaryFile(dir=path.parent, prefix=".tmp-", delete=False)
+    try:
+        with tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp.name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def touch(path: Path) -> None:
+    """Отмечает файл как недавно использованный для LRU-вытеснения"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_lru(root: Path, max_bytes: int) -> int:
+    """Удаляет давно использованные файлы, пока каталог не уложится в лимит.
+
+    Время использования - mtime файла (обновляется через ``touch``).
+    Возвращает число удаленных файлов.
+    """
+    entries = []
+    total = 0
+    for path in root.rglob("*"):
+        if path.name.startswith(".tmp-"):
+            continue
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if not path.is_file():
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    
+    removed = 0
+    entries.sort(key=lambda entry: entry[0])
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class SlideCache:
+    """Дисковый кэш разобранных слайдов, адресуемый по ключу содержимого.
+
+    Ключи вычисляет парсер (хэш части документа и версии парсера),
+    кэш только хранит слайды и ограничивает свой размер по LRU.
+    """
+    
+    def __init__(
+        self,
+        root: Optional[Union[str, Path]] = None,
+        max_bytes: int = DEFAULT_SLIDE_CACHE_BYTES,
+    ) -> None:
+        self.root = Path(root) if root else default_cache_dir()
+        self.max_bytes = max_bytes
+    
+    @property
+    def slides_dir(self) -> Path:
+        return self.root / "slides"
+    
+    def _path(self, key: str) -> Path:
+        return self.slides_dir / key[:2] / f"{key}.json"
+    
+    def get(self, key: str) -> Optional[SlideRecord]:
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            slide = slide_from_dict(data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        touch(path)
+        return slide
+    
+    def put(self, key: str, slide: Slide) -> None:
+        data = json.dumps(slide_to_dict(slide), ensure_ascii=False)
+        try:
+            write_atomic(self._path(key), data.encode("utf-8"))
+        except OSError as e:
+            print(f"⚠️  Не удалось записать кэш слайда: {e}")
+    
+    def prune(self) -> int:
+        if not self.slides_dir.exists():
+            return 0
+        return prune_lru(self.slides_dir, self.max_bytes)
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Разбирает заголовок Cache-Control в словарь директив"""
+    directives: Dict[str, Optional[str]] = {}
+    for item in (value or "").split(","):
+        name, _, arg = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Mapping[str, str], now: float) -> float:
+    """Срок свежести ответа в секундах по Cache-Control, Expires и Last-Modified"""
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in directives:
+        return 0.0
+    if "max-age" in directives:
+        try:
+            return max(0.0, float(directives["max-age"] or 0))
+        except ValueError:
+            return 0.0
+    
+    date = _http_date(headers.get("Date")) or now
+    expires = _http_date(headers.get("Expires"))
+    if headers.get("Expires") is not None:
+        return max(0.0, (expires or 0.0) - date)
+    
+    last_modified = _http_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        age = max(0.0, date - last_modified)
+        return min(age * HEURISTIC_FRESHNESS_FRACTION, MAX_HEURISTIC_FRESHNESS)
+    return 0.0
+
+
+def _raise_for_status(response: requests.Response) -> None:
+    """``raise_for_status``, который сначала закрывает ответ с ошибкой"""
+    if response.status_code >= 400:
+        response.close()
+    response.raise_for_status()
+
+
+class CachedBody(NamedTuple):
+    """Тело ответа: путь в кэше или, для ответов no-store, сами байты"""
+    
+    path: Optional[Path]
+    content: Optional[bytes]
+    
+    def read(self) -> bytes:
+        return self.content if self.path is None else self.path.read_bytes()
+
+
+class HttpCache:
+    """Дисковый HTTP-кэш с адресацией тел ответов по содержимому.
+
+    Для каждого URL хранится запись с SHA-256 тела, ETag, Last-Modified и
+    временем, до которого ответ свеж. Сами тела лежат под своим хэшем,
+    поэтому одинаковое содержимое с разных URL хранится один раз. Свежие
+    записи отдаются без запросов, устаревшие перепроверяются условным
+    запросом (If-None-Match / If-Modified-Since), ответ 304 обновляет только
+    запись. Размер кэша ограничивается LRU-вытеснением.
+    """
+    
+    def __init__(
+        self,
+        root: Optional[Union[str, Path]] = None,
+        max_bytes: int = DEFAULT_HTTP_CACHE_BYTES,
+    ) -> None:
+        self.root = (Path(root) if root else default_cache_dir()) / "http"
+        self.max_bytes = max_bytes
+    
+    def _entry_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.root / "entries" / key[:2] / f"{key}.json"
+    
+    def _blob_path(self, sha256: str, suffix: str = "") -> Path:
+        return self.root / "blobs" / sha256[:2] / f"{sha256}{suffix}"
+    
+    def lookup(self, url: str) -> Optional[dict]:
+        """Возвращает запись для URL, если она есть и ее тело не вытеснено"""
+        path = self._entry_path(url)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            blob = self._blob_path(entry["sha256"], entry.get("suffix", ""))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if entry.get("url") != url or not blob.exists():
+            return None
+        return entry
+    
+    def blob(self, entry: dict) -> Path:
+        return self._blob_path(entry["sha256"], entry.get("suffix", ""))
+    
+    @staticmethod
+    def is_fresh(entry: dict, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.time()) < entry.get("expires", 0)
+    
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+    
+    def _write_entry(self, url: str, entry: dict) -> None:
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        write_atomic(self._entry_path(url), data)
+    
+    def store(
+        self,
+        url: str,
+        response: requests.Response,
+        suffix: str = "",
+        content: Optional[bytes] = None,
+    ) -> Optional[dict]:
+        """Сохраняет ответ 200; при Cache-Control: no-store ничего не пишет.
+
+        ``content`` - уже прочитанное тело потокового ответа.
+        """
+        if "no-store" in parse_cache_control(response.headers.get("Cache-Control")):
+            return None
+        
+        now = time.time()
+        if content is None:
+            content = response.content
+        entry = {
+            "url": url,
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "suffix": suffix,
+            "size": len(content),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "expires": now + freshness_lifetime(response.headers, now),
+        }
+        blob = self.blob(entry)
+        if blob.exists():
+            touch(blob)
+        else:
+            write_atomic(blob, content)
+        self._write_entry(url, entry)
+        return entry
+    
+    def revalidated(self, url: str, entry: dict, response: requests.Response) -> dict:
+        """Обновляет запись после ответа 304 Not Modified"""
+        now = time.time()
+        entry = dict(entry)
+        entry["etag"] = response.headers.get("ETag") or entry.get("etag")
+        entry["last_modified"] = response.headers.get("Last-Modified") or entry.get("last_modified")
+        entry["expires"] = now + freshness_lifetime(response.headers, now)
+        self._write_entry(url, entry)
+        touch(self.blob(entry))
+        return entry
+    
+    def _request(self, session, url: str, entry: Optional[dict], **kwargs) -> requests.Response:
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers.update(self.conditional_headers(entry))
+        return session.get(url, headers=headers, **kwargs)
+    
+    def _cached(self, url: str, entry: dict) -> Path:
+        touch(self._entry_path(url))
+        touch(self.blob(entry))
+        return self.blob(entry)
+    
+    def fetch(
+        self,
+        session: requests.Session,
+        url: str,
+        suffix: str = "",
+        max_bytes: Optional[int] = None,
+        revalidate: bool = False,
+        **kwargs,
+    ) -> CachedBody:
+        """Возвращает тело ответа по URL, обращаясь к сети только при необходимости.
+
+        С ``max_bytes`` тело читается потоком и не может превысить этот
+        размер (``ResponseTooLarge``). С ``revalidate`` даже свежая запись
+        перепроверяется условным запросом: так загружаются исходники, правку
+        которых нельзя пропустить. Ошибки HTTP пробрасываются как
+        ``requests.HTTPError``.
+        """
+        entry = self.lookup(url)
+        if entry and not revalidate and self.is_fresh(entry):
+            return CachedBody(self._cached(url, entry), None)
+        
+        if max_bytes is not None:
+            kwargs["stream"] = True
+        response = self._request(session, url, entry, **kwargs)
+        if entry and response.status_code == 304:
+            # Потоковый ответ держит соединение пула, пока его не закрыть
+            response.close()
+            return CachedBody(self.blob(self.revalidated(url, entry, response)), None)
+        _raise_for_status(response)
+        
+        content = read_limited(response, max_bytes) if max_bytes is not None else None
+        entry = self.store(url, response, suffix, content)
+        if entry is None:
+            return CachedBody(None, response.content if content is None else content)
+        return CachedBody(self.blob(entry), None)
+    
+    def stream(
+        self,
+        session: requests.Session,
+        url: str,
+        max_bytes: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE,
+        revalidate: bool = False,
+        **kwargs,
+    ) -> Iterator[bytes]:
+        """Как ``fetch``, но выдает тело кусками по мере загрузки.
+
+        Свежая (без ``revalidate``) или подтвержденная ответом 304 запись
+        читается из кэша; новое тело сохраняется в кэш после полной загрузки.
+        """
+        entry = self.lookup(url)
+        if not (entry and not revalidate and self.is_fresh(entry)):
+            response = self._request(session, url, entry, stream=True, **kwargs)
+            if entry and response.status_code == 304:
+                response.close()
+                entry = self.revalidated(url, entry, response)
+            else:
+                _raise_for_status(response)
+                chunks = []
+                for chunk in iter_limited(response, max_bytes, chunk_size):
+                    chunks.append(chunk)
+                    yield chunk
+                self.store(url, response, content=b"".join(chunks))
+                return
+        
+        with self._cached(url, entry).open("rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    
+    def prune(self) -> int:
+        if not self.root.exists():
+            return 0
+        return prune_lru(self.root, self.max_bytes)
@@ -1,21 +1,140 @@
 import argparse
 from pathlib import Path
-from .fetcher import fetch_markdown
-from .parser import parse_markdown
-from .builder import build_presentation
+from tempfile import TemporaryDirectory
+from .fetcher import fetch_markdown, iter_markdown
+from .ir import dump_ir, load_ir
+from .parser import iter_slide_records, parse_records, resolve_images
+from .builder import build_presentation, slide_size
+from .cache import HttpCache, SlideCache, default_cache_dir
+from .diagrams import DiagramCache, PlantUMLServer, set_renderer
+from .includes import IncludeResolver
+from .images import DEFAULT_IMAGE_DPI, DEFAULT_IMAGE_QUALITY, ImageOptimizer, iter_optimized
+from .package import COMPRESSION_PRESETS, DEFAULT_COMPRESSION
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Markdown to PPTX converter")
-    parser.add_argument("source", help="Markdown file path, URL, or Gist ID")
+    parser.add_argument("source", help="Markdown file path, URL, or Gist ID (IR file with --from-ir)")
     parser.add_argument("-o", "--output", default="slides.pptx", help="Output PPTX file")
     parser.add_argument("-t", "--template", default=None, help="PPTX template")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=1,
+        help="Parse and build slides in N processes (0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--cache-dir", default=None,
+        help="Directory for the slide, source, image and diagram caches (default: ~/.cache/md2pptx)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Disable the slide, source, image and diagram caches"
+    )
+    parser.add_argument(
+        "--optimize-images", action="store_true",
+        help="Downscale and recompress images to the slide's pixel budget before embedding",
+    )
+    parser.add_argument(
+        "--image-dpi", type=int, default=DEFAULT_IMAGE_DPI,
+        help=f"Target DPI for --optimize-images (default: {DEFAULT_IMAGE_DPI})",
+    )
+    parser.add_argument(
+        "--image-quality", type=int, default=DEFAULT_IMAGE_QUALITY,
+        help=f"JPEG quality for --optimize-images (default: {DEFAULT_IMAGE_QUALITY})",
+    )
+    parser.add_argument(
+        "--emit-ir", metavar="FILE", default=None,
+        help="Parse only and write the intermediate slide representation to FILE (.json = JSON)",
+    )
+    parser.add_argument(
+        "--from-ir", action="store_true",
+        help="Treat source as an IR file written by --emit-ir and build from it",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Parse and write slides one at a time to keep memory flat on very large decks",
+    )
+    parser.add_argument(
+        "--all-files", action="store_true",
+        help="Assemble every markdown file of a gist into one deck in filename order",
+    )
+    parser.add_argument(
+        "--includes", action="store_true",
+        help="Expand <!-- include: source --> directives, fetching fragments concurrently",
+    )
+    parser.add_argument(
+        "--plantuml-server", metavar="URL", default=None,
+        help="Render PlantUML diagrams with this PlantUML server instead of a local plantuml",
+    )
+    parser.add_argument(
+        "--compression", choices=list(COMPRESSION_PRESETS), default=DEFAULT_COMPRESSION,
+        help="Zip compression preset: fast/small store images as-is, store disables compression",
+    )
 
     args = parser.parse_args()
 
-    md_text = fetch_markdown(args.source)
-    slides = parse_markdown(md_text)
-    build_presentation(slides, Path(args.output), template=args.template)
+    cache = None if args.no_cache else SlideCache(args.cache_dir)
+    http_cache = None if args.no_cache else HttpCache(args.cache_dir)
+    diagram_cache = None if args.no_cache else DiagramCache(args.cache_dir)
+    if args.plantuml_server:
+        set_renderer(PlantUMLServer(args.plantuml_server))
+    # Изображения и диаграммы вне кэша живут только до конца сборки
+    with TemporaryDirectory(prefix="md2pptx-") as image_dir:
+        if args.from_ir:
+            slides = resolve_images(
+                load_ir(args.source),
+                image_cache=http_cache,
+                diagram_cache=diagram_cache,
+                image_dir=image_dir,
+            )
+        else:
+            if args.includes:
+                md_text = IncludeResolver(cache=http_cache).fetch(args.source)
+            elif args.stream and not args.emit_ir:
+                md_text = iter_markdown(args.source, cache=http_cache, all_files=args.all_files)
+            else:
+                md_text = fetch_markdown(args.source, cache=http_cache, all_files=args.all_files)
+            if args.stream and not args.emit_ir:
+                slides = iter_slide_records(
+                    md_text,
+                    cache=cache,
+                    image_cache=http_cache,
+                    diagram_cache=diagram_cache,
+                    image_dir=image_dir,
+                )
+            else:
+                slides = parse_records(
+                    md_text,
+                    workers=args.workers or None,
+                    cache=cache,
+                    image_cache=http_cache,
+                    resolve=args.emit_ir is None,
+                    diagram_cache=diagram_cache,
+                    image_dir=image_dir,
+                )
+            if args.emit_ir:
+                dump_ir(slides, args.emit_ir)
+                return
+        optimizer = None
+        if args.optimize_images:
+            optimizer = ImageOptimizer(
+                dpi=args.image_dpi,
+                quality=args.image_quality,
+                slide_size=slide_size(args.template),
+                cache_dir=None if args.no_cache else (args.cache_dir or default_cache_dir()),
+            )
+            slides = iter_optimized(slides, optimizer)
+        try:
+            build_presentation(
+                slides,
+                Path(args.output),
+                template=args.template,
+                streaming=args.stream,
+                workers=args.workers or None,
+                compression=args.compression,
+            )
+        finally:
+            if optimizer is not None:
+                optimizer.prune()
+                optimizer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+"""Закрытые детали python-pptx, на которые опираются быстрые пути сборки.
+
+Индекс изображений (``builder.ImagePartIndex``), привязка соединителей
+блок-схем к эллипсам и их стрелки, запись пакета со своей политикой
+сжатия и потоковая запись (``package``) работают с внутренними API
+python-pptx. Все обращения к ним собраны здесь и проверены на версиях
+из ``PPTX_SUPPORTED``; если версия другая, модулей или нужных атрибутов
+нет, ``PPTX_INTERNALS`` ложно и сборка переходит на публичный API.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+import pptx
+
+try:
+    from pptx.dml.line import LineFormat
+    from pptx.opc.oxml import serialize_part_xml
+    from pptx.opc.package import OpcPackage, Part
+    from pptx.opc.serialized import _ContentTypesItem
+    from pptx.oxml.slide import CT_NotesSlide, CT_Slide
+    from pptx.oxml.xmlchemy import OxmlElement
+    from pptx.parts.image import Image, ImagePart
+    from pptx.shapes.connector import Connector
+    from pptx.shapes.shapetree import SlideShapes
+    from pptx.util import lazyproperty
+except ImportError as e:  # модули python-pptx переехали (или версия до 0.6.22)
+    _IMPORT_ERROR: Optional[ImportError] = e
+    LineFormat = serialize_part_xml = OpcPackage = Part = _ContentTypesItem = None
+    CT_NotesSlide = CT_Slide = OxmlElement = Image = ImagePart = None
+    Connector = SlideShapes = lazyproperty = None
+else:
+    _IMPORT_ERROR = None
+
+# Проверенный диапазон версий python-pptx: [от, до)
+PPTX_SUPPORTED = ((0, 6, 22), (1, 1))
+
+
+def _parse_version(text: str) -> Tuple[int, ...]:
+    numbers = []
+    for piece in text.split("."):
+        digits = re.match(r"\d+", piece)
+        if digits is None:
+            break
+        numbers.append(int(digits.group()))
+    return tuple(numbers)
+
+
+PPTX_VERSION = _parse_version(pptx.__version__)
+
+
+def missing_internals() -> List[str]:
+    """Закрытые модули и атрибуты python-pptx, которых нет в установленной версии"""
+    if _IMPORT_ERROR is not None:
+        return [f"import: {_IMPORT_ERROR}"]
+    required = {
+        "SlideShapes._add_pic_from_image_part": hasattr(SlideShapes, "_add_pic_from_image_part"),
+        "SlideShapes._recalculate_extents": hasattr(SlideShapes, "_recalculate_extents"),
+        "SlideShapes._shape_factory": hasattr(SlideShapes, "_shape_factory"),
+        "ImagePart._native_size": hasattr(ImagePart, "_native_size"),
+        "ImagePart.sha1 (lazyproperty)": isinstance(ImagePart.__dict__.get("sha1"), lazyproperty),
+        "Connector._connect_begin_to": hasattr(Connector, "_connect_begin_to"),
+        "Connector._connect_end_to": hasattr(Connector, "_connect_end_to"),
+        "LineFormat._get_or_add_ln": hasattr(LineFormat, "_get_or_add_ln"),
+        "OpcPackage._rels": hasattr(OpcPackage, "_rels"),
+        "Part._rels": hasattr(Part, "_rels"),
+        "opc.oxml.serialize_part_xml": serialize_part_xml is not None,
+        "opc.serialized._ContentTypesItem.xml_for": hasattr(_ContentTypesItem, "xml_for"),
+    }
+    return [name for name, present in required.items() if not present]
+
+
+PPTX_INTERNALS = PPTX_SUPPORTED[0] <= PPTX_VERSION < PPTX_SUPPORTED[1] and not missing_internals()
+
+
+def add_picture_part(shapes, part: ImagePart, rId: str, left: int, top: int, width: int, height: int):
+    """Добавляет картинку из уже связанной со слайдом части изображения"""
+    pic = shapes._add_pic_from_image_part(part, rId, left, top, width, height)
+    shapes._recalculate_extents()
+    return shapes._shape_factory(pic)
+
+
+def native_size(part: ImagePart) -> Tuple[int, int]:
+    """Исходный размер изображения в EMU, как его считает python-pptx"""
+    return part._native_size
+
+
+def set_sha1(part: ImagePart, sha1: str) -> None:
+    """Заполняет кэш lazyproperty ``sha1``, чтобы не считать хэш заново"""
+    part.__dict__["sha1"] = sha1
+
+
+def connect_to_site(connector: Connector, begin: bool, shape, cxn_idx: int) -> None:
+    """Привязывает начало или конец соединителя к точке соединения фигуры.
+
+    Публичные ``begin_connect``/``end_connect`` знают только четыре точки
+    прямоугольника и переносят конец туда; у эллипса точек восемь. Здесь
+    конец только привязывается, его положение задается при создании.
+    """
+    if begin:
+        connector._connect_begin_to(shape, cxn_idx)
+    else:
+        connector._connect_end_to(shape, cxn_idx)
+
+
+def add_arrowhead(connector: Connector) -> None:
+    """Добавляет стрелку на конец соединителя (публичного API для нее нет)"""
+    tail = OxmlElement("a:tailEnd")
+    tail.set("type", "triangle")
+    connector.line._get_or_add_ln().append(tail)
+
+
+def content_types_xml(parts: Iterable[Part]) -> bytes:
+    """``[Content_Types].xml`` для частей пакета"""
+    return serialize_part_xml(_ContentTypesItem.xml_for(list(parts)))
+
+
+def package_rels_xml(package: OpcPackage) -> bytes:
+    """Связи самого пакета (``_rels/.rels``)"""
+    return package._rels.xml
+
+
+def part_rels_xml(part: Part) -> Optional[bytes]:
+    """Связи части или None, если их нет и файл связей не нужен"""
+    return part.rels.xml if part._rels else None
+
+
+if ImagePart is not None:
+    class _FlushedImagePart(ImagePart):
+        """Изображение, уже записанное в архив: без данных, только метаданные.
+
+        Сохраняет sha1 и исходный размер, чтобы python-pptx мог повторно
+        использовать часть для следующих слайдов.
+        """
+        
+        @property
+        def _native_size(self):
+            return self._flushed_native_size
+
+
+def release_image(part: ImagePart) -> None:
+    """Освобождает данные записанного изображения, оставляя часть в пакете"""
+    part.sha1  # кэшируется до удаления данных
+    size = part._native_size
+    part.__class__ = _FlushedImagePart
+    part._flushed_native_size = size
+    part._blob = b""
+
+
+def release_slide(part: Part) -> None:
+    """Заменяет XML записанного слайда пустым и сбрасывает кэши его объектов"""
+    part._element = CT_Slide.new()
+    part.__dict__.pop("slide", None)
+    part.__dict__.pop("notes_slide", None)
+
+
+def release_notes(part: Part) -> None:
+    """То же для записанных заметок слайда"""
+    part._element = CT_NotesSlide.new()
+    part.__dict__.pop("notes_slide", None)
@@ -1,11 +1,686 @@
+"""Диаграммы из блоков кода слайдов: PlantUML и блок-схемы Mermaid.
+
+Диаграмма PlantUML рендерится один раз: результат хранится в
+``DiagramCache`` под хэшем исходного текста и параметров рендерера. Все
+недостающие диаграммы документа передаются рендереру одной пачкой -
+долгоживущему процессу PlantUML (``-pipe``) или серверу PlantUML - вместо
+запуска процесса на каждую. В потоковом режиме пачки приходят по слайдам,
+но процесс PlantUML остается тем же.
+
+Блок-схемы Mermaid (``flowchart``/``graph``) разбираются и раскладываются
+здесь же, без внешних процессов; билдер рисует их фигурами и соединителями
+PPTX (см. ``builder.add_flowchart``).
+"""
+
 from __future__ import annotations
 
+import atexit
+import hashlib
+from abc import ABC, abstractmethod
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from tempfile import TemporaryFile
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from dotenv import load_dotenv
+
+from .cache import default_cache_dir, process_temp_dir, prune_lru, touch, write_atomic
+from .httpclient import DEFAULT_POOL_SIZE, HttpClient, get_client
+
+load_dotenv()
+
+# Языки блоков кода, которые рендерятся PlantUML, и их каноническое имя
+PLANTUML_LANGS = frozenset(("plantuml", "puml", "uml"))
+PLANTUML = "plantuml"
+MERMAID = "mermaid"
+DIAGRAM_FORMAT = "png"
+# Увеличивается при изменении подготовки исходников: сбрасывает кэш диаграмм
+DIAGRAMS_VERSION = "1"
+DEFAULT_DIAGRAM_CACHE_BYTES = 256 * 1024 * 1024
+# Таймаут рендеринга одной пачки диаграмм процессом PlantUML, в секундах
+RENDER_TIMEOUT = 120
+PIPE_READ_SIZE = 64 * 1024
+PIPE_DELIMITER = "--md2pptx-diagram-end--"
+
+_FENCE_RE = re.compile(
+    r"^(?P<fence>`{3,}|~{3,})[ \t]*\{?\.?(?P<lang>[\w+-]+)\}?[^\n]*\n(?P<code>.*?)^(?P=fence)[ \t]*$\n?",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+class DiagramError(ValueError):
+    """Рендерер не смог отрисовать диаграммы"""
+
+
+def split_diagrams(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Вырезает из текста блоки кода диаграмм.
+
+    Возвращает текст без этих блоков и список (язык, исходник) в порядке
+    появления. Блоки других языков остаются в тексте.
+    """
+    diagrams: List[Tuple[str, str]] = []
+
+    def take(match: re.Match) -> str:
+        lang = match.group("lang").lower()
+        if lang in PLANTUML_LANGS:
+            lang = PLANTUML
+        elif lang != MERMAID:
+            return match.group(0)
+        diagrams.append((lang, match.group("code").strip("\n")))
+        return ""
+
+    if "```" not in text and "~~~" not in text:
+        return text, diagrams
+    return _FENCE_RE.sub(take, text), diagrams
+
+
+def _wrap(code: str) -> str:
+    """Исходник PlantUML с обязательными ``@startuml``/``@enduml``"""
+    code = code.strip()
+    if code.startswith("@start"):
+        return code
+    return f"@startuml\n{code}\n@enduml"
+
+
+class DiagramRenderer(ABC):
+    """Рендерер пачки исходников PlantUML в изображения формата ``fmt``.
+
+    Подклассы реализуют ``render_batch``: изображения в порядке исходников.
+    """
+
+    name = "renderer"
+
+    def __init__(self, fmt: str = DIAGRAM_FORMAT) -> None:
+        self.fmt = fmt
+
+    @property
+    def options(self) -> str:
+        """Параметры, от которых зависит результат (входят в ключ кэша)"""
+        return f"{self.name}:{self.fmt}"
+
+    @abstractmethod
+    def render_batch(self, sources: Sequence[str]) -> List[bytes]:
+        """Рендерит исходники, возвращая изображения в том же порядке"""
+
+    def close(self) -> None:
+        """Освобождает ресурсы рендерера (процессы, соединения)"""
+
+    def __enter__(self) -> DiagramRenderer:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PlantUMLPipe(DiagramRenderer):
+    """Рендеринг долгоживущим процессом PlantUML в режиме ``-pipe``.
+
+    Процесс запускается при первой пачке и переиспользуется следующими
+    (например, по слайдам в потоковом режиме), пока не будет вызван
+    ``close``. Исходники пачки пишутся в stdin, изображения читаются из
+    stdout до строки ``-pipedelimitor`` после каждого, поэтому JVM
+    запускается один раз, а не на каждую диаграмму или пачку. После ошибки
+    или таймаута процесс останавливается и при следующей пачке запускается
+    заново.
+    """
+
+    name = "pipe"
+
+    def __init__(
+        self,
+        command: Optional[Sequence[str]] = None,
+        fmt: str = DIAGRAM_FORMAT,
+        timeout: float = RENDER_TIMEOUT,
+    ) -> None:
+        super().__init__(fmt)
+        command = command or plantuml_command()
+        if not command:
+            raise DiagramError("PlantUML not found: set PLANTUML_JAR or install the plantuml command")
+        self.command = list(command)
+        self.timeout = timeout
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr = None
+        self._lock = threading.Lock()
+
+    @property
+    def options(self) -> str:
+        return f"{super().options}:{' '.join(self.command)}"
+
+    def _start(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self.close()
+            # stderr пишется во временный файл: непрочитанный канал мог бы заблокировать PlantUML
+            self._stderr = TemporaryFile()
+            self._process = subprocess.Popen(
+                self.command + ["-pipe", f"-t{self.fmt}", "-pipedelimitor", PIPE_DELIMITER],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+            )
+        return self._process
+
+    @staticmethod
+    def _write(process: subprocess.Popen, data: bytes) -> None:
+        try:
+            process.stdin.write(data)
+            process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            # Процесс завершился: ошибку сообщит чтение результатов
+            pass
+
+    def _read(self, process: subprocess.Popen, count: int) -> List[bytes]:
+        delimiter = PIPE_DELIMITER.encode("ascii")
+        images: List[bytes] = []
+        buffer = b""
+        while len(images) < count:
+            chunk = process.stdout.read1(PIPE_READ_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            while delimiter in buffer and len(images) < count:
+                image, buffer = buffer.split(delimiter, 1)
+                images.append(image.lstrip(b"\r\n"))
+        return images
+
+    def _error_output(self) -> str:
+        if self._stderr is None:
+            return ""
+        self._stderr.seek(0)
+        return self._stderr.read().decode("utf-8", "replace").strip()
+
+    def render_batch(self, sources: Sequence[str]) -> List[bytes]:
+        if not sources:
+            return []
+        data = "".join(_wrap(source) + "\n" for source in sources).encode("utf-8")
+        with self._lock:
+            process = self._start()
+            # Запись идет в отдельном потоке: иначе PlantUML может заблокироваться
+            # на записи в заполненный stdout, пока мы еще пишем в его stdin
+            writer = threading.Thread(target=self._write, args=(process, data), daemon=True)
+            timed_out = threading.Event()
+
+            def kill() -> None:
+                timed_out.set()
+                process.kill()
+
+            watchdog = threading.Timer(self.timeout, kill)
+            writer.start()
+            watchdog.start()
+            try:
+                images = self._read(process, len(sources))
+            finally:
+                watchdog.cancel()
+                writer.join()
+            if len(images) < len(sources) or not all(images):
+                stderr = self._error_output()
+                if timed_out.is_set():
+                    stderr = f"timed out after {self.timeout}s. {stderr}"
+                self.close()
+                raise DiagramError(
+                    f"PlantUML rendered {sum(map(bool, images))} of {len(sources)} diagrams: {stderr}"
+                )
+            return images
+
+    def close(self) -> None:
+        """Останавливает процесс PlantUML (следующая пачка запустит новый)"""
+        process, self._process = self._process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+
+class PlantUMLServer(DiagramRenderer):
+    """Рендеринг сервером PlantUML: ``POST {url}/{fmt}`` с исходником в теле.
+
+    Запросы идут параллельно через общий пул соединений HTTP-клиента.
+    """
+
+    name = "server"
+
+    def __init__(
+        self,
+        url: str,
+        fmt: str = DIAGRAM_FORMAT,
+        client: Optional[HttpClient] = None,
+        concurrency: int = DEFAULT_POOL_SIZE,
+    ) -> None:
+        super().__init__(fmt)
+        self.url = url.rstrip("/")
+        self.client = client
+        self.concurrency = concurrency
+
+    @property
+    def options(self) -> str:
+        return f"{super().options}:{self.url}"
+
+    def _render(self, source: str) -> bytes:
+        client = self.client or get_client()
+        response = client.session.post(
+            f"{self.url}/{self.fmt}",
+            data=_wrap(source).encode("utf-8"),
+            headers={"Content-Type": "text/plain; charset=utf-8"},
+            timeout=client.timeout,
+        )
+        response.raise_for_status()
+        return response.content
+
+    def render_batch(self, sources: Sequence[str]) -> List[bytes]:
+        if not sources:
+            return []
+        workers = max(1, min(self.concurrency, len(sources)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self._render, sources))
+
+
+def plantuml_command() -> Optional[List[str]]:
+    """Команда запуска PlantUML: ``java -jar $PLANTUML_JAR`` или ``plantuml`` из PATH"""
+    jar = os.getenv("PLANTUML_JAR")
+    if jar:
+        return [os.getenv("PLANTUML_JAVA", "java"), "-jar", jar]
+    command = shutil.which("plantuml")
+    return [command] if command else None
+
+
+_default_renderer: Optional[DiagramRenderer] = None
+_default_configured = False
+_default_lock = threading.Lock()
+
+
+def get_renderer() -> Optional[DiagramRenderer]:
+    """Рендерер процесса: сервер из ``PLANTUML_SERVER``, иначе локальный PlantUML.
 
+    ``None``, если PlantUML недоступен.
+    """
+    global _default_renderer, _default_configured
+    with _default_lock:
+        if not _default_configured:
+            server = os.getenv("PLANTUML_SERVER")
+            if server:
+                _default_renderer = PlantUMLServer(server)
+            elif plantuml_command():
+                _default_renderer = PlantUMLPipe()
+            _default_configured = True
+        return _default_renderer
 
-def render(code: str, out_dir: Path) -> Path:
-    out_dir.mkdir(parents=True, exist_ok=True)
-    output = out_dir / "diagram.png"
-    # Stub: real implementation would invoke PlantUML
-    output.write_bytes(b"")
+
+def set_renderer(renderer: Optional[DiagramRenderer]) -> None:
+    """Заменяет рендерер процесса (``None`` - снова определить по окружению).
+
+    Прежний рендерер закрывается.
+    """
+    global _default_renderer, _default_configured
+    with _default_lock:
+        previous, _default_renderer = _default_renderer, renderer
+        _default_configured = renderer is not None
+    if previous is not None and previous is not renderer:
+        previous.close()
+
+
+@atexit.register
+def _close_renderer() -> None:
+    if _default_renderer is not None:
+        _default_renderer.close()
+
+
+def diagram_key(code: str, renderer: DiagramRenderer) -> str:
+    """Ключ кэша: хэш исходника и параметров рендерера"""
+    digest = hashlib.sha256(f"{DIAGRAMS_VERSION}\0{renderer.options}\0".encode("utf-8"))
+    digest.update(_wrap(code).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DiagramCache:
+    """Дисковый кэш отрисованных диаграмм, адресуемый по ``diagram_key``"""
+
+    def __init__(
+        self,
+        root: Optional[Union[str, Path]] = None,
+        max_bytes: int = DEFAULT_DIAGRAM_CACHE_BYTES,
+    ) -> None:
+        self.root = Path(root) if root else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    @property
+    def diagrams_dir(self) -> Path:
+        return self.root / "diagrams"
+
+    def path(self, key: str, fmt: str = DIAGRAM_FORMAT) -> Path:
+        return self.diagrams_dir / key[:2] / f"{key}.{fmt}"
+
+    def get(self, key: str, fmt: str = DIAGRAM_FORMAT) -> Optional[Path]:
+        path = self.path(key, fmt)
+        if not path.is_file():
+            return None
+        touch(path)
+        return path
+
+    def put(self, key: str, data: bytes, fmt: str = DIAGRAM_FORMAT) -> Path:
+        path = self.path(key, fmt)
+        write_atomic(path, data)
+        return path
+
+    def prune(self) -> int:
+        if not self.diagrams_dir.exists():
+            return 0
+        return prune_lru(self.diagrams_dir, self.max_bytes)
+
+
+def _store(key: str, data: bytes, fmt: str, cache: Optional[DiagramCache], folder: Path) -> str:
+    if cache is not None:
+        return str(cache.put(key, data, fmt))
+    path = folder / f"diagram-{key}.{fmt}"
+    if not path.exists():
+        write_atomic(path, data)
+    return str(path)
+
+
+def render_diagrams(
+    sources: Iterable[str],
+    renderer: Optional[DiagramRenderer] = None,
+    cache: Optional[DiagramCache] = None,
+    folder: Optional[Union[str, Path]] = None,
+) -> Dict[str, Optional[str]]:
+    """Рендерит диаграммы PlantUML, возвращая словарь исходник -> путь к изображению.
+
+    Диаграммы из ``cache`` не рендерятся повторно; остальные уникальные
+    исходники передаются рендереру одной пачкой. При ошибке рендеринга
+    или без доступного PlantUML путь равен ``None``. Вытеснение из кэша
+    (``cache.prune()``) вызывающий выполняет один раз за сборку.
+
+    Без ``cache`` изображения пишутся в ``folder`` - временный каталог
+    сборки, а без него - в общий временный каталог процесса
+    (``cache.process_temp_dir``).
+    """
+    unique = list(dict.fromkeys(sources))
+    if not unique:
+        return {}
+    renderer = renderer or get_renderer()
+    if renderer is None:
+        print(f"⚠️  PlantUML не найден, диаграммы пропущены: {len(unique)}")
+        return dict.fromkeys(unique)
+
+    out_dir = Path(folder) if folder else process_temp_dir()
+    paths: Dict[str, Optional[str]] = {}
+    missing: List[Tuple[str, str]] = []
+    for code in unique:
+        key = diagram_key(code, renderer)
+        cached = cache.get(key, renderer.fmt) if cache is not None else None
+        if cached is not None:
+            paths[code] = str(cached)
+        else:
+            missing.append((code, key))
+
+    if missing:
+        try:
+            images = renderer.render_batch([code for code, _ in missing])
+            for (code, key), data in zip(missing, images):
+                paths[code] = _store(key, data, renderer.fmt, cache, out_dir)
+        except Exception as e:
+            print(f"⚠️  Не удалось отрисовать диаграммы ({len(missing)}): {e}")
+            for code, _ in missing:
+                paths.setdefault(code, None)
+    return paths
+
+
+def render(code: str, out_dir: Path, renderer: Optional[DiagramRenderer] = None) -> Path:
+    """Рендерит одну диаграмму в ``out_dir`` под именем из ее хэша"""
+    renderer = renderer or get_renderer()
+    if renderer is None:
+        raise DiagramError("PlantUML not found: set PLANTUML_SERVER, PLANTUML_JAR or install plantuml")
+    output = Path(out_dir) / f"{diagram_key(code, renderer)}.{renderer.fmt}"
+    if not output.is_file():
+        (data,) = renderer.render_batch([code])
+        write_atomic(output, data)
     return output
+
+
+# Блок-схемы Mermaid: подмножество синтаксиса flowchart
+
+FLOW_DIRECTIONS = ("TB", "TD", "BT", "LR", "RL")
+# Наибольший размер узла в EMU (2 x 0.9 дюйма): небольшие схемы не растягиваются на весь слайд
+MAX_NODE_SIZE = (1828800, 822960)
+# Доля ячейки сетки, которую узел занимает вдоль и поперек направления схемы
+NODE_FILL = (0.55, 0.8)
+# Проходы упорядочивания узлов внутри слоев по барицентрам соседей
+ORDER_SWEEPS = 4
+
+_FLOW_HEADER_RE = re.compile(r"^(?:flowchart|graph)(?:[ \t]+(?P<direction>[A-Z]{2}))?[ \t]*$", re.IGNORECASE)
+# Операторы, которые не влияют на раскладку: подграфы, стили, ссылки
+_FLOW_IGNORED_RE = re.compile(r"^(?:subgraph|end|direction|style|classDef|class|linkStyle|click)(?:\s|$)")
+_NODE_RE = re.compile(
+    r"\s*(?P<id>[A-Za-z0-9_]+)"
+    r"(?P<shape>\(\(.*?\)\)|\(\[.*?\]\)|\[.*?\]|\(.*?\)|\{.*?\})?\s*"
+)
+_LINK_RE = re.compile(
+    r"(?:(?P<open>--|==|-\.)\s+(?P<text>[^|]+?)\s*(?P<end>-{2,}>|={2,}>|\.+->|-{3,}|={3,}|\.+-)(?=\s)"
+    r"|(?P<link>-{2,}>|={2,}>|-\.+->|-{3,}|={3,}|-\.+-)(?:\|(?P<label>[^|]*)\|)?)\s*"
+)
+# Скобки вокруг подписи узла -> форма узла
+_NODE_SHAPES = (
+    ("((", "))", "circle"),
+    ("([", "])", "stadium"),
+    ("[", "]", "rect"),
+    ("(", ")", "round"),
+    ("{", "}", "diamond"),
+)
+
+
+class FlowNode(NamedTuple):
+    id: str
+    label: str
+    # rect, round, stadium, circle или diamond
+    shape: str = "rect"
+
+
+class FlowEdge(NamedTuple):
+    source: str
+    target: str
+    label: str = ""
+    # solid, dotted или thick
+    style: str = "solid"
+    arrow: bool = True
+
+
+class Flowchart(NamedTuple):
+    direction: str
+    nodes: Dict[str, FlowNode]
+    edges: List[FlowEdge]
+
+
+def _flow_label(text: str) -> str:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]
+    return text.replace("<br>", "\n").replace("<br/>", "\n")
+
+
+def _flow_node(match: re.Match, nodes: Dict[str, FlowNode]) -> str:
+    node_id, shape = match.group("id"), match.group("shape")
+    if shape:
+        for opening, closing, name in _NODE_SHAPES:
+            if shape.startswith(opening) and shape.endswith(closing):
+                nodes[node_id] = FlowNode(node_id, _flow_label(shape[len(opening):-len(closing)]), name)
+                break
+    elif node_id not in nodes:
+        nodes[node_id] = FlowNode(node_id, node_id)
+    return node_id
+
+
+def _flow_edge(source: str, target: str, match: re.Match) -> FlowEdge:
+    link = match.group("link") or match.group("end")
+    label = match.group("label") if match.group("link") else match.group("text")
+    opening = match.group("open") or link
+    if opening.startswith("==") or link.startswith("=="):
+        style = "thick"
+    elif "." in opening or "." in link:
+        style = "dotted"
+    else:
+        style = "solid"
+    return FlowEdge(source, target, _flow_label(label or ""), style, link.endswith(">"))
+
+
+def parse_flowchart(code: str) -> Flowchart:
+    """Разбирает блок-схему Mermaid: ``flowchart``/``graph`` с направлением.
+
+    Поддерживаются узлы ``A``, ``A[...]``, ``A(...)``, ``A([...])``,
+    ``A((...))``, ``A{...}``, связи ``-->``, ``---``, ``-.->``, ``==>`` с
+    подписями (``-->|текст|`` или ``-- текст -->``) и цепочки связей.
+    Подграфы раскладываются как обычные узлы, стили игнорируются.
+    """
+    lines = []
+    for line in code.replace(";", "\n").split("\n"):
+        line = line.strip()
+        if line and not line.startswith("%%"):
+            lines.append(line)
+    header = _FLOW_HEADER_RE.match(lines[0]) if lines else None
+    if header is None:
+        raise DiagramError("Only Mermaid flowcharts are supported: expected 'flowchart <direction>'")
+    direction = (header.group("direction") or "TB").upper()
+    if direction not in FLOW_DIRECTIONS:
+        raise DiagramError(f"Unknown flowchart direction: {direction}. Available: {FLOW_DIRECTIONS}")
+
+    nodes: Dict[str, FlowNode] = {}
+    edges: List[FlowEdge] = []
+    for line in lines[1:]:
+        if _FLOW_IGNORED_RE.match(line):
+            continue
+        match = _NODE_RE.match(line)
+        if match is None:
+            raise DiagramError(f"Cannot parse flowchart line: {line!r}")
+        source, pos = _flow_node(match, nodes), match.end()
+        while pos < len(line):
+            link = _LINK_RE.match(line, pos)
+            node = _NODE_RE.match(line, link.end()) if link else None
+            if node is None or node.end() == link.end():
+                raise DiagramError(f"Cannot parse flowchart line: {line!r}")
+            target = _flow_node(node, nodes)
+            edges.append(_flow_edge(source, target, link))
+            source, pos = target, node.end()
+    if not nodes:
+        raise DiagramError("Flowchart has no nodes")
+    return Flowchart(direction, nodes, edges)
+
+
+def _flow_ranks(chart: Flowchart) -> Dict[str, int]:
+    """Слой каждого узла: длиннейший путь от истоков (обратные связи циклов не учитываются)"""
+    successors: Dict[str, List[str]] = {node: [] for node in chart.nodes}
+    for edge in chart.edges:
+        if edge.source != edge.target:
+            successors[edge.source].append(edge.target)
+
+    # Обход в глубину в порядке объявления узлов: связи к узлам на стеке - обратные
+    state: Dict[str, int] = {}
+    forward: Dict[str, List[str]] = {node: [] for node in chart.nodes}
+    for root in chart.nodes:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[node] = 2
+                stack.pop()
+            elif state.get(child) != 1:
+                forward[node].append(child)
+                if child not in state:
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+
+    indegree = {node: 0 for node in chart.nodes}
+    for targets in forward.values():
+        for target in targets:
+            indegree[target] += 1
+    ranks = {node: 0 for node in chart.nodes}
+    ready = [node for node in chart.nodes if indegree[node] == 0]
+    while ready:
+        node = ready.pop()
+        for target in forward[node]:
+            ranks[target] = max(ranks[target], ranks[node] + 1)
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                ready.append(target)
+    return ranks
+
+
+def _flow_layers(chart: Flowchart, ranks: Dict[str, int]) -> List[List[str]]:
+    """Узлы по слоям, упорядоченные по барицентрам соседей для меньшего числа пересечений"""
+    layers: List[List[str]] = [[] for _ in range(max(ranks.values()) + 1)]
+    for node in chart.nodes:
+        layers[ranks[node]].append(node)
+    neighbours: Dict[str, Tuple[List[str], List[str]]] = {node: ([], []) for node in chart.nodes}
+    for edge in chart.edges:
+        neighbours[edge.target][0].append(edge.source)
+        neighbours[edge.source][1].append(edge.target)
+
+    for sweep in range(ORDER_SWEEPS):
+        downward = sweep % 2 == 0
+        position = {node: i for layer in layers for i, node in enumerate(layer)}
+        order = range(1, len(layers)) if downward else range(len(layers) - 2, -1, -1)
+        for i in order:
+            def barycenter(node: str) -> float:
+                linked = [
+                    position[other]
+                    for other in neighbours[node][0 if downward else 1]
+                    if ranks[other] == i + (-1 if downward else 1)
+                ]
+                return sum(linked) / len(linked) if linked else position[node]
+            layers[i].sort(key=barycenter)
+            position.update((node, j) for j, node in enumerate(layers[i]))
+    return layers
+
+
+def layout_flowchart(
+    chart: Flowchart,
+    box: Tuple[int, int, int, int],
+) -> Dict[str, Tuple[int, int, int, int]]:
+    """Раскладывает блок-схему по слоям в области ``box`` (left, top, width, height).
+
+    Возвращает для каждого узла (left, top, width, height) в EMU. Слои идут
+    по направлению схемы, узлы слоя центрируются поперек него.
+    """
+    left, top, width, height = box
+    layers = _flow_layers(chart, _flow_ranks(chart))
+    horizontal = chart.direction in ("LR", "RL")
+    reverse = chart.direction in ("BT", "RL")
+    main, cross = (width, height) if horizontal else (height, width)
+    main_cell = main // len(layers)
+    cross_cell = cross // max(len(layer) for layer in layers)
+
+    max_width, max_height = MAX_NODE_SIZE
+    max_main, max_cross = (max_width, max_height) if horizontal else (max_height, max_width)
+    node_main = min(int(main_cell * NODE_FILL[0]), max_main)
+    node_cross = min(int(cross_cell * NODE_FILL[1]), max_cross)
+    boxes: Dict[str, Tuple[int, int, int, int]] = {}
+    for rank, layer in enumerate(layers):
+        slot = len(layers) - 1 - rank if reverse else rank
+        center_main = slot * main_cell + main_cell // 2
+        offset = (cross - cross_cell * len(layer)) // 2
+        for i, node in enumerate(layer):
+            center_cross = offset + i * cross_cell + cross_cell // 2
+            size_main, size_cross = node_main, node_cross
+            if chart.nodes[node].shape == "circle":
+                size_main = size_cross = min(node_main, node_cross)
+            if horizontal:
+                x, y, w, h = center_main, center_cross, size_main, size_cross
+            else:
+                x, y, w, h = center_cross, center_main, size_cross, size_main
+            boxes[node] = (left + x - w // 2, top + y - h // 2, w, h)
+    return boxes
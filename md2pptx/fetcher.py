@@ -1,45 +1,292 @@
 from __future__ import annotations
 
+import asyncio
+import codecs
+import functools
+import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
 from dotenv import load_dotenv
 
+from .cache import HttpCache
+from .httpclient import CHUNK_SIZE, HttpClient, get_client, iter_limited, read_limited
+
 load_dotenv()
 
 GIST_RE = re.compile(r"^[0-9a-f]{20,}$")
 GIST_URL_RE = re.compile(r"https://gist\.github\.com/[^/]+/([0-9a-f]{20,})")
+# Разделитель между файлами Gist, собранными в одну презентацию
+GIST_FILE_SEPARATOR = "\n\n---\n\n"
+GIST_RAW_WORKERS = 4
+DEFAULT_FETCH_CONCURRENCY = 8
+
+
+class FetchResult(NamedTuple):
+    """Результат загрузки одного источника: текст или ошибка"""
+    source: str
+    text: Optional[str] = None
+    error: Optional[Exception] = None
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def fetch_markdown(
+    src: str,
+    client: Optional[HttpClient] = None,
+    cache: Optional[HttpCache] = None,
+    all_files: bool = False,
+) -> str:
+    """Загружает Markdown контент из различных источников.
+
+    Сетевые запросы идут через ``client`` (по умолчанию - общий клиент
+    ``httpclient.get_client()`` с таймаутами, повторами и пулом соединений).
+    С ``cache`` ответы сохраняются на диск и перепроверяются условными
+    запросами (If-None-Match / If-Modified-Since) при каждой загрузке:
+    неизмененный источник обходится одним ответом 304 без тела.
+    
+    С ``all_files`` все Markdown файлы Gist собираются в одну презентацию
+    в порядке имен файлов, без него берется первый из них.
+    """
+    text = _fetch_source(src, client or get_client(), cache, all_files)
+    if cache is not None:
+        cache.prune()
+    return text
+
+async def fetch_markdown_async(
+    src: str,
+    client: Optional[HttpClient] = None,
+    cache: Optional[HttpCache] = None,
+    all_files: bool = False,
+) -> str:
+    """Асинхронный вариант ``fetch_markdown``.
+
+    Загрузка выполняется в пуле потоков через общий HTTP-клиент, поэтому
+    не блокирует цикл событий.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(fetch_markdown, src, client, cache, all_files)
+    )
+
+def _fetch_result(
+    src: str,
+    client: HttpClient,
+    cache: Optional[HttpCache],
+    all_files: bool,
+) -> FetchResult:
+    try:
+        return FetchResult(src, _fetch_source(src, client, cache, all_files))
+    except Exception as e:
+        return FetchResult(src, error=e)
+
+def fetch_many(
+    sources: Iterable[str],
+    concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    client: Optional[HttpClient] = None,
+    cache: Optional[HttpCache] = None,
+    all_files: bool = False,
+) -> List[FetchResult]:
+    """Параллельно загружает несколько источников (файлы, URL, Gist).
+
+    Одновременно выполняется не больше ``concurrency`` загрузок. Результаты
+    идут в порядке ``sources``; ошибка одного источника не прерывает
+    остальные, а возвращается в его ``FetchResult.error``.
+    """
+    sources = list(sources)
+    if not sources:
+        return []
+    client = client or get_client()
+    workers = max(1, min(concurrency, len(sources)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda src: _fetch_result(src, client, cache, all_files), sources))
+    if cache is not None:
+        cache.prune()
+    return results
+
+async def fetch_many_async(
+    sources: Iterable[str],
+    concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    client: Optional[HttpClient] = None,
+    cache: Optional[HttpCache] = None,
+    all_files: bool = False,
+) -> List[FetchResult]:
+    """Асинхронный вариант ``fetch_many`` с теми же гарантиями"""
+    client = client or get_client()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    loop = asyncio.get_running_loop()
+    
+    async def fetch_one(src: str) -> FetchResult:
+        async with semaphore:
+            return await loop.run_in_executor(
+                None, functools.partial(_fetch_result, src, client, cache, all_files)
+            )
+    
+    results = await asyncio.gather(*(fetch_one(src) for src in sources))
+    if cache is not None:
+        cache.prune()
+    return list(results)
+
+def _fetch_source(
+    src: str,
+    client: HttpClient,
+    cache: Optional[HttpCache],
+    all_files: bool = False,
+    revalidate: bool = True,
+) -> str:
+    """Загружает источник по его виду: URL, Gist ID или локальный файл.
 
-def fetch_markdown(src: str) -> str:
-    """Загружает Markdown контент из различных источников"""
-    if src.startswith("http://") or src.startswith("https://"):
-        return _fetch_from_url(src)
+    ``revalidate`` - см. ``_get``.
+    """
+    if _is_url(src):
+        return _fetch_from_url(src, client, cache, all_files, revalidate)
     elif GIST_RE.match(src):
-        return _fetch_from_gist(src)
+        return _fetch_from_gist(src, client, cache, all_files, revalidate)
     else:
         path = Path(src)
         return path.read_text(encoding="utf-8")
 
-def _fetch_from_url(url: str) -> str:
+def _get(
+    client: HttpClient,
+    cache: Optional[HttpCache],
+    url: str,
+    revalidate: bool = True,
+    **kwargs,
+) -> bytes:
+    """Тело ответа по URL (не больше ``client.max_bytes``), через кэш, если он задан.
+
+    Исходники могут измениться в любой момент, поэтому по умолчанию запись
+    кэша всегда перепроверяется условным запросом, а не считается свежей по
+    заголовкам. С ``revalidate=False`` свежая по Cache-Control запись
+    отдается без запроса (так загружаются включаемые фрагменты).
+    """
+    if cache is not None:
+        return cache.fetch(
+            client, url, max_bytes=client.max_bytes, revalidate=revalidate, **kwargs
+        ).read()
+    response = client.get(url, stream=True, **kwargs)
+    response.raise_for_status()
+    return read_limited(response, client.max_bytes)
+
+def _is_url(src: str) -> bool:
+    return src.startswith("http://") or src.startswith("https://")
+
+def _decode_chunks(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Инкрементально декодирует UTF-8, не разрывая многобайтовые символы"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def iter_markdown(
+    src: str,
+    client: Optional[HttpClient] = None,
+    cache: Optional[HttpCache] = None,
+    all_files: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    """Потоково загружает Markdown, выдавая текст кусками по мере получения.
+
+    Результат можно сразу передать в ``iter_slides``: разбор слайдов идет
+    параллельно с загрузкой. Тело URL читается потоком и декодируется
+    инкрементально, его размер ограничен ``client.max_bytes``
+    (``ResponseTooLarge``). Локальные файлы читаются кусками, Gist
+    выдается целиком после загрузки.
+    """
+    client = client or get_client()
+    if _is_url(src) and not GIST_URL_RE.search(src):
+        if cache is not None:
+            chunks = cache.stream(client, src, client.max_bytes, chunk_size, revalidate=True)
+        else:
+            response = client.get(src, stream=True)
+            response.raise_for_status()
+            chunks = iter_limited(response, client.max_bytes, chunk_size)
+        yield from _decode_chunks(chunks)
+        if cache is not None:
+            cache.prune()
+    elif not _is_url(src) and not GIST_RE.match(src):
+        with open(src, encoding="utf-8") as f:
+            yield from iter(lambda: f.read(chunk_size), "")
+    else:
+        yield fetch_markdown(src, client, cache, all_files)
+
+def _fetch_from_url(
+    url: str,
+    client: HttpClient,
+    cache: Optional[HttpCache],
+    all_files: bool = False,
+    revalidate: bool = True,
+) -> str:
     """Загружает контент по URL с обработкой Gist ссылок"""
     
     # Проверяем, является ли это Gist URL
     gist_match = GIST_URL_RE.search(url)
     if gist_match:
         gist_id = gist_match.group(1)
-        return _fetch_from_gist(gist_id)
+        return _fetch_from_gist(gist_id, client, cache, all_files, revalidate)
     
     # Обычная загрузка URL
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.text
+    return _get(client, cache, url, revalidate).decode("utf-8")
 
-def _fetch_from_gist(gist_id: str) -> str:
-    """Загружает Markdown файл из GitHub Gist через API"""
+def _gist_markdown_files(files: Dict[str, dict], all_files: bool) -> List[Tuple[str, dict]]:
+    """Выбирает Markdown файлы Gist: все по порядку имен или первый найденный"""
+    
+    # Ищем Markdown файлы
+    markdown_files = []
+    for filename, file_info in files.items():
+        if filename.endswith(".md") or file_info.get('type') == 'text/markdown':
+            markdown_files.append((filename, file_info))
+    
+    if not markdown_files:
+        # Если нет .md файлов, берем первый текстовый файл
+        for filename, file_info in files.items():
+            if file_info.get('type', '').startswith('text/'):
+                markdown_files.append((filename, file_info))
+                break
+    
+    if not markdown_files:
+        available_files = list(files.keys())
+        raise ValueError(f"No markdown file found in gist. Available files: {available_files}")
+    
+    if all_files:
+        return sorted(markdown_files)
+    # Берем первый найденный Markdown файл
+    return markdown_files[:1]
+
+def _gist_file_text(
+    client: HttpClient,
+    cache: Optional[HttpCache],
+    file_info: dict,
+    revalidate: bool = True,
+) -> str:
+    """Содержимое файла Gist: из ответа API, а для обрезанных файлов - по raw_url"""
+    content = file_info.get("content")
+    if content is not None and not file_info.get("truncated"):
+        return content
+    return _get(client, cache, file_info["raw_url"], revalidate).decode("utf-8")
+
+def _fetch_from_gist(
+    gist_id: str,
+    client: HttpClient,
+    cache: Optional[HttpCache],
+    all_files: bool = False,
+    revalidate: bool = True,
+) -> str:
+    """Загружает Markdown файл (или все файлы) из GitHub Gist через API.
+
+    Ответ API уже содержит текст файлов до 1 МБ, поэтому обычно хватает
+    одного запроса. Обрезанные файлы догружаются по raw_url параллельно.
+    """
     
     token = os.getenv("GITHUB_TOKEN")
     headers = {"Accept": "application/vnd.github.v3+json"}
@@ -49,36 +296,19 @@ def _fetch_from_gist(gist_id: str) -> str:
     api_url = f"https://api.github.com/gists/{gist_id}"
     
     try:
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-        gist = response.json()
-        
-        # Ищем Markdown файлы
-        markdown_files = []
-        for filename, file_info in gist["files"].items():
-            if filename.endswith(".md") or file_info.get('type') == 'text/markdown':
-                markdown_files.append((filename, file_info))
-        
-        if not markdown_files:
-            # Если нет .md файлов, берем первый текстовый файл
-            for filename, file_info in gist["files"].items():
-                if file_info.get('type', '').startswith('text/'):
-                    markdown_files.append((filename, file_info))
-                    break
-        
-        if not markdown_files:
-            available_files = list(gist["files"].keys())
-            raise ValueError(f"No markdown file found in gist. Available files: {available_files}")
-        
-        # Берем первый найденный Markdown файл
-        filename, file_info = markdown_files[0]
+        gist = json.loads(_get(client, cache, api_url, revalidate, headers=headers))
+        markdown_files = _gist_markdown_files(gist["files"], all_files)
+        file_infos = [file_info for _, file_info in markdown_files]
         
-        # Загружаем raw контент
-        raw_url = file_info["raw_url"]
-        raw_response = requests.get(raw_url)
-        raw_response.raise_for_status()
+        if len(file_infos) == 1:
+            return _gist_file_text(client, cache, file_infos[0], revalidate)
         
-        return raw_response.text
+        workers = min(GIST_RAW_WORKERS, len(file_infos))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            texts = pool.map(
+                lambda info: _gist_file_text(client, cache, info, revalidate), file_infos
+            )
+            return GIST_FILE_SEPARATOR.join(text.strip("\n") for text in texts)
         
     except requests.exceptions.RequestException as e:
         raise ValueError(f"Failed to fetch gist {gist_id}: {e}")
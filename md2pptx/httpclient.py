@@ -0,0 +1,218 @@
+"""Общий HTTP-клиент для загрузки исходников: пул соединений, таймауты, повторы."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Таймауты (соединение, чтение) в секундах
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+# Пауза перед n-м повтором: BACKOFF_FACTOR * 2 ** (n - 1) секунд
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_POOL_SIZE = 10
+# Дольше ждать сброса лимита GitHub не имеет смысла: запрос завершается ошибкой
+MAX_RATE_LIMIT_WAIT = 60
+# Когда запросов в окне лимита остается меньше, они равномерно растягиваются до сброса
+RATE_LIMIT_RESERVE = 5
+# Размер куска при потоковом чтении тела ответа
+CHUNK_SIZE = 64 * 1024
+# Больший ответ - скорее всего ошибка в ссылке (например, на лог-файл), а не презентация
+MAX_RESPONSE_BYTES = 64 * 1024 * 1024
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class RateLimitError(ValueError):
+    """Лимит запросов исчерпан, а до его сброса дольше ``max_rate_limit_wait``"""
+
+
+class ResponseTooLarge(ValueError):
+    """Тело ответа больше допустимого размера"""
+
+
+def iter_limited(
+    response: requests.Response,
+    max_bytes: Optional[int],
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Читает тело ответа кусками, прерываясь, как только оно превысит ``max_bytes``.
+
+    Ответ должен быть получен со ``stream=True``; соединение закрывается
+    после чтения или ошибки. ``max_bytes=None`` - без ограничения.
+    """
+    try:
+        length = response.headers.get("Content-Length", "")
+        if max_bytes is not None and length.isdigit() and int(length) > max_bytes:
+            raise ResponseTooLarge(
+                f"Response from {response.url} is {length} bytes, limit is {max_bytes}"
+            )
+        total = 0
+        for chunk in response.iter_content(chunk_size):
+            total += len(chunk)
+            if max_bytes is not None and total > max_bytes:
+                raise ResponseTooLarge(
+                    f"Response from {response.url} exceeds the limit of {max_bytes} bytes"
+                )
+            yield chunk
+    finally:
+        response.close()
+
+
+def read_limited(response: requests.Response, max_bytes: Optional[int]) -> bytes:
+    """Тело ответа целиком, но не больше ``max_bytes`` (см. ``iter_limited``)"""
+    return b"".join(iter_limited(response, max_bytes))
+
+
+class _RateLimit:
+    """Состояние лимита запросов одного хоста по заголовкам X-RateLimit-*"""
+
+    __slots__ = ("remaining", "reset")
+
+    def __init__(self) -> None:
+        self.remaining: Optional[int] = None
+        self.reset: float = 0.0
+
+
+class HttpClient:
+    """HTTP-клиент с общим пулом соединений, таймаутами и повторами.
+
+    Запросы повторяются с экспоненциальной паузой при ошибках соединения
+    и ответах 429/5xx (с учетом Retry-After). По заголовкам
+    ``X-RateLimit-Remaining``/``X-RateLimit-Reset`` (GitHub API) клиент
+    замедляет запросы к хосту, когда лимит подходит к концу, и ждет его
+    сброса вместо ответа 403.
+    
+    ``max_bytes`` ограничивает размер тел, которые загрузчик читает через
+    этот клиент (``None`` - без ограничения), см. ``iter_limited``.
+    """
+
+    def __init__(
+        self,
+        timeout: Timeout = (CONNECT_TIMEOUT, READ_TIMEOUT),
+        retries: int = DEFAULT_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_rate_limit_wait: float = MAX_RATE_LIMIT_WAIT,
+        max_bytes: Optional[int] = MAX_RESPONSE_BYTES,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.timeout = timeout
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.max_bytes = max_bytes
+        self._sleep = sleep
+        self._clock = clock
+        self._limits: Dict[str, _RateLimit] = {}
+        self._lock = threading.Lock()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(("GET", "HEAD")),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> HttpClient:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _rate_limit_delay(self, host: str) -> float:
+        """Сколько ждать перед запросом к хосту, чтобы не превысить лимит"""
+        with self._lock:
+            limit = self._limits.get(host)
+            if limit is None or limit.remaining is None:
+                return 0.0
+            window = limit.reset - self._clock()
+            if window <= 0:
+                return 0.0
+            if limit.remaining <= 0:
+                return window
+            if limit.remaining <= RATE_LIMIT_RESERVE:
+                return window / (limit.remaining + 1)
+            return 0.0
+
+    def _update_rate_limit(self, host: str, response: requests.Response) -> None:
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining_value, reset_value = int(remaining), float(reset)
+        except ValueError:
+            return
+        with self._lock:
+            limit = self._limits.setdefault(host, _RateLimit())
+            limit.remaining = remaining_value
+            limit.reset = reset_value
+
+    def _wait(self, host: str) -> None:
+        delay = self._rate_limit_delay(host)
+        if delay > self.max_rate_limit_wait:
+            raise RateLimitError(
+                f"Rate limit for {host} is exhausted, resets in {delay:.0f}s"
+            )
+        if delay > 0:
+            self._sleep(delay)
+
+    @staticmethod
+    def _is_rate_limited(response: requests.Response) -> bool:
+        return (
+            response.status_code in (403, 429)
+            and response.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET с таймаутом по умолчанию, повторами и учетом лимита запросов"""
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlparse(url).netloc
+        self._wait(host)
+        response = self.session.get(url, **kwargs)
+        self._update_rate_limit(host, response)
+        if self._is_rate_limited(response):
+            # Лимит исчерпан другими клиентами: ждем сброса и повторяем один раз
+            self._wait(host)
+            response = self.session.get(url, **kwargs)
+            self._update_rate_limit(host, response)
+        return response
+
+
+_default_client: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Общий клиент процесса, создается при первом обращении"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
+
+
+def set_client(client: Optional[HttpClient]) -> None:
+    """Заменяет общий клиент (``None`` - создать заново с настройками по умолчанию)"""
+    global _default_client
+    with _default_lock:
+        previous, _default_client = _default_client, client
+    if previous is not None and previous is not client:
+        previous.close()
@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import hashlib
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+
+from .cache import HttpCache, default_cache_dir, process_temp_dir, prune_lru, touch, write_atomic
+from .models import Slide, is_image
+
+DEFAULT_IMAGE_WORKERS = 8
+IMAGE_TIMEOUT = 10
+
+# Параметры оптимизации изображений перед встраиванием
+DEFAULT_IMAGE_DPI = 150
+DEFAULT_IMAGE_QUALITY = 85
+DEFAULT_OPTIMIZED_CACHE_BYTES = 512 * 1024 * 1024
+# Размер слайда шаблона python-pptx по умолчанию (10 x 7.5 дюйма) в EMU
+DEFAULT_SLIDE_SIZE = (9144000, 6858000)
+EMU_PER_INCH = 914400
+# Увеличивается при изменении алгоритма оптимизации: сбрасывает кэш
+OPTIMIZER_VERSION = "1"
+# DPI по умолчанию, если в файле он не указан (как в python-pptx)
+DEFAULT_NATIVE_DPI = 72
+
+# Маркеры JPEG SOFn (кроме DHT, JPG и DAC), в которых записан размер кадра
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def is_remote(src: str) -> bool:
+    return src.startswith("http://") or src.startswith("https://")
+
+
+def _download(
+    session: requests.Session,
+    url: str,
+    cache: Optional[HttpCache],
+    folder: Path,
+) -> Optional[str]:
+    """Загружает одно изображение, при ошибке возвращает None.
+
+    С ``cache`` изображение берется из кэша (с перепроверкой по ETag и
+    Last-Modified). Без него, а также для ответов no-store, которые кэш не
+    хранит, тело пишется в ``folder`` под своим хэшем.
+    """
+    try:
+        suffix = Path(urlparse(url).path).suffix or ".img"
+        if cache is not None:
+            body = cache.fetch(session, url, suffix=suffix, timeout=IMAGE_TIMEOUT)
+            if body.path is not None:
+                return str(body.path)
+            content = body.content
+        else:
+            response = session.get(url, timeout=IMAGE_TIMEOUT)
+            response.raise_for_status()
+            content = response.content
+        path = folder / f"{hashlib.sha256(content).hexdigest()}{suffix}"
+        if not path.exists():
+            write_atomic(path, content)
+        return str(path)
+    except Exception as e:
+        print(f"⚠️  Не удалось загрузить изображение {url}: {e}")
+        return None
+
+
+def download_images(
+    urls: Iterable[str],
+    workers: int = DEFAULT_IMAGE_WORKERS,
+    cache: Optional[HttpCache] = None,
+    folder: Optional[Union[str, Path]] = None,
+) -> Dict[str, Optional[str]]:
+    """Параллельно загружает изображения по URL.
+
+    Каждый уникальный URL загружается один раз пулом из не более чем
+    ``workers`` потоков с общими соединениями. Возвращает словарь
+    URL -> локальный путь (``None`` для неудачных загрузок). С ``cache``
+    неизмененные изображения повторно не скачиваются; вытеснение из кэша
+    (``cache.prune()``) вызывающий выполняет один раз за сборку.
+
+    Изображения вне кэша пишутся в ``folder``: сборка передает свой
+    временный каталог и удаляет его после записи презентации. Без
+    ``folder`` используется общий временный каталог процесса
+    (``cache.process_temp_dir``).
+    """
+    unique = list(dict.fromkeys(urls))
+    if not unique:
+        return {}
+    
+    folder = Path(folder) if folder else process_temp_dir()
+    workers = max(1, min(workers, len(unique)))
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            paths = dict(zip(
+                unique, pool.map(lambda url: _download(session, url, cache, folder), unique)
+            ))
+    return paths
+
+
+class ImageInfo(NamedTuple):
+    """Размер изображения в пикселях и его DPI по горизонтали и вертикали"""
+    width: int
+    height: int
+    dpi: Tuple[int, int] = (DEFAULT_NATIVE_DPI, DEFAULT_NATIVE_DPI)
+    
+    @property
+    def native_size(self) -> Tuple[int, int]:
+        """Исходный размер в EMU (так же, как считает python-pptx)"""
+        return (
+            int(EMU_PER_INCH * self.width / self.dpi[0]),
+            int(EMU_PER_INCH * self.height / self.dpi[1]),
+        )
+
+
+def _normalize_dpi(value: float) -> int:
+    dpi = int(round(value))
+    return dpi if 1 <= dpi <= 2048 else DEFAULT_NATIVE_DPI
+
+
+def _probe_png(f: BinaryIO) -> Optional[ImageInfo]:
+    f.seek(8)
+    length, kind = struct.unpack(">I4s", f.read(8))
+    if kind != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", f.read(8))
+    f.seek(length - 8 + 4, 1)
+    # pHYs, если есть, идет до первого IDAT
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, kind = struct.unpack(">I4s", header)
+        if kind == b"pHYs":
+            x, y, unit = struct.unpack(">IIB", f.read(9))
+            if unit == 1:
+                dpi = (_normalize_dpi(x * 0.0254), _normalize_dpi(y * 0.0254))
+                return ImageInfo(width, height, dpi)
+            break
+        if kind in (b"IDAT", b"IEND"):
+            break
+        f.seek(length + 4, 1)
+    return ImageInfo(width, height)
+
+
+def _probe_jpeg(f: BinaryIO) -> Optional[ImageInfo]:
+    f.seek(2)
+    dpi = (DEFAULT_NATIVE_DPI, DEFAULT_NATIVE_DPI)
+    while True:
+        byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+        (length,) = struct.unpack(">H", f.read(2))
+        segment = f.read(length - 2)
+        if marker == 0xE0 and segment[:5] == b"JFIF\0" and len(segment) >= 12:
+            unit, x, y = struct.unpack(">BHH", segment[7:12])
+            if unit == 1:
+                dpi = (_normalize_dpi(x), _normalize_dpi(y))
+            elif unit == 2:
+                dpi = (_normalize_dpi(x * 2.54), _normalize_dpi(y * 2.54))
+        elif marker in _JPEG_SOF:
+            height, width = struct.unpack(">HH", segment[1:5])
+            return ImageInfo(width, height, dpi)
+
+
+def _probe_gif(f: BinaryIO) -> Optional[ImageInfo]:
+    f.seek(6)
+    width, height = struct.unpack("<HH", f.read(4))
+    return ImageInfo(width, height)
+
+
+def probe_image(source: Union[str, Path, bytes]) -> Optional[ImageInfo]:
+    """Читает размер и DPI изображения PNG, JPEG или GIF только из заголовков.
+
+    Пиксельные данные не декодируются и не читаются. Возвращает ``None``
+    для других форматов и поврежденных заголовков.
+    """
+    if isinstance(source, bytes):
+        return _probe_stream(BytesIO(source))
+    with open(source, "rb") as f:
+        return _probe_stream(f)
+
+
+def _probe_stream(f: BinaryIO) -> Optional[ImageInfo]:
+    signature = f.read(8)
+    try:
+        if signature == b"\x89PNG\r\n\x1a\n":
+            return _probe_png(f)
+        if signature[:2] == b"\xff\xd8":
+            return _probe_jpeg(f)
+        if signature[:6] in (b"GIF87a", b"GIF89a"):
+            return _probe_gif(f)
+    except struct.error:
+        return None
+    return None
+
+
+def fit_size(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Уменьшает размер с сохранением пропорций, чтобы он поместился в ``box``.
+
+    Изображения меньше области не увеличиваются.
+    """
+    width, height = size
+    max_width, max_height = box
+    if width <= 0 or height <= 0:
+        return size
+    scale = min(1.0, max_width / width, max_height / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def pixel_budget(dpi: int, slide_size: Tuple[int, int] = DEFAULT_SLIDE_SIZE) -> Tuple[int, int]:
+    """Максимальный размер изображения в пикселях для слайда при заданном DPI"""
+    width, height = slide_size
+    return (
+        max(1, round(width / EMU_PER_INCH * dpi)),
+        max(1, round(height / EMU_PER_INCH * dpi)),
+    )
+
+
+def _recompress(data: bytes, budget: Tuple[int, int], quality: int) -> Optional[Tuple[bytes, str]]:
+    """Уменьшает и пережимает изображение; None, если оригинал лучше оставить"""
+    with Image.open(BytesIO(data)) as im:
+        if getattr(im, "is_animated", False):
+            return None
+        source_format = im.format
+        resized = im.width > budget[0] or im.height > budget[1]
+        if not resized and source_format not in ("JPEG", "PNG"):
+            return None
+        
+        im = ImageOps.exif_transpose(im)
+        if resized:
+            im.thumbnail(budget, Image.LANCZOS)
+        
+        out = BytesIO()
+        has_alpha = im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info
+        if source_format == "JPEG" or not (has_alpha or source_format == "PNG"):
+            if im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            im.save(out, "JPEG", quality=quality, optimize=True)
+            suffix = ".jpg"
+        else:
+            im.save(out, "PNG", optimize=True)
+            suffix = ".png"
+    
+    optimized = out.getvalue()
+    if not resized and len(optimized) >= len(data):
+        return None
+    return optimized, suffix
+
+
+class ImageOptimizer:
+    """Уменьшает изображения до пиксельного бюджета слайда и пережимает их.
+
+    Результат кэшируется на диске по хэшу исходных байтов и параметров,
+    поэтому каждое уникальное изображение обрабатывается один раз. Если
+    оптимизация не дает выигрыша, используется исходный файл.
+    
+    Без ``cache_dir`` результаты пишутся во временный каталог, который
+    удаляется в ``close()``: вызывать его нужно после сборки презентации,
+    пока билдер еще читает оптимизированные файлы.
+    """
+    
+    def __init__(
+        self,
+        dpi: int = DEFAULT_IMAGE_DPI,
+        quality: int = DEFAULT_IMAGE_QUALITY,
+        slide_size: Tuple[int, int] = DEFAULT_SLIDE_SIZE,
+        cache_dir: Optional[Union[str, Path]] = None,
+        max_bytes: int = DEFAULT_OPTIMIZED_CACHE_BYTES,
+    ) -> None:
+        self.dpi = dpi
+        self.quality = quality
+        self.budget = pixel_budget(dpi, slide_size)
+        self._tmp: Optional[TemporaryDirectory] = None
+        if cache_dir:
+            self.root = Path(cache_dir) / "optimized"
+        else:
+            self._tmp = TemporaryDirectory(prefix="md2pptx-")
+            self.root = Path(self._tmp.name)
+        self.max_bytes = max_bytes
+        self._memo: Dict[str, str] = {}
+    
+    def _key(self, data: bytes) -> str:
+        digest = hashlib.sha256(data)
+        digest.update(
+            f"\0{OPTIMIZER_VERSION}:{self.budget[0]}x{self.budget[1]}:{self.quality}".encode()
+        )
+        return digest.hexdigest()
+    
+    def optimize(self, src: str) -> str:
+        """Возвращает путь к оптимизированной копии изображения (или исходный путь)"""
+        if src in self._memo:
+            return self._memo[src]
+        
+        result = src
+        try:
+            data = Path(src).read_bytes()
+            key = self._key(data)
+            folder = self.root / key[:2]
+            cached = next(folder.glob(f"{key}.*"), None) if folder.exists() else None
+            if cached is None:
+                recompressed = _recompress(data, self.budget, self.quality)
+                if recompressed is None:
+                    # Пустой маркер: оптимизация этого изображения не нужна
+                    cached = folder / f"{key}.keep"
+                    write_atomic(cached, b"")
+                else:
+                    optimized, suffix = recompressed
+                    cached = folder / f"{key}{suffix}"
+                    write_atomic(cached, optimized)
+            else:
+                touch(cached)
+            if cached.suffix != ".keep":
+                result = str(cached)
+        except Exception as e:
+            print(f"⚠️  Не удалось оптимизировать изображение {src}: {e}")
+        
+        self._memo[src] = result
+        return result
+    
+    def prune(self) -> int:
+        if not self.root.exists():
+            return 0
+        return prune_lru(self.root, self.max_bytes)
+    
+    def close(self) -> None:
+        """Удаляет временный каталог (постоянный кэш не трогается)"""
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+        self._memo.clear()
+    
+    def __enter__(self) -> ImageOptimizer:
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def iter_optimized(slides: Iterable[Slide], optimizer: ImageOptimizer) -> Iterator[Slide]:
+    """Лениво оптимизирует изображения слайдов (для потоковой сборки)"""
+    for slide in slides:
+        blocks = [
+            type(block)(src=optimizer.optimize(block.src), alt=block.alt)
+            if is_image(block) else block
+            for block in slide.blocks
+        ]
+        yield type(slide)(title=slide.title, blocks=blocks, notes=slide.notes)
+
+
+def optimize_images(
+    slides: Iterable[Slide],
+    optimizer: Optional[ImageOptimizer] = None,
+) -> List[Slide]:
+    """Этап конвейера между парсером и билдером: оптимизирует изображения слайдов.
+    
+    Без ``optimizer`` используется постоянный кэш по умолчанию: результат
+    ссылается на файлы, которые должны пережить этот вызов.
+    """
+    optimizer = optimizer or ImageOptimizer(cache_dir=default_cache_dir())
+    result = list(iter_optimized(slides, optimizer))
+    optimizer.prune()
+    return result
@@ -0,0 +1,189 @@
+"""Директивы включения фрагментов Markdown: ``<!-- include: источник -->``.
+
+Директива занимает отдельную строку и заменяется содержимым фрагмента.
+Источник - путь к файлу, URL или Gist ID, как у ``fetch_markdown``;
+относительные пути разрешаются от включающего документа. Внутри блоков
+кода и front matter директивы не действуют.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+
+from .cache import HttpCache
+from .fetcher import DEFAULT_FETCH_CONCURRENCY, GIST_RE, _fetch_source, _is_url
+from .httpclient import HttpClient, get_client
+from .splitter import CONTENT, classify_lines
+
+INCLUDE_RE = re.compile(r"^[ \t]*<!--[ \t]*include:[ \t]*(\S.*?)[ \t]*-->[ \t]*$")
+MAX_INCLUDE_DEPTH = 16
+
+
+class IncludeError(ValueError):
+    """Цикл включений, слишком глубокая вложенность или недопустимый источник"""
+
+
+class _Fragment(NamedTuple):
+    # (mtime_ns, размер) для локальных файлов; None - проверяется через HTTP-кэш
+    stamp: Optional[Tuple[int, int]]
+    text: str
+    # (номер строки, источник) для каждой директивы фрагмента
+    includes: List[Tuple[int, str]]
+
+
+def _is_remote(source: str) -> bool:
+    return _is_url(source) or bool(GIST_RE.match(source))
+
+
+def _resolve_target(target: str, base: Optional[str]) -> str:
+    """Абсолютный источник фрагмента относительно включающего документа"""
+    if _is_remote(target):
+        return target
+    if base is not None and _is_url(base):
+        return urljoin(base, target)
+    if base is not None and GIST_RE.match(base):
+        raise IncludeError(f"Relative include {target!r} in gist {base} cannot be resolved")
+    if base is not None and not os.path.isabs(target):
+        target = os.path.join(os.path.dirname(base), target)
+    return os.path.abspath(target)
+
+
+def find_includes(text: str, base: Optional[str] = None) -> List[Tuple[int, str]]:
+    """Директивы включения текста: (номер строки, разрешенный источник)"""
+    includes = []
+    lines = text.split("\n")
+    for (number, line), kind in classify_lines(enumerate(lines), lambda item: item[1]):
+        if kind != CONTENT:
+            continue
+        match = INCLUDE_RE.match(line)
+        if match:
+            source = _resolve_target(match.group(1), base)
+            if base is not None and _is_remote(base) and not _is_remote(source):
+                raise IncludeError(f"Remote document {base} cannot include local file {source}")
+            includes.append((number, source))
+    return includes
+
+
+class IncludeResolver:
+    """Разворачивает директивы включения, загружая фрагменты параллельно.
+
+    Граф зависимостей (``graph``: источник -> включаемые источники) и
+    загруженные фрагменты хранятся между вызовами. При повторной сборке
+    локальный фрагмент перечитывается, только если изменились его время
+    изменения или размер; удаленные фрагменты берутся из ``cache``: свежие
+    по Cache-Control записи - без запроса, устаревшие перепроверяются
+    условным запросом с ответом 304. Сам документ, как и в
+    ``fetch_markdown``, перепроверяется всегда. Фрагменты одного уровня
+    вложенности загружаются одновременно.
+    """
+
+    def __init__(
+        self,
+        client: Optional[HttpClient] = None,
+        cache: Optional[HttpCache] = None,
+        concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        max_depth: int = MAX_INCLUDE_DEPTH,
+    ) -> None:
+        self.client = client
+        self.cache = cache
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.graph: Dict[str, List[str]] = {}
+        self._fragments: Dict[str, _Fragment] = {}
+
+    def _load(self, source: str) -> _Fragment:
+        """Загружает фрагмент, если он изменился с прошлой загрузки"""
+        cached = self._fragments.get(source)
+        stamp = None
+        if not _is_remote(source):
+            stat = os.stat(source)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if cached is not None and cached.stamp == stamp:
+                return cached
+        # Фрагмент, свежий по Cache-Control, берется из кэша без запроса
+        text = _fetch_source(source, self.client or get_client(), self.cache, revalidate=False)
+        return _Fragment(stamp, text, find_includes(text, source))
+
+    def _load_all(self, sources: List[str]) -> None:
+        """Загружает фрагменты и все их зависимости уровнями, параллельно"""
+        seen = set()
+        level = list(dict.fromkeys(sources))
+        while level:
+            seen.update(level)
+            workers = max(1, min(self.concurrency, len(level)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                fragments = list(pool.map(self._load, level))
+            next_level = []
+            for source, fragment in zip(level, fragments):
+                self._fragments[source] = fragment
+                self.graph[source] = [target for _, target in fragment.includes]
+                next_level.extend(t for t in self.graph[source] if t not in seen)
+            level = list(dict.fromkeys(next_level))
+
+    def _expand(self, text: str, includes: List[Tuple[int, str]], stack: List[str]) -> str:
+        if not includes:
+            return text
+        if len(stack) > self.max_depth:
+            raise IncludeError(f"Includes are nested deeper than {self.max_depth}: {' -> '.join(stack)}")
+        lines = text.split("\n")
+        for number, source in includes:
+            if source in stack:
+                raise IncludeError(f"Include cycle: {' -> '.join(stack[stack.index(source):] + [source])}")
+            fragment = self._fragments[source]
+            lines[number] = self._expand(fragment.text, fragment.includes, stack + [source]).strip("\n")
+        return "\n".join(lines)
+
+    def resolve(self, text: str, source: Optional[str] = None) -> str:
+        """Разворачивает включения в тексте документа ``source``"""
+        includes = find_includes(text, source)
+        if not includes:
+            return text
+        root = source if source is not None and _is_remote(source) else (
+            os.path.abspath(source) if source is not None else "<document>"
+        )
+        self.graph[root] = [target for _, target in includes]
+        self._load_all(self.graph[root])
+        result = self._expand(text, includes, [root])
+        if self.cache is not None:
+            self.cache.prune()
+        return result
+
+    def fetch(self, source: str) -> str:
+        """Загружает документ (см. ``fetch_markdown``) и разворачивает его включения"""
+        if _is_remote(source):
+            text = _fetch_source(source, self.client or get_client(), self.cache)
+            return self.resolve(text, source)
+
+        source = os.path.abspath(source)
+        self._load_all([source])
+        fragment = self._fragments[source]
+        result = self._expand(fragment.text, fragment.includes, [source])
+        if self.cache is not None:
+            self.cache.prune()
+        return result
+
+    def dependencies(self, source: str) -> List[str]:
+        """Все фрагменты, от которых (транзитивно) зависит источник"""
+        result: List[str] = []
+        stack = list(reversed(self.graph.get(source, [])))
+        while stack:
+            target = stack.pop()
+            if target in result:
+                continue
+            result.append(target)
+            stack.extend(reversed(self.graph.get(target, [])))
+        return result
+
+
+def resolve_includes(
+    text: str,
+    source: Optional[str] = None,
+    client: Optional[HttpClient] = None,
+    cache: Optional[HttpCache] = None,
+) -> str:
+    """Разворачивает директивы включения в тексте (разовый ``IncludeResolver``)"""
+    return IncludeResolver(client, cache).resolve(text, source)
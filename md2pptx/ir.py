@@ -0,0 +1,198 @@
+"""Промежуточное представление слайдов (IR) на диске.
+
+Позволяет разобрать Markdown один раз и собирать презентации из
+результата многократно: с разными шаблонами и на разных машинах.
+Изображения в IR хранятся неразрешенными (URL и исходные пути), а
+диаграммы - исходниками; загрузка и рендеринг выполняются при сборке.
+
+Двоичный формат (все целые - little-endian)::
+
+    magic b"M2PI" | version u16 | flags u16 | payload
+
+Флаг ``FLAG_ZLIB`` означает, что payload сжат zlib. Payload::
+
+    slide_count u32, затем для каждого слайда:
+        title str | notes str | block_count u32 | блоки
+    блок: kind u8 (1 - текст, 2 - изображение, 3 - диаграмма)
+        текст: text str | bullet_count u32 (NONE - нет списка) | str...
+        изображение: src str | alt str
+        диаграмма: code str | lang str
+    str: длина u32 (NONE - None) | байты UTF-8
+
+JSON-вариант предназначен для отладки и просмотра глазами.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+from .models import (
+    DiagramRecord, ImageRecord, Slide, SlideRecord, TextRecord, block_kind, slide_from_dict, slide_to_dict,
+)
+
+IR_VERSION = 1
+IR_FORMATS = ("binary", "json")
+
+MAGIC = b"M2PI"
+FLAG_ZLIB = 0x1
+JSON_FORMAT_NAME = "md2pptx-ir"
+
+_HEADER = struct.Struct("<4sHH")
+_U32 = struct.Struct("<I")
+_U8 = struct.Struct("<B")
+NONE = 0xFFFFFFFF
+
+_KIND_CODES = {"text": 1, "image": 2, "diagram": 3}
+
+
+def _pack_str(out: List[bytes], value: Optional[str]) -> None:
+    if value is None:
+        out.append(_U32.pack(NONE))
+        return
+    data = value.encode("utf-8")
+    out.append(_U32.pack(len(data)))
+    out.append(data)
+
+
+def _encode_payload(slides: Iterable[Slide]) -> bytes:
+    slides = list(slides)
+    out: List[bytes] = [_U32.pack(len(slides))]
+    for slide in slides:
+        _pack_str(out, slide.title)
+        _pack_str(out, slide.notes)
+        out.append(_U32.pack(len(slide.blocks)))
+        for block in slide.blocks:
+            kind = block_kind(block)
+            out.append(_U8.pack(_KIND_CODES[kind]))
+            if kind == "text":
+                _pack_str(out, block.text)
+                if block.bullets is None:
+                    out.append(_U32.pack(NONE))
+                else:
+                    out.append(_U32.pack(len(block.bullets)))
+                    for bullet in block.bullets:
+                        _pack_str(out, bullet)
+            elif kind == "image":
+                _pack_str(out, block.src)
+                _pack_str(out, block.alt)
+            else:
+                _pack_str(out, block.code)
+                _pack_str(out, block.lang)
+    return b"".join(out)
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data = memoryview(data)
+        self.pos = 0
+    
+    def u8(self) -> int:
+        (value,) = _U8.unpack_from(self.data, self.pos)
+        self.pos += _U8.size
+        return value
+    
+    def u32(self) -> int:
+        (value,) = _U32.unpack_from(self.data, self.pos)
+        self.pos += _U32.size
+        return value
+    
+    def str(self) -> Optional[str]:
+        length = self.u32()
+        if length == NONE:
+            return None
+        end = self.pos + length
+        if end > len(self.data):
+            raise ValueError("Truncated IR payload")
+        value = str(self.data[self.pos:end], "utf-8")
+        self.pos = end
+        return value
+
+
+def _decode_payload(payload: bytes) -> List[SlideRecord]:
+    reader = _Reader(payload)
+    slides = []
+    for _ in range(reader.u32()):
+        title = reader.str()
+        notes = reader.str()
+        blocks = []
+        for _ in range(reader.u32()):
+            kind = reader.u8()
+            if kind == _KIND_CODES["text"]:
+                text = reader.str()
+                count = reader.u32()
+                bullets = None if count == NONE else [reader.str() for _ in range(count)]
+                blocks.append(TextRecord(text=text, bullets=bullets))
+            elif kind == _KIND_CODES["image"]:
+                blocks.append(ImageRecord(src=reader.str(), alt=reader.str()))
+            elif kind == _KIND_CODES["diagram"]:
+                blocks.append(DiagramRecord(code=reader.str(), lang=reader.str()))
+            else:
+                raise ValueError(f"Unknown IR block kind: {kind}")
+        slides.append(SlideRecord(title=title, blocks=blocks, notes=notes))
+    return slides
+
+
+def encode_ir(slides: Iterable[Slide], fmt: str = "binary", compress: bool = True) -> bytes:
+    """Кодирует слайды (модели или записи) в IR"""
+    if fmt == "json":
+        data = {
+            "format": JSON_FORMAT_NAME,
+            "version": IR_VERSION,
+            "slides": [slide_to_dict(slide) for slide in slides],
+        }
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    if fmt != "binary":
+        raise ValueError(f"Unknown IR format: {fmt}. Available: {IR_FORMATS}")
+    
+    payload = _encode_payload(slides)
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload)
+        flags |= FLAG_ZLIB
+    return _HEADER.pack(MAGIC, IR_VERSION, flags) + payload
+
+
+def decode_ir(data: bytes) -> List[SlideRecord]:
+    """Декодирует IR в записи слайдов, определяя формат по содержимому"""
+    if data.startswith(MAGIC):
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated IR header")
+        _, version, flags = _HEADER.unpack_from(data)
+        if version != IR_VERSION:
+            raise ValueError(f"Unsupported IR version: {version} (expected {IR_VERSION})")
+        payload = data[_HEADER.size:]
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        try:
+            return _decode_payload(payload)
+        except struct.error as e:
+            raise ValueError(f"Truncated IR payload: {e}")
+    
+    try:
+        document = json.loads(data.decode("utf-8"))
+    except ValueError as e:
+        raise ValueError(f"Not an md2pptx IR file: {e}")
+    if not isinstance(document, dict) or document.get("format") != JSON_FORMAT_NAME:
+        raise ValueError("Not an md2pptx IR file")
+    if document.get("version") != IR_VERSION:
+        raise ValueError(f"Unsupported IR version: {document.get('version')} (expected {IR_VERSION})")
+    return [slide_from_dict(slide) for slide in document["slides"]]
+
+
+def ir_format_for(path: Union[str, Path]) -> str:
+    """Формат IR по расширению файла: ``.json`` - JSON, иначе двоичный"""
+    return "json" if Path(path).suffix.lower() == ".json" else "binary"
+
+
+def dump_ir(slides: Iterable[Slide], path: Union[str, Path], fmt: Optional[str] = None) -> None:
+    """Сохраняет слайды в файл IR"""
+    Path(path).write_bytes(encode_ir(slides, fmt or ir_format_for(path)))
+
+
+def load_ir(path: Union[str, Path]) -> List[SlideRecord]:
+    """Загружает записи слайдов из файла IR (двоичного или JSON)"""
+    return decode_ir(Path(path).read_bytes())
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Iterable, List, Optional, Union
 from pydantic import BaseModel
 
 class ImageBlock(BaseModel):
@@ -11,7 +11,179 @@ class TextBlock(BaseModel):
     text: str
     bullets: Optional[List[str]] = None
 
+class DiagramBlock(BaseModel):
+    code: str
+    lang: str = "plantuml"
+
 class SlideModel(BaseModel):
     title: Optional[str]
     blocks: List[BaseModel]
     notes: Optional[str] = None
+
+
+class _Record:
+    """Компактное представление модели без валидации и без ``__dict__``.
+
+    Используется на горячем пути парсер → билдер; на границе публичного API
+    записи явно преобразуются в модели pydantic и обратно.
+    """
+    
+    __slots__ = ()
+    model: type = BaseModel
+    
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class ImageRecord(_Record):
+    __slots__ = ("src", "alt")
+    model = ImageBlock
+    
+    def __init__(self, src: str, alt: str = "") -> None:
+        self.src = src
+        self.alt = alt
+    
+    def to_model(self) -> ImageBlock:
+        return ImageBlock(src=self.src, alt=self.alt)
+
+
+class TextRecord(_Record):
+    __slots__ = ("text", "bullets")
+    model = TextBlock
+    
+    def __init__(self, text: str, bullets: Optional[List[str]] = None) -> None:
+        self.text = text
+        self.bullets = bullets
+    
+    def to_model(self) -> TextBlock:
+        return TextBlock(text=self.text, bullets=self.bullets)
+
+
+class DiagramRecord(_Record):
+    __slots__ = ("code", "lang")
+    model = DiagramBlock
+    
+    def __init__(self, code: str, lang: str = "plantuml") -> None:
+        self.code = code
+        self.lang = lang
+    
+    def to_model(self) -> DiagramBlock:
+        return DiagramBlock(code=self.code, lang=self.lang)
+
+
+class SlideRecord(_Record):
+    __slots__ = ("title", "blocks", "notes")
+    model = SlideModel
+    
+    def __init__(
+        self,
+        title: Optional[str],
+        blocks: List[_Record],
+        notes: Optional[str] = None,
+    ) -> None:
+        self.title = title
+        self.blocks = blocks
+        self.notes = notes
+    
+    def to_model(self) -> SlideModel:
+        return SlideModel(
+            title=self.title,
+            blocks=[block.to_model() for block in self.blocks],
+            notes=self.notes,
+        )
+
+
+Block = Union[TextBlock, ImageBlock, DiagramBlock, TextRecord, ImageRecord, DiagramRecord]
+Slide = Union[SlideModel, SlideRecord]
+
+BLOCK_TYPES = {"text": TextBlock, "image": ImageBlock, "diagram": DiagramBlock}
+RECORD_TYPES = {"text": TextRecord, "image": ImageRecord, "diagram": DiagramRecord}
+_RECORD_BY_MODEL = {record.model: record for record in RECORD_TYPES.values()}
+
+
+def block_kind(block: Block) -> str:
+    """Имя типа блока (``"text"``, ``"image"``, ``"diagram"``) для модели или записи"""
+    for kind, cls in BLOCK_TYPES.items():
+        if isinstance(block, (cls, RECORD_TYPES[kind])):
+            return kind
+    raise TypeError(f"Unsupported block type: {type(block).__name__}")
+
+
+def is_text(block: Block) -> bool:
+    return isinstance(block, (TextRecord, TextBlock))
+
+
+def is_image(block: Block) -> bool:
+    return isinstance(block, (ImageRecord, ImageBlock))
+
+
+def is_diagram(block: Block) -> bool:
+    return isinstance(block, (DiagramRecord, DiagramBlock))
+
+
+def block_to_record(block: Block) -> _Record:
+    if isinstance(block, _Record):
+        return block
+    try:
+        record = _RECORD_BY_MODEL[type(block)]
+    except KeyError:
+        raise TypeError(f"Unsupported block type: {type(block).__name__}")
+    return record(**{name: getattr(block, name) for name in record.__slots__})
+
+
+def slide_to_record(slide: Slide) -> SlideRecord:
+    if isinstance(slide, SlideRecord):
+        return slide
+    return SlideRecord(
+        title=slide.title,
+        blocks=[block_to_record(block) for block in slide.blocks],
+        notes=slide.notes,
+    )
+
+
+def to_models(slides: Iterable[Slide]) -> List[SlideModel]:
+    """Преобразует записи в модели pydantic (модели возвращаются как есть)"""
+    return [slide if isinstance(slide, SlideModel) else slide.to_model() for slide in slides]
+
+
+def to_records(slides: Iterable[Slide]) -> List[SlideRecord]:
+    """Преобразует модели pydantic в компактные записи"""
+    return [slide_to_record(slide) for slide in slides]
+
+
+def block_to_dict(block: Block) -> dict:
+    kind = block_kind(block)
+    fields = RECORD_TYPES[kind].__slots__
+    return {"type": kind, **{name: getattr(block, name) for name in fields}}
+
+
+def block_from_dict(data: dict) -> _Record:
+    fields = dict(data)
+    block_type = fields.pop("type")
+    try:
+        cls = RECORD_TYPES[block_type]
+    except KeyError:
+        raise ValueError(f"Unknown block type: {block_type}")
+    return cls(**fields)
+
+
+def slide_to_dict(slide: Slide) -> dict:
+    return {
+        "title": slide.title,
+        "blocks": [block_to_dict(block) for block in slide.blocks],
+        "notes": slide.notes,
+    }
+
+
+def slide_from_dict(data: dict) -> SlideRecord:
+    return SlideRecord(
+        title=data.get("title"),
+        blocks=[block_from_dict(block) for block in data.get("blocks", [])],
+        notes=data.get("notes"),
+    )
@@ -0,0 +1,406 @@
+"""Запись пакета PPTX (zip-архива OPC) в обход ``Presentation.save``."""
+
+from __future__ import annotations
+
+import hashlib
+import posixpath
+import re
+import zipfile
+from pathlib import Path
+from typing import IO, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from lxml import etree
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI, PackURI
+from pptx.oxml.ns import qn
+
+from .compat import (
+    PPTX_INTERNALS,
+    PPTX_SUPPORTED,
+    ImagePart,
+    content_types_xml,
+    package_rels_xml,
+    part_rels_xml,
+    release_image,
+    release_notes,
+    release_slide,
+)
+
+# Связи слайда, чьи цели принадлежат только ему и записываются вместе с ним
+_MEDIA_RELS = (RT.IMAGE, RT.MEDIA, RT.VIDEO)
+
+_PRESENTATION = "ppt/presentation.xml"
+_APP_PROPERTIES = "docProps/app.xml"
+_EXTENDED_PROPERTIES_NS = "http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"
+_SLIDE_RE = re.compile(r"ppt/slides/slide(\d+)\.xml$")
+_NOTES_RE = re.compile(r"ppt/notesSlides/notesSlide(\d+)\.xml$")
+_IMAGE_RE = re.compile(r"ppt/media/image(\d+)\.")
+_RID_RE = re.compile(r"rId(\d+)$")
+
+# Уже сжатые форматы: deflate почти не уменьшает их, а время тратит
+_PRECOMPRESSED = frozenset((
+    ".jpeg", ".jpg", ".png", ".gif", ".wdp", ".mp3", ".m4a", ".mp4", ".m4v", ".mov", ".wmv",
+))
+
+
+class CompressionPolicy(NamedTuple):
+    """Сжатие частей пакета при записи zip.
+
+    ``level`` - уровень deflate для XML и прочих частей (``None`` - по
+    умолчанию zlib, ``0`` - без сжатия), ``store_media`` - хранить уже
+    сжатые изображения и медиа без сжатия.
+    """
+    level: Optional[int] = None
+    store_media: bool = False
+    
+    def write(self, archive: zipfile.ZipFile, name: str, blob: bytes) -> None:
+        if self.level == 0 or (self.store_media and posixpath.splitext(name)[1].lower() in _PRECOMPRESSED):
+            archive.writestr(name, blob, compress_type=zipfile.ZIP_STORED)
+        else:
+            archive.writestr(name, blob, compress_type=zipfile.ZIP_DEFLATED, compresslevel=self.level)
+
+
+COMPRESSION_PRESETS: Dict[str, CompressionPolicy] = {
+    # Как Presentation.save: все части deflate с уровнем по умолчанию
+    "default": CompressionPolicy(),
+    "fast": CompressionPolicy(level=1, store_media=True),
+    "small": CompressionPolicy(level=9, store_media=True),
+    "store": CompressionPolicy(level=0, store_media=True),
+}
+DEFAULT_COMPRESSION = "default"
+
+
+def compression_policy(compression: Union[str, CompressionPolicy]) -> CompressionPolicy:
+    """Политика сжатия по имени пресета (см. ``COMPRESSION_PRESETS``)"""
+    if isinstance(compression, CompressionPolicy):
+        return compression
+    try:
+        return COMPRESSION_PRESETS[compression]
+    except KeyError:
+        raise ValueError(
+            f"Unknown compression preset: {compression}. Available: {list(COMPRESSION_PRESETS)}"
+        ) from None
+
+
+def _open_zip(out_file: Union[str, Path, IO[bytes]]) -> zipfile.ZipFile:
+    return zipfile.ZipFile(out_file, "w", compression=zipfile.ZIP_DEFLATED)
+
+
+def _xml_bytes(element) -> bytes:
+    """Сериализует XML части пакета так же, как python-pptx"""
+    return etree.tostring(element, encoding="UTF-8", standalone=True)
+
+
+def save_package(
+    prs,
+    out_file: Union[str, Path, IO[bytes]],
+    compression: Union[str, CompressionPolicy] = DEFAULT_COMPRESSION,
+) -> None:
+    """Сохраняет презентацию как ``Presentation.save``, но со своей политикой сжатия.
+
+    Без поддерживаемой версии python-pptx (см. ``compat``) сохраняет через
+    ``Presentation.save`` со сжатием по умолчанию.
+    """
+    policy = compression_policy(compression)
+    if not PPTX_INTERNALS:
+        if policy != COMPRESSION_PRESETS[DEFAULT_COMPRESSION]:
+            print("⚠️  Пресет сжатия не поддерживается этой версией python-pptx, сохраняю как есть")
+        prs.save(out_file)
+        return
+    
+    package = prs.part.package
+    parts = list(package.iter_parts())
+    with _open_zip(out_file) as archive:
+        policy.write(archive, CONTENT_TYPES_URI.membername, content_types_xml(parts))
+        policy.write(archive, PACKAGE_URI.rels_uri.membername, package_rels_xml(package))
+        for part in parts:
+            policy.write(archive, part.partname.membername, part.blob)
+            rels = part_rels_xml(part)
+            if rels is not None:
+                policy.write(archive, part.partname.rels_uri.membername, rels)
+
+
+class StreamingPackageWriter:
+    """Пишет PPTX в zip по мере готовности слайдов.
+
+    Готовый слайд вместе с его изображениями и заметками сразу
+    сериализуется в архив, после чего его XML и данные изображений
+    освобождаются. До конца в памяти остаются только связи и типы
+    содержимого; общие части (презентация, макеты, шаблоны, темы) и
+    ``[Content_Types].xml`` записываются в ``close()``.
+    
+    Требует поддерживаемую версию python-pptx (``compat.PPTX_INTERNALS``).
+    """
+    
+    def __init__(
+        self,
+        prs,
+        out_file: Union[str, Path, IO[bytes]],
+        compression: Union[str, CompressionPolicy] = DEFAULT_COMPRESSION,
+    ) -> None:
+        if not PPTX_INTERNALS:
+            raise RuntimeError(
+                "Streaming PPTX writer needs python-pptx >= %s, < %s"
+                % tuple(".".join(map(str, version)) for version in PPTX_SUPPORTED)
+            )
+        self._package = prs.part.package
+        self._policy = compression_policy(compression)
+        self._zip = _open_zip(out_file)
+        self._written: Dict[PackURI, str] = {}
+    
+    def __enter__(self) -> StreamingPackageWriter:
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+    
+    def _write_part(self, part) -> None:
+        self._policy.write(self._zip, part.partname.membername, part.blob)
+        rels = part_rels_xml(part)
+        if rels is not None:
+            self._policy.write(self._zip, part.partname.rels_uri.membername, rels)
+        self._written[part.partname] = part.content_type
+    
+    def flush_slide(self, slide) -> None:
+        """Записывает готовый слайд и его собственные части, освобождая память"""
+        slide_part = slide.part
+        for rel in list(slide_part.rels.values()):
+            if rel.is_external or rel.target_part.partname in self._written:
+                continue
+            target = rel.target_part
+            if rel.reltype in _MEDIA_RELS:
+                self._write_part(target)
+                if isinstance(target, ImagePart):
+                    release_image(target)
+            elif rel.reltype == RT.NOTES_SLIDE:
+                self._write_part(target)
+                release_notes(target)
+        
+        self._write_part(slide_part)
+        release_slide(slide_part)
+    
+    def close(self) -> None:
+        """Дописывает оставшиеся части, связи пакета и типы содержимого"""
+        parts = list(self._package.iter_parts())
+        for part in parts:
+            if part.partname not in self._written:
+                self._write_part(part)
+        self._policy.write(self._zip, PACKAGE_URI.rels_uri.membername, package_rels_xml(self._package))
+        self._policy.write(self._zip, CONTENT_TYPES_URI.membername, content_types_xml(parts))
+        self._zip.close()
+
+
+def _part_target(source: str, target: str) -> str:
+    """Имя элемента архива, на который указывает относительная цель связи"""
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+
+
+def _rels_name(member: str) -> str:
+    directory, name = posixpath.split(member)
+    return posixpath.join(directory, "_rels", name + ".rels")
+
+
+def _relative(source: str, member: str) -> str:
+    return posixpath.relpath(member, posixpath.dirname(source))
+
+
+class _ContentTypes:
+    """Типы содержимого пакета: расширения по умолчанию и переопределения"""
+    
+    def __init__(self, xml: bytes) -> None:
+        self.root = etree.fromstring(xml)
+        self.defaults = {el.get("Extension").lower(): el for el in self.root.iter(qn("ct:Default"))}
+        self.overrides = {el.get("PartName"): el for el in self.root.iter(qn("ct:Override"))}
+    
+    def lookup(self, member: str) -> Tuple[str, bool]:
+        """(тип содержимого, задан ли он расширением) для элемента архива"""
+        override = self.overrides.get("/" + member)
+        if override is not None:
+            return override.get("ContentType"), False
+        ext = posixpath.splitext(member)[1][1:].lower()
+        return self.defaults[ext].get("ContentType"), True
+    
+    def add(self, member: str, content_type: str, by_extension: bool) -> None:
+        ext = posixpath.splitext(member)[1][1:].lower()
+        if by_extension and ext not in self.overrides:
+            if ext in self.defaults:
+                return
+            el = etree.Element(qn("ct:Default"), Extension=ext, ContentType=content_type)
+            first_override = next(iter(self.overrides.values()), None)
+            if first_override is not None:
+                first_override.addprevious(el)
+            else:
+                self.root.append(el)
+            self.defaults[ext] = el
+            return
+        el = etree.SubElement(self.root, qn("ct:Override"), PartName="/" + member, ContentType=content_type)
+        self.overrides["/" + member] = el
+
+
+def _slide_members(archive: zipfile.ZipFile) -> List[str]:
+    """Имена элементов слайдов пакета в порядке презентации"""
+    rels = etree.fromstring(archive.read(_rels_name(_PRESENTATION)))
+    targets = {
+        rel.get("Id"): _part_target(_PRESENTATION, rel.get("Target"))
+        for rel in rels.iter(qn("pr:Relationship"))
+    }
+    presentation = etree.fromstring(archive.read(_PRESENTATION))
+    return [targets[el.get(qn("r:id"))] for el in presentation.iter(qn("p:sldId"))]
+
+
+def _next_number(names: Iterable[str], pattern: re.Pattern) -> int:
+    numbers = [int(m.group(1)) for m in map(pattern.match, names) if m]
+    return max(numbers, default=0) + 1
+
+
+class _PackageMerger:
+    """Дописывает слайды пакетов-шардов к базовому пакету на уровне zip.
+
+    Все пакеты собраны из одного шаблона, поэтому макеты, мастера и
+    шаблон заметок у них общие. Переносятся только слайды, их заметки и
+    изображения: имена частей и идентификаторы связей презентации
+    перенумеровываются, одинаковые изображения схлопываются по хэшу.
+    """
+    
+    def __init__(self, base: zipfile.ZipFile) -> None:
+        self.base = base
+        self.parts: Dict[str, bytes] = {}
+        self.content_types = _ContentTypes(base.read(CONTENT_TYPES_URI.membername))
+        self.presentation = etree.fromstring(base.read(_PRESENTATION))
+        self.presentation_rels = etree.fromstring(base.read(_rels_name(_PRESENTATION)))
+        
+        names = base.namelist()
+        self.next_slide = _next_number(names, _SLIDE_RE)
+        self.next_notes = _next_number(names, _NOTES_RE)
+        self.next_image = _next_number(names, _IMAGE_RE)
+        self.next_rid = _next_number(
+            (rel.get("Id") for rel in self.presentation_rels), _RID_RE
+        )
+        self.sld_id_lst = self.presentation.find(qn("p:sldIdLst"))
+        if self.sld_id_lst is None:
+            self.sld_id_lst = etree.SubElement(self.presentation, qn("p:sldIdLst"))
+        self.next_sld_id = max((int(el.get("id")) for el in self.sld_id_lst), default=255) + 1
+        self.media: Dict[str, str] = {}
+        for name in names:
+            if name.startswith("ppt/media/"):
+                self.media.setdefault(hashlib.sha1(base.read(name)).hexdigest(), name)
+    
+    def _add(self, member: str, blob: bytes, shard_types: _ContentTypes, source: str) -> None:
+        self.parts[member] = blob
+        self.content_types.add(member, *shard_types.lookup(source))
+    
+    def _add_media(self, shard: zipfile.ZipFile, shard_types: _ContentTypes, source: str) -> str:
+        blob = shard.read(source)
+        sha1 = hashlib.sha1(blob).hexdigest()
+        member = self.media.get(sha1)
+        if member is None:
+            ext = posixpath.splitext(source)[1]
+            member = self.media[sha1] = f"ppt/media/image{self.next_image}{ext}"
+            self.next_image += 1
+            self._add(member, blob, shard_types, source)
+        return member
+    
+    def append(self, shard: zipfile.ZipFile) -> None:
+        shard_types = _ContentTypes(shard.read(CONTENT_TYPES_URI.membername))
+        for source in _slide_members(shard):
+            member = f"ppt/slides/slide{self.next_slide}.xml"
+            self.next_slide += 1
+            
+            rels = etree.fromstring(shard.read(_rels_name(source)))
+            for rel in rels.iter(qn("pr:Relationship")):
+                if rel.get("TargetMode") == "External":
+                    continue
+                reltype = rel.get("Type")
+                target = _part_target(source, rel.get("Target"))
+                if reltype in _MEDIA_RELS:
+                    rel.set("Target", _relative(member, self._add_media(shard, shard_types, target)))
+                elif reltype == RT.NOTES_SLIDE:
+                    notes = self._append_notes(shard, shard_types, target, member)
+                    rel.set("Target", _relative(member, notes))
+                elif reltype != RT.SLIDE_LAYOUT:
+                    raise ValueError(f"Cannot merge slide relationship of type {reltype}")
+            self._add(member, shard.read(source), shard_types, source)
+            self.parts[_rels_name(member)] = _xml_bytes(rels)
+            
+            rid = f"rId{self.next_rid}"
+            self.next_rid += 1
+            etree.SubElement(
+                self.presentation_rels, qn("pr:Relationship"),
+                Id=rid, Type=RT.SLIDE, Target=_relative(_PRESENTATION, member),
+            )
+            sld_id = etree.SubElement(self.sld_id_lst, qn("p:sldId"))
+            sld_id.set("id", str(self.next_sld_id))
+            sld_id.set(qn("r:id"), rid)
+            self.next_sld_id += 1
+    
+    def _app_properties(self) -> Optional[bytes]:
+        """``docProps/app.xml`` базы с числом слайдов и заметок склеенной колоды"""
+        if _APP_PROPERTIES not in self.base.namelist():
+            return None
+        root = etree.fromstring(self.base.read(_APP_PROPERTIES))
+        names = self.base.namelist() + list(self.parts)
+        counts = {
+            "Slides": len(self.sld_id_lst),
+            "Notes": sum(1 for name in names if _NOTES_RE.match(name)),
+        }
+        for tag, count in counts.items():
+            el = root.find(f"{{{_EXTENDED_PROPERTIES_NS}}}{tag}")
+            if el is not None:
+                el.text = str(count)
+        return _xml_bytes(root)
+    
+    def _append_notes(
+        self, shard: zipfile.ZipFile, shard_types: _ContentTypes, source: str, slide: str
+    ) -> str:
+        member = f"ppt/notesSlides/notesSlide{self.next_notes}.xml"
+        self.next_notes += 1
+        rels = etree.fromstring(shard.read(_rels_name(source)))
+        for rel in rels.iter(qn("pr:Relationship")):
+            reltype = rel.get("Type")
+            if reltype == RT.SLIDE:
+                rel.set("Target", _relative(member, slide))
+            elif reltype != RT.NOTES_MASTER and rel.get("TargetMode") != "External":
+                raise ValueError(f"Cannot merge notes relationship of type {reltype}")
+        self._add(member, shard.read(source), shard_types, source)
+        self.parts[_rels_name(member)] = _xml_bytes(rels)
+        return member
+    
+    def write(self, out_file: Union[str, Path, IO[bytes]], policy: CompressionPolicy) -> None:
+        replaced = {
+            CONTENT_TYPES_URI.membername: _xml_bytes(self.content_types.root),
+            _PRESENTATION: _xml_bytes(self.presentation),
+            _rels_name(_PRESENTATION): _xml_bytes(self.presentation_rels),
+            _APP_PROPERTIES: self._app_properties(),
+        }
+        with _open_zip(out_file) as archive:
+            policy.write(archive, CONTENT_TYPES_URI.membername, replaced[CONTENT_TYPES_URI.membername])
+            for name in self.base.namelist():
+                if name == CONTENT_TYPES_URI.membername:
+                    continue
+                policy.write(archive, name, replaced.get(name) or self.base.read(name))
+            for name, blob in self.parts.items():
+                policy.write(archive, name, blob)
+
+
+def merge_packages(
+    shards: Sequence[Union[str, Path, IO[bytes]]],
+    out_file: Union[str, Path, IO[bytes]],
+    compression: Union[str, CompressionPolicy] = DEFAULT_COMPRESSION,
+) -> None:
+    """Склеивает PPTX-пакеты, собранные из одного шаблона, в один файл.
+
+    Слайды идут в порядке пакетов. Если в каком-либо пакете есть
+    заметки, шаблон заметок должен присутствовать во всех пакетах.
+    Число слайдов и заметок в ``docProps/app.xml`` пересчитывается.
+    """
+    if not shards:
+        raise ValueError("No packages to merge")
+    with zipfile.ZipFile(shards[0]) as base:
+        merger = _PackageMerger(base)
+        for shard in shards[1:]:
+            with zipfile.ZipFile(shard) as archive:
+                merger.append(archive)
+        merger.write(out_file, compression_policy(compression))
@@ -1,17 +1,43 @@
 from __future__ import annotations
 
+import hashlib
+import html as html_lib
+import os
 import re
-from typing import List
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import xml.etree.ElementTree as etree
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from bs4 import BeautifulSoup
 import markdown
-import requests
-from tempfile import NamedTemporaryFile
 from pathlib import Path
 
-from .models import SlideModel, TextBlock, ImageBlock
+from .cache import HttpCache, SlideCache
+from .diagrams import PLANTUML, DiagramCache, render_diagrams, split_diagrams
+from .images import download_images, is_remote
+from .models import DiagramRecord, ImageRecord, Slide, SlideModel, SlideRecord, TextRecord, to_models, to_records
+from .splitter import iter_line_parts, load_slide_index, read_slide, slide_offsets
 
-SEPARATOR = re.compile(r"^---$", re.MULTILINE)
+# Увеличивается при любом изменении результата разбора: сбрасывает кэш слайдов
+PARSER_VERSION = "3"
+
+ENGINES = ("tree", "html")
+DEFAULT_ENGINE = "tree"
+
+# Меньшие документы быстрее разобрать в одном процессе, чем запускать пул
+PARALLEL_MIN_SLIDES = 64
+
+# Сущности, которые сериализатор Markdown оставляет как есть, а BeautifulSoup раскрывает
+_ENTITY_RE = re.compile(r"&(?:\#[0-9]+|\#x[0-9a-f]+|[0-9a-z]+);", re.IGNORECASE)
+_STX = markdown.util.STX
+_TITLE_TAGS = frozenset(("h1", "h2", "h3", "strong"))
+
+# (заголовок, пункты списков, параграфы, [(src, alt)])
+_Extracted = Tuple[Optional[str], List[str], List[str], List[Tuple[str, str]]]
+
+_local = threading.local()
 
 
 def clean_title(title: str) -> str:
@@ -80,76 +106,449 @@ def extract_title_from_content(content: str) -> tuple[str, str]:
     
     return None, content
 
-def parse_markdown(text: str) -> List[SlideModel]:
-    """Парсит Markdown текст в список слайдов с улучшенной обработкой"""
+def _iter_lines(source: Iterable[str]) -> Iterator[str]:
+    """Разбивает поток кусков текста на строки без завершающего перевода строки"""
+    buffer: List[str] = []
+    for chunk in source:
+        *lines, tail = chunk.split("\n")
+        if lines:
+            if buffer:
+                buffer.append(lines[0])
+                lines[0] = "".join(buffer)
+                buffer = []
+            yield from lines
+        if tail:
+            buffer.append(tail)
+    if buffer:
+        yield "".join(buffer)
+
+
+def _iter_parts(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Лениво выдает непустые части документа между разделителями.
+
+    Разделители внутри блоков кода и YAML front matter не учитываются,
+    см. ``md2pptx.splitter``.
+    """
+    if isinstance(source, str):
+        for start, end in slide_offsets(source):
+            yield source[start:end].strip()
+        return
+    yield from iter_line_parts(_iter_lines(source))
+
+
+def _extract_html(content: str, title: Optional[str]) -> _Extracted:
+    """Извлекает содержимое слайда через HTML и BeautifulSoup (эталонный движок)"""
     
-    # Разделяем на части по разделителям
-    parts = [p.strip() for p in SEPARATOR.split(text) if p.strip()]
-    slides: List[SlideModel] = []
+    # Конвертируем в HTML
+    html = markdown.markdown(content)
+    soup = BeautifulSoup(html, "html.parser")
     
-    for i, part in enumerate(parts):
-        # Извлекаем заголовок из содержимого
-        title, content = extract_title_from_content(part)
-        
-        # Конвертируем в HTML
-        html = markdown.markdown(content)
-        soup = BeautifulSoup(html, "html.parser")
-        
-        # Если заголовок не найден, ищем в HTML
-        if not title:
-            title_el = soup.find(["h1", "h2", "h3", "strong"])
-            if title_el:
-                title = clean_title(title_el.get_text(strip=True))
-                # Удаляем элемент заголовка из soup, чтобы не дублировать
-                title_el.decompose()
-        
-        # Если заголовок все еще не найден, создаем автоматический
-        if not title:
-            title = f"Слайд {i + 1}"
-        
-        blocks = []
-        
-        # Обрабатываем списки
-        bullets = []
-        for li in soup.find_all("li"):
-            bullet_text = clean_text(li.get_text(strip=True))
-            if bullet_text:
-                bullets.append(bullet_text)
-        
-        if bullets:
-            blocks.append(TextBlock(text="", bullets=bullets))
-        
-        # Обрабатываем параграфы
-        for p in soup.find_all("p"):
-            p_text = clean_text(p.get_text(strip=True))
-            if p_text:
-                blocks.append(TextBlock(text=p_text))
-        
-        # Обрабатываем изображения
-        for img in soup.find_all("img"):
-            src = img.get("src", "")
-            alt = img.get("alt", "")
-            
-            if src.startswith("http://") or src.startswith("https://"):
-                try:
-                    response = requests.get(src, timeout=10)
-                    response.raise_for_status()
-                    suffix = Path(src).suffix or ".img"
-                    tmp = NamedTemporaryFile(delete=False, suffix=suffix)
-                    tmp.write(response.content)
-                    tmp.flush()
-                    src = tmp.name
-                except Exception as e:
-                    print(f"⚠️  Не удалось загрузить изображение {src}: {e}")
-                    continue
-            elif not Path(src).exists():
-                print(f"⚠️  Изображение не найдено: {src}")
+    # Если заголовок не найден, ищем в HTML
+    if not title:
+        title_el = soup.find(["h1", "h2", "h3", "strong"])
+        if title_el:
+            title = clean_title(title_el.get_text(strip=True))
+            # Удаляем элемент заголовка из soup, чтобы не дублировать
+            title_el.decompose()
+    
+    bullets = [clean_text(li.get_text(strip=True)) for li in soup.find_all("li")]
+    paragraphs = [clean_text(p.get_text(strip=True)) for p in soup.find_all("p")]
+    images = [(img.get("src", ""), img.get("alt", "")) for img in soup.find_all("img")]
+    return title, bullets, paragraphs, images
+
+
+def _markdown_instance() -> markdown.Markdown:
+    """Возвращает экземпляр Markdown, свой для каждого потока"""
+    md = getattr(_local, "md", None)
+    if md is None:
+        md = _local.md = markdown.Markdown()
+    md.reset()
+    return md
+
+
+def _markdown_tree(content: str) -> Optional[etree.Element]:
+    """Строит дерево элементов Markdown без сериализации в HTML.
+
+    Повторяет шаги ``Markdown.convert`` до сериализации. Возвращает ``None``,
+    если в дереве остались плейсхолдеры сырого HTML или сущностей: такие
+    слайды разбираются эталонным движком.
+    """
+    md = _markdown_instance()
+    if not content.strip():
+        return etree.Element(md.doc_tag)
+    
+    lines = content.split("\n")
+    for prep in md.preprocessors:
+        lines = prep.run(lines)
+    root = md.parser.parseDocument(lines).getroot()
+    for treeprocessor in md.treeprocessors:
+        new_root = treeprocessor.run(root)
+        if new_root is not None:
+            root = new_root
+    
+    for el in root.iter():
+        if _STX in (el.text or "") or _STX in (el.tail or ""):
+            return None
+        if any(_STX in value for value in el.attrib.values()):
+            return None
+    return root
+
+
+def _decode_entities(text: str) -> str:
+    """Раскрывает сущности так же, как круговой путь HTML → BeautifulSoup"""
+    if "&" not in text:
+        return text
+    return _ENTITY_RE.sub(lambda m: html_lib.unescape(m.group(0)), text)
+
+
+def _element_text(el: etree.Element, skip: Optional[etree.Element]) -> str:
+    """Аналог ``get_text(strip=True)``: склеивает обрезанные текстовые узлы"""
+    pieces: List[str] = []
+    
+    def walk(node: etree.Element) -> None:
+        if node.text:
+            piece = node.text.strip()
+            if piece:
+                pieces.append(piece)
+        for child in node:
+            if child is not skip:
+                walk(child)
+            if child.tail:
+                piece = child.tail.strip()
+                if piece:
+                    pieces.append(piece)
+    
+    walk(el)
+    return _decode_entities("".join(pieces))
+
+
+def _extract_tree(content: str, title: Optional[str]) -> Optional[_Extracted]:
+    """Извлекает содержимое слайда напрямую из дерева Markdown за один проход"""
+    root = _markdown_tree(content)
+    if root is None:
+        return None
+    
+    # Элемент-заголовок исключается из обхода, как decompose() в эталоне
+    title_el = None
+    if not title:
+        title_el = next((el for el in root.iter() if el.tag in _TITLE_TAGS), None)
+        if title_el is not None:
+            title = clean_title(_element_text(title_el, None))
+    
+    bullets: List[str] = []
+    paragraphs: List[str] = []
+    images: List[Tuple[str, str]] = []
+    stack = list(reversed(root))
+    while stack:
+        el = stack.pop()
+        if el is title_el:
+            continue
+        if el.tag == "li":
+            bullets.append(clean_text(_element_text(el, title_el)))
+        elif el.tag == "p":
+            paragraphs.append(clean_text(_element_text(el, title_el)))
+        elif el.tag == "img":
+            images.append((
+                _decode_entities(el.get("src", "")),
+                _decode_entities(el.get("alt", "")),
+            ))
+        stack.extend(reversed(el))
+    return title, bullets, paragraphs, images
+
+
+def _parse_part(part: str, engine: str = DEFAULT_ENGINE) -> SlideRecord:
+    """Парсит одну часть документа в запись слайда.
+
+    Результат зависит только от текста части и движка, поэтому его можно
+    кэшировать и считать в других процессах. Заголовок по умолчанию и
+    изображения обрабатываются позже, в ``_finish_slide``.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown parser engine: {engine}. Available: {ENGINES}")
+    
+    # Блоки кода диаграмм не доходят до Markdown, см. _finish_slide
+    part, diagrams = split_diagrams(part)
+    
+    # Извлекаем заголовок из содержимого
+    title, content = extract_title_from_content(part)
+    
+    extracted = _extract_tree(content, title) if engine == "tree" else None
+    if extracted is None:
+        extracted = _extract_html(content, title)
+    title, bullets, paragraphs, images = extracted
+    
+    blocks = []
+    
+    # Обрабатываем списки
+    bullets = [b for b in bullets if b]
+    if bullets:
+        blocks.append(TextRecord(text="", bullets=bullets))
+    
+    # Обрабатываем параграфы
+    for p_text in paragraphs:
+        if p_text:
+            blocks.append(TextRecord(text=p_text))
+    
+    # Изображения загружаются отдельно, см. _finish_slide
+    for src, alt in images:
+        blocks.append(ImageRecord(src=src, alt=alt))
+    
+    for lang, code in diagrams:
+        blocks.append(DiagramRecord(code=code, lang=lang))
+    
+    # Создаем слайд
+    return SlideRecord(title=title or None, blocks=blocks)
+
+
+def _cache_key(part: str, engine: str) -> str:
+    """Ключ кэша слайда: хэш части документа, движка и версии парсера"""
+    digest = hashlib.sha256(f"{PARSER_VERSION}\0{engine}\0".encode("utf-8"))
+    digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _parse_cached(part: str, engine: str, cache: Optional[SlideCache]) -> SlideRecord:
+    if cache is None:
+        return _parse_part(part, engine)
+    key = _cache_key(part, engine)
+    slide = cache.get(key)
+    if slide is None:
+        slide = _parse_part(part, engine)
+        cache.put(key, slide)
+    return slide
+
+
+def _remote_images(slides: Iterable[SlideRecord]) -> List[str]:
+    """Собирает URL удаленных изображений слайдов"""
+    return [
+        block.src
+        for slide in slides
+        for block in slide.blocks
+        if isinstance(block, ImageRecord) and is_remote(block.src)
+    ]
+
+
+def _plantuml_sources(slides: Iterable[SlideRecord]) -> List[str]:
+    """Собирает исходники диаграмм PlantUML слайдов"""
+    return [
+        block.code
+        for slide in slides
+        for block in slide.blocks
+        if isinstance(block, DiagramRecord) and block.lang == PLANTUML
+    ]
+
+
+def _resolve_image(src: str, downloaded: Dict[str, Optional[str]]) -> Optional[str]:
+    """Возвращает локальный путь изображения или None, если оно недоступно"""
+    if is_remote(src):
+        return downloaded.get(src)
+    elif not Path(src).exists():
+        print(f"⚠️  Изображение не найдено: {src}")
+        return None
+    return src
+
+
+def _finish_slide(
+    slide: SlideRecord,
+    index: int,
+    downloaded: Optional[Dict[str, Optional[str]]],
+    rendered: Optional[Dict[str, Optional[str]]] = None,
+) -> SlideRecord:
+    """Дополняет слайд заголовком по умолчанию и подставляет пути изображений.
+
+    Удаленные изображения должны быть заранее загружены в ``downloaded``
+    (см. ``download_images``), а диаграммы PlantUML - отрисованы в
+    ``rendered`` (см. ``render_diagrams``) и заменяются изображениями;
+    недоступные изображения и диаграммы пропускаются. При
+    ``downloaded=None`` изображения и диаграммы остаются неразрешенными.
+    """
+    
+    # Если заголовок все еще не найден, создаем автоматический
+    title = slide.title or f"Слайд {index + 1}"
+    if downloaded is None:
+        return SlideRecord(title=title, blocks=slide.blocks, notes=slide.notes)
+    
+    blocks = []
+    for block in slide.blocks:
+        if isinstance(block, ImageRecord):
+            src = _resolve_image(block.src, downloaded)
+            if src is None:
                 continue
-            
-            blocks.append(ImageBlock(src=src, alt=alt))
-        
-        # Создаем слайд
-        slide = SlideModel(title=title, blocks=blocks)
-        slides.append(slide)
+            block = ImageRecord(src=src, alt=block.alt)
+        elif isinstance(block, DiagramRecord) and block.lang == PLANTUML:
+            src = (rendered or {}).get(block.code)
+            if src is None:
+                continue
+            block = ImageRecord(src=src, alt=block.lang)
+        blocks.append(block)
+    return SlideRecord(title=title, blocks=blocks, notes=slide.notes)
+
+
+def resolve_images(
+    slides: Iterable[Slide],
+    image_cache: Optional[HttpCache] = None,
+    diagram_cache: Optional[DiagramCache] = None,
+    image_dir: Optional[Union[str, Path]] = None,
+) -> List[SlideRecord]:
+    """Загружает удаленные изображения и рендерит диаграммы слайдов.
+
+    Нужна для слайдов, разобранных с ``resolve=False`` (например, из IR).
+    Недоступные изображения и диаграммы пропускаются.
+    """
+    slides = to_records(slides)
+    downloaded = download_images(_remote_images(slides), cache=image_cache, folder=image_dir)
+    rendered = render_diagrams(_plantuml_sources(slides), cache=diagram_cache, folder=image_dir)
+    for used in (image_cache, diagram_cache):
+        if used is not None:
+            used.prune()
+    return [_finish_slide(slide, i, downloaded, rendered) for i, slide in enumerate(slides)]
+
+
+def iter_slide_records(
+    source: Union[str, Iterable[str]],
+    engine: str = DEFAULT_ENGINE,
+    cache: Optional[SlideCache] = None,
+    image_cache: Optional[HttpCache] = None,
+    diagram_cache: Optional[DiagramCache] = None,
+    image_dir: Optional[Union[str, Path]] = None,
+) -> Iterator[SlideRecord]:
+    """То же, что ``iter_slides``, но выдает компактные записи без валидации"""
+    for i, part in enumerate(_iter_parts(source)):
+        slide = _parse_cached(part, engine, cache)
+        downloaded = download_images(_remote_images([slide]), cache=image_cache, folder=image_dir)
+        rendered = render_diagrams(_plantuml_sources([slide]), cache=diagram_cache, folder=image_dir)
+        yield _finish_slide(slide, i, downloaded, rendered)
+    for used in (cache, image_cache, diagram_cache):
+        if used is not None:
+            used.prune()
+
+
+def iter_slides(
+    source: Union[str, Iterable[str]],
+    engine: str = DEFAULT_ENGINE,
+    cache: Optional[SlideCache] = None,
+    image_cache: Optional[HttpCache] = None,
+    diagram_cache: Optional[DiagramCache] = None,
+    image_dir: Optional[Union[str, Path]] = None,
+) -> Iterator[SlideModel]:
+    """Потоково парсит Markdown, выдавая слайды по мере чтения разделителей.
+
+    ``source`` может быть строкой, открытым текстовым файлом или любым
+    итератором кусков текста: документ читается построчно и целиком в
+    памяти не удерживается.
+
+    ``engine`` выбирает движок разбора: ``"tree"`` (по умолчанию) идет от
+    дерева Markdown напрямую к блокам, ``"html"`` использует круговой путь
+    через HTML и BeautifulSoup. Результат у обоих движков одинаковый.
+
+    С ``cache`` неизмененные части документа берутся из дискового кэша,
+    с ``image_cache`` неизмененные удаленные изображения не скачиваются,
+    с ``diagram_cache`` неизмененные диаграммы не рендерятся повторно.
+    Удаленные изображения и диаграммы вне кэша пишутся в ``image_dir``
+    (см. ``download_images`` и ``render_diagrams``).
+    """
+    for record in iter_slide_records(source, engine, cache, image_cache, diagram_cache, image_dir):
+        yield record.to_model()
+
+
+def parse_records(
+    text: str,
+    engine: str = DEFAULT_ENGINE,
+    workers: Optional[int] = 1,
+    cache: Optional[SlideCache] = None,
+    image_cache: Optional[HttpCache] = None,
+    resolve: bool = True,
+    diagram_cache: Optional[DiagramCache] = None,
+    image_dir: Optional[Union[str, Path]] = None,
+) -> List[SlideRecord]:
+    """Парсит Markdown в компактные записи слайдов.
+
+    Параметры - как у ``parse_markdown``. Записи без валидации передаются
+    прямо в билдер; ``models.to_models`` преобразует их в модели pydantic.
+    С ``resolve=False`` изображения не загружаются и не проверяются, а
+    диаграммы не рендерятся (см. ``resolve_images``).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    parts = list(_iter_parts(text))
+    slides: List[Optional[SlideRecord]] = [None] * len(parts)
+    keys: List[str] = []
+    if cache is not None:
+        keys = [_cache_key(part, engine) for part in parts]
+        slides = [cache.get(key) for key in keys]
+    
+    missing = [i for i, slide in enumerate(slides) if slide is None]
+    todo = [parts[i] for i in missing]
+    if workers > 1 and len(todo) >= PARALLEL_MIN_SLIDES:
+        chunksize = max(1, len(todo) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_part, todo, repeat(engine), chunksize=chunksize))
+    else:
+        parsed = [_parse_part(part, engine) for part in todo]
     
-    return slides
+    for i, slide in zip(missing, parsed):
+        slides[i] = slide
+        if cache is not None:
+            cache.put(keys[i], slide)
+    if cache is not None and missing:
+        cache.prune()
+    
+    # Все удаленные изображения документа загружаются параллельно,
+    # а все его диаграммы рендерятся одной пачкой
+    downloaded = rendered = None
+    if resolve:
+        downloaded = download_images(_remote_images(slides), cache=image_cache, folder=image_dir)
+        rendered = render_diagrams(_plantuml_sources(slides), cache=diagram_cache, folder=image_dir)
+        for used in (image_cache, diagram_cache):
+            if used is not None:
+                used.prune()
+    return [_finish_slide(slide, i, downloaded, rendered) for i, slide in enumerate(slides)]
+
+
+def parse_markdown(
+    text: str,
+    engine: str = DEFAULT_ENGINE,
+    workers: Optional[int] = 1,
+    cache: Optional[SlideCache] = None,
+    image_cache: Optional[HttpCache] = None,
+    diagram_cache: Optional[DiagramCache] = None,
+    image_dir: Optional[Union[str, Path]] = None,
+) -> List[SlideModel]:
+    """Парсит Markdown текст в список слайдов с улучшенной обработкой.
+
+    При ``workers`` больше 1 (``None`` - по числу ядер) части документа
+    разбираются в пуле процессов. Порядок и результат совпадают с
+    последовательным разбором; небольшие документы (меньше
+    ``PARALLEL_MIN_SLIDES`` слайдов) всегда разбираются последовательно.
+
+    С ``cache`` разбираются только части документа, которых нет в кэше,
+    с ``image_cache`` удаленные изображения берутся из HTTP-кэша, с
+    ``diagram_cache`` - отрисованные ранее диаграммы. Удаленные изображения
+    и диаграммы вне кэша пишутся в ``image_dir`` (см. ``download_images``
+    и ``render_diagrams``).
+    """
+    return to_models(parse_records(
+        text, engine, workers, cache, image_cache, diagram_cache=diagram_cache, image_dir=image_dir
+    ))
+
+
+def parse_slide(
+    path: Union[str, Path],
+    number: int,
+    engine: str = DEFAULT_ENGINE,
+    cache_dir: Optional[Union[str, Path]] = None,
+    image_dir: Optional[Union[str, Path]] = None,
+) -> SlideModel:
+    """Парсит один слайд файла по номеру (с нуля), не читая остальной документ.
+
+    Использует байтовый индекс слайдов, сохраняемый между запусками.
+    Удаленные изображения и диаграммы пишутся в ``image_dir`` (см.
+    ``download_images`` и ``render_diagrams``).
+    """
+    index = load_slide_index(path, cache_dir)
+    part = read_slide(path, number, index)
+    slide = _parse_part(part, engine)
+    downloaded = download_images(_remote_images([slide]), folder=image_dir)
+    rendered = render_diagrams(_plantuml_sources([slide]), folder=image_dir)
+    return _finish_slide(slide, number, downloaded, rendered).to_model()
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import IO, Iterable, Optional, Union
+
+from .builder import build_presentation
+from .cache import HttpCache, SlideCache
+from .diagrams import DiagramCache
+from .fetcher import fetch_markdown, iter_markdown
+from .includes import IncludeResolver
+from .package import DEFAULT_COMPRESSION
+from .parser import DEFAULT_ENGINE, iter_slide_records, parse_records
+from .templates import TemplatePool
+
+OutFile = Union[str, Path, IO[bytes], None]
+
+
+def convert_markdown(
+    text: Union[str, Iterable[str]],
+    out_file: OutFile = None,
+    template: Optional[str] = None,
+    engine: str = DEFAULT_ENGINE,
+    workers: Optional[int] = 1,
+    cache_dir: Optional[Union[str, Path]] = None,
+    streaming: bool = False,
+    pool: Optional[TemplatePool] = None,
+    compression: str = DEFAULT_COMPRESSION,
+) -> Optional[bytes]:
+    """Конвертирует текст Markdown в PPTX.
+
+    Результат пишется в ``out_file`` (путь или двоичный поток) или, если
+    он не указан, возвращается как ``bytes`` без записи на диск.
+    Кэши слайдов, изображений и диаграмм используются только с ``cache_dir``.
+    
+    ``text`` может быть итератором кусков текста (см. ``iter_markdown``):
+    в потоковом режиме слайды разбираются по мере их поступления.
+    """
+    cache = SlideCache(cache_dir) if cache_dir else None
+    image_cache = HttpCache(cache_dir) if cache_dir else None
+    diagram_cache = DiagramCache(cache_dir) if cache_dir else None
+    # Изображения и диаграммы вне кэша живут только до конца сборки
+    with TemporaryDirectory(prefix="md2pptx-") as image_dir:
+        if streaming:
+            slides = iter_slide_records(
+                text, engine, cache=cache, image_cache=image_cache,
+                diagram_cache=diagram_cache, image_dir=image_dir,
+            )
+        else:
+            if not isinstance(text, str):
+                text = "".join(text)
+            slides = parse_records(
+                text, engine, workers, cache=cache, image_cache=image_cache,
+                diagram_cache=diagram_cache, image_dir=image_dir,
+            )
+        return build_presentation(
+            slides,
+            out_file,
+            template=template,
+            streaming=streaming,
+            pool=pool,
+            workers=workers,
+            compression=compression,
+        )
+
+
+def convert(
+    source: str,
+    out_file: OutFile = None,
+    template: Optional[str] = None,
+    engine: str = DEFAULT_ENGINE,
+    workers: Optional[int] = 1,
+    cache_dir: Optional[Union[str, Path]] = None,
+    streaming: bool = False,
+    pool: Optional[TemplatePool] = None,
+    compression: str = DEFAULT_COMPRESSION,
+    all_files: bool = False,
+    includes: bool = False,
+) -> Optional[bytes]:
+    """Загружает Markdown (файл, URL или Gist ID) и конвертирует его в PPTX.
+
+    Параметры - как у ``convert_markdown``; с ``cache_dir`` неизмененный
+    источник перепроверяется условным запросом вместо полной загрузки,
+    с ``all_files`` из Gist собираются все Markdown файлы. В потоковом
+    режиме разбор идет параллельно с загрузкой источника. С ``includes``
+    директивы ``<!-- include: ... -->`` заменяются содержимым фрагментов
+    (см. ``IncludeResolver``).
+    """
+    cache = HttpCache(cache_dir) if cache_dir else None
+    if includes:
+        text = IncludeResolver(cache=cache).fetch(source)
+    else:
+        fetch = iter_markdown if streaming else fetch_markdown
+        text = fetch(source, cache=cache, all_files=all_files)
+    return convert_markdown(
+        text,
+        out_file,
+        template=template,
+        engine=engine,
+        workers=workers,
+        cache_dir=cache_dir,
+        streaming=streaming,
+        pool=pool,
+        compression=compression,
+    )
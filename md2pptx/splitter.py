@@ -0,0 +1,250 @@
+"""Однопроходное разбиение Markdown на слайды с учетом блоков кода и front matter.
+
+Разделитель слайдов - строка ``---``. Внутри огороженных блоков кода
+(```` ``` ```` / ``~~~``) и в YAML front matter в начале документа он
+слайды не разделяет. Разбиение работает построчно и по байтовым смещениям,
+поэтому годится и для потоков, и для отображенных в память файлов.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from .cache import default_cache_dir, write_atomic
+
+SEPARATOR_LINE = "---"
+FRONT_MATTER_END = ("---", "...")
+
+# CODE - строки огороженных блоков кода вместе с ограждениями
+CONTENT, SEPARATOR, FRONT_MATTER, CODE = range(4)
+
+# Увеличивается при изменении правил разбиения: сбрасывает сохраненные индексы
+INDEX_VERSION = 2
+
+_FENCE_OPEN_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})(.*)$")
+_FENCE_CLOSE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})[ \t\r]*$")
+_YAML_KEY_RE = re.compile(r"^(?:[A-Za-z0-9_][\w .-]*|\"[^\"]*\"|'[^']*'):(?:\s|$)")
+_YAML_INDENTED_RE = re.compile(r"^[ \t]+\S")
+_YAML_ITEM_RE = re.compile(r"^-(?:[ \t]|$)")
+
+T = TypeVar("T")
+SlideIndex = List[Tuple[int, int]]
+
+
+def _yaml_state(line: str, list_allowed: bool) -> Optional[bool]:
+    """Проверяет строку front matter как строку плоского отображения YAML.
+
+    ``None`` - строка не YAML (пустая строка, заголовок или пункт списка
+    Markdown), и кандидат не считается front matter. Иначе - можно ли в
+    следующей строке начать список без отступа (после ключа без значения).
+    """
+    if _YAML_INDENTED_RE.match(line):
+        return list_allowed
+    if _YAML_ITEM_RE.match(line):
+        return True if list_allowed else None
+    match = _YAML_KEY_RE.match(line)
+    if match:
+        return not line[match.end():].strip()
+    return None
+
+
+def _front_matter_length(lines: List[str]) -> int:
+    """Число строк front matter в начале буфера (0, если его нет)"""
+    if len(lines) < 3 or lines[0] != SEPARATOR_LINE or not _YAML_KEY_RE.match(lines[1]):
+        return 0
+    state: Optional[bool] = False
+    for i, line in enumerate(lines[1:], start=1):
+        if line in FRONT_MATTER_END:
+            return i + 1
+        state = _yaml_state(line, state)
+        if state is None:
+            return 0
+    return 0
+
+
+def classify_lines(items: Iterable[T], line_of: Callable[[T], str]) -> Iterator[Tuple[T, int]]:
+    """Помечает каждую строку как CONTENT, CODE, SEPARATOR или FRONT_MATTER.
+
+    ``line_of`` возвращает текст строки элемента без перевода строки.
+    Front matter распознается только в начале документа: строка ``---``,
+    затем ключи плоского отображения YAML (со значениями с отступом) до
+    закрывающей ``---`` или ``...``. Пустая строка, заголовок или пункт
+    списка без отступа означают, что это слайд, а не front matter.
+    Для его распознавания буферизуются лишь строки кандидата.
+    """
+    it = iter(items)
+    head: List[T] = []
+    state: Optional[bool] = False
+    for item in it:
+        head.append(item)
+        line = line_of(item)
+        if len(head) == 1:
+            if line != SEPARATOR_LINE:
+                break
+            continue
+        if len(head) == 2 and not _YAML_KEY_RE.match(line):
+            break
+        if line in FRONT_MATTER_END:
+            break
+        state = _yaml_state(line, state)
+        if state is None:
+            break
+    
+    skip = _front_matter_length([line_of(item) for item in head])
+    for item in head[:skip]:
+        yield item, FRONT_MATTER
+    
+    fence: Optional[Tuple[str, int]] = None
+    for item in _chain(head[skip:], it):
+        line = line_of(item)
+        if fence is not None:
+            match = _FENCE_CLOSE_RE.match(line)
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= fence[1]:
+                fence = None
+            yield item, CODE
+            continue
+        
+        match = _FENCE_OPEN_RE.match(line)
+        if match and not (match.group(1)[0] == "`" and "`" in match.group(2)):
+            fence = (match.group(1)[0], len(match.group(1)))
+            yield item, CODE
+        elif line == SEPARATOR_LINE:
+            yield item, SEPARATOR
+        else:
+            yield item, CONTENT
+
+
+def _chain(head: List[T], tail: Iterator[T]) -> Iterator[T]:
+    yield from head
+    yield from tail
+
+
+def _warn_front_matter() -> None:
+    print("⚠️  YAML front matter в начале документа пропущен и в слайды не попадает")
+
+
+def iter_line_parts(lines: Iterable[str]) -> Iterator[str]:
+    """Собирает непустые части документа из потока строк без переводов строки"""
+    current: List[str] = []
+    front_matter = False
+    for line, kind in classify_lines(lines, lambda line: line):
+        if kind == FRONT_MATTER and not front_matter:
+            front_matter = True
+            _warn_front_matter()
+        if kind in (CONTENT, CODE):
+            current.append(line)
+        elif kind == SEPARATOR:
+            part = "\n".join(current).strip()
+            if part:
+                yield part
+            current = []
+    part = "\n".join(current).strip()
+    if part:
+        yield part
+
+
+Buffer = Union[str, bytes, mmap.mmap]
+
+
+def _iter_offset_lines(buf: Buffer) -> Iterator[Tuple[int, int, str]]:
+    """Выдает (начало, конец_с_переводом_строки, текст) для каждой строки буфера"""
+    newline = "\n" if isinstance(buf, str) else b"\n"
+    size = len(buf)
+    pos = 0
+    while pos < size:
+        end = buf.find(newline, pos)
+        nxt = end + 1
+        if end == -1:
+            end = nxt = size
+        line = buf[pos:end]
+        if not isinstance(line, str):
+            line = line.decode("utf-8", "replace")
+        yield pos, nxt, line
+        pos = nxt
+
+
+def slide_offsets(buf: Buffer) -> SlideIndex:
+    """Строит индекс слайдов: список (start, end) смещений частей документа.
+
+    Смещения - индексы в ``buf``: символы для ``str``, байты для ``bytes`` и
+    ``mmap``. Части без содержимого в индекс не попадают, поэтому номер
+    записи совпадает с номером слайда.
+    """
+    index: SlideIndex = []
+    start = 0
+    has_content = False
+    for (pos, nxt, line), kind in classify_lines(_iter_offset_lines(buf), lambda item: item[2]):
+        if kind == FRONT_MATTER and pos == 0:
+            _warn_front_matter()
+        if kind in (CONTENT, CODE):
+            has_content = has_content or bool(line.strip())
+            continue
+        if kind == SEPARATOR and has_content:
+            index.append((start, pos))
+        start = nxt
+        has_content = False
+    if has_content:
+        index.append((start, len(buf)))
+    return index
+
+
+def _index_path(path: Path, cache_dir: Optional[Union[str, Path]]) -> Path:
+    root = Path(cache_dir) if cache_dir else default_cache_dir()
+    key = hashlib.sha256(str(path.resolve()).encode("utf-8")).hexdigest()
+    return root / "index" / key[:2] / f"{key}.json"
+
+
+def build_slide_index(path: Union[str, Path]) -> SlideIndex:
+    """Строит байтовый индекс слайдов файла, отображая его в память"""
+    with open(path, "rb") as fh:
+        try:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Пустой файл нельзя отобразить в память
+            return []
+        with buf:
+            return slide_offsets(buf)
+
+
+def load_slide_index(
+    path: Union[str, Path],
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> SlideIndex:
+    """Возвращает байтовый индекс слайдов файла, сохраняя его между запусками.
+
+    Сохраненный индекс используется, пока не изменились размер и время
+    изменения файла.
+    """
+    path = Path(path)
+    stat = path.stat()
+    stamp = {"version": INDEX_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    index_file = _index_path(path, cache_dir)
+    try:
+        data = json.loads(index_file.read_text(encoding="utf-8"))
+        if all(data.get(key) == value for key, value in stamp.items()):
+            return [(start, end) for start, end in data["slides"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    
+    index = build_slide_index(path)
+    data = dict(stamp, path=str(path), slides=index)
+    try:
+        write_atomic(index_file, json.dumps(data).encode("utf-8"))
+    except OSError as e:
+        print(f"⚠️  Не удалось сохранить индекс слайдов: {e}")
+    return index
+
+
+def read_slide(path: Union[str, Path], number: int, index: Optional[SlideIndex] = None) -> str:
+    """Читает текст слайда ``number`` (с нуля), не затрагивая остальной файл"""
+    if index is None:
+        index = load_slide_index(path)
+    start, end = index[number]
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        return fh.read(end - start).decode("utf-8").strip()
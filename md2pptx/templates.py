@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import copy
+import threading
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from pptx import Presentation
+from pptx.enum.shapes import PP_PLACEHOLDER
+
+# Номер плейсхолдера основного текста в макетах (как ``placeholders[1]``)
+BODY_IDX = 1
+# Типы плейсхолдера для текста слайда в порядке предпочтения
+_BODY_TYPES = (PP_PLACEHOLDER.OBJECT, PP_PLACEHOLDER.BODY)
+
+
+class LayoutInfo(NamedTuple):
+    """Сведения о макете шаблона, собранные один раз при загрузке"""
+    position: int
+    name: str
+    # idx -> тип плейсхолдеров, которые копируются на новый слайд
+    placeholders: Dict[int, PP_PLACEHOLDER]
+    # Область плейсхолдера тела (left, top, width, height) в EMU
+    body_box: Optional[Tuple[int, int, int, int]] = None
+
+    @property
+    def body_idx(self) -> Optional[int]:
+        """idx плейсхолдера для текста слайда или None, если его нет"""
+        if len(self.placeholders) > 1 and BODY_IDX in self.placeholders:
+            return BODY_IDX
+        return None
+
+
+def _placeholder_box(layout, idx: int) -> Optional[Tuple[int, int, int, int]]:
+    """Положение и размер плейсхолдера макета с учетом наследования от мастера"""
+    ph = layout.placeholders.get(idx=idx)
+    if ph is None:
+        return None
+    box = (ph.left, ph.top, ph.width, ph.height)
+    return None if None in box else box
+
+
+class LayoutIndex:
+    """Индекс макетов шаблона по имени и типам плейсхолдеров.
+
+    Выбор макета и плейсхолдера тела становится поиском в словаре вместо
+    обхода объектной модели на каждом слайде.
+    """
+
+    def __init__(self, prs) -> None:
+        self.layouts: List[LayoutInfo] = []
+        self.by_name: Dict[str, LayoutInfo] = {}
+        self.by_type: Dict[PP_PLACEHOLDER, List[LayoutInfo]] = {}
+        for position, layout in enumerate(prs.slide_layouts):
+            placeholders = {
+                ph.placeholder_format.idx: ph.placeholder_format.type
+                for ph in layout.iter_cloneable_placeholders()
+            }
+            info = LayoutInfo(position, layout.name, placeholders)
+            if info.body_idx is not None:
+                info = info._replace(body_box=_placeholder_box(layout, info.body_idx))
+            self.layouts.append(info)
+            self.by_name.setdefault(layout.name, info)
+            for ph_type in set(placeholders.values()):
+                self.by_type.setdefault(ph_type, []).append(info)
+        if not self.layouts:
+            raise ValueError("Template has no slide layouts")
+        # Макеты первого и остальных слайдов выбираются один раз при загрузке
+        self.title = self._find_title()
+        self.content = self._find_content()
+
+    def _find_title(self) -> LayoutInfo:
+        """Макет первого слайда: первый с центральным заголовком, иначе первый по порядку"""
+        return next(iter(self.with_placeholder(PP_PLACEHOLDER.CENTER_TITLE)), self.layouts[0])
+
+    def _find_content(self) -> LayoutInfo:
+        """Макет остальных слайдов: с заголовком и плейсхолдером тела.
+
+        Предпочитается плейсхолдер OBJECT ("Title and Content"), затем BODY;
+        среди равных - макет с наименьшим числом плейсхолдеров (не "Two
+        Content"). Если таких нет, используется второй макет шаблона (или
+        единственный).
+        """
+        candidates = [
+            info for info in self.with_placeholder(PP_PLACEHOLDER.TITLE)
+            if info.placeholders.get(info.body_idx) in _BODY_TYPES
+        ]
+        if candidates:
+            return min(
+                candidates,
+                key=lambda info: (
+                    _BODY_TYPES.index(info.placeholders[info.body_idx]),
+                    len(info.placeholders),
+                    info.position,
+                ),
+            )
+        return self.layouts[1] if len(self.layouts) > 1 else self.layouts[0]
+
+    def get(self, name: str) -> LayoutInfo:
+        """Макет по имени"""
+        try:
+            return self.by_name[name]
+        except KeyError:
+            raise ValueError(f"Unknown layout: {name}. Available: {list(self.by_name)}") from None
+
+    def with_placeholder(self, ph_type: PP_PLACEHOLDER) -> List[LayoutInfo]:
+        """Макеты, содержащие плейсхолдер данного типа"""
+        return self.by_type.get(ph_type, [])
+
+
+class Template:
+    """Загруженный шаблон: нетронутая презентация и индекс ее макетов"""
+
+    def __init__(self, source: Optional[Union[str, Path]] = None) -> None:
+        self.source = source
+        self._pristine = Presentation(str(source)) if source else Presentation()
+        self.index = LayoutIndex(self._pristine)
+
+    @property
+    def slide_size(self) -> Tuple[int, int]:
+        """Размер слайда шаблона (ширина, высота) в EMU"""
+        return self._pristine.slide_width, self._pristine.slide_height
+
+    def clone(self):
+        """Возвращает независимую копию шаблона без повторного разбора файла"""
+        return copy.deepcopy(self._pristine)
+
+
+class TemplatePool:
+    """Пул шаблонов в памяти: каждый шаблон читается и разбирается один раз.
+
+    Задания получают копию исходного шаблона через ``acquire``; сам
+    загруженный шаблон никогда не изменяется. Пул потокобезопасен.
+    """
+
+    def __init__(self) -> None:
+        self._templates: Dict[Optional[str], Template] = {}
+        self._lock = threading.Lock()
+
+    def get(self, source: Optional[Union[str, Path]] = None) -> Template:
+        """Возвращает загруженный шаблон (``None`` - шаблон по умолчанию)"""
+        key = str(Path(source).resolve()) if source else None
+        with self._lock:
+            template = self._templates.get(key)
+            if template is None:
+                template = self._templates[key] = Template(source)
+            return template
+
+    def acquire(self, source: Optional[Union[str, Path]] = None):
+        """Возвращает (копия презентации, индекс макетов) для нового задания"""
+        template = self.get(source)
+        return template.clone(), template.index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+
+    def __len__(self) -> int:
+        return len(self._templates)
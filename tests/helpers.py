@@ -0,0 +1,27 @@
+import requests
+
+
+class FakeResponse:
+    """Ответ ``requests`` для подмены ``Session.get`` в тестах"""
+
+    def __init__(self, status=200, content=b"", headers=None, url=""):
+        self.status_code = status
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+        self.closed = False
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for {self.url}")
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
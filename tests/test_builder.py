@@ -1,12 +1,19 @@
-from pathlib import Path
-
+from io import BytesIO
 from pathlib import Path
 import sys
+import zipfile
+
+from PIL import Image
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE, MSO_SHAPE_TYPE
+import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from md2pptx import builder
 from md2pptx.builder import build_presentation
-from md2pptx.models import SlideModel, TextBlock
+from md2pptx.models import DiagramBlock, ImageBlock, SlideModel, TextBlock
+from md2pptx.templates import TemplatePool
 
 
 def test_build(tmp_path):
@@ -14,3 +21,195 @@ def test_build(tmp_path):
     out = tmp_path / "out.pptx"
     build_presentation(slides, out)
     assert out.exists()
+
+
+def test_streaming_build_matches_regular_build(tmp_path):
+    image = tmp_path / "pic.png"
+    Image.new("RGB", (40, 30), (10, 20, 30)).save(image)
+    slides = [
+        SlideModel(title=f"S{n}", blocks=[TextBlock(text="t"), ImageBlock(src=str(image))], notes="n")
+        for n in range(4)
+    ]
+    regular, streamed = tmp_path / "regular.pptx", tmp_path / "streamed.pptx"
+    build_presentation(slides, regular)
+    build_presentation(iter(slides), streamed, streaming=True)
+
+    with zipfile.ZipFile(regular) as a, zipfile.ZipFile(streamed) as b:
+        assert sorted(a.namelist()) == sorted(b.namelist())
+        assert all(a.read(name) == b.read(name) for name in a.namelist())
+
+
+def test_repeated_images_are_embedded_once(tmp_path):
+    first, second = tmp_path / "a.png", tmp_path / "b.png"
+    Image.new("RGB", (40, 30), (10, 20, 30)).save(first)
+    Image.new("RGB", (20, 20), (200, 0, 0)).save(second)
+    copy = tmp_path / "a_copy.png"
+    copy.write_bytes(first.read_bytes())
+    slides = [
+        SlideModel(title=f"S{n}", blocks=[TextBlock(text="t"), ImageBlock(src=str(src))])
+        for n, src in enumerate([first, second, first, copy, second])
+    ]
+    out = tmp_path / "out.pptx"
+    build_presentation(slides, out)
+
+    with zipfile.ZipFile(out) as archive:
+        media = [name for name in archive.namelist() if name.startswith("ppt/media/")]
+    assert len(media) == 2
+
+
+def test_large_images_fit_the_body_placeholder(tmp_path):
+    image = tmp_path / "big.png"
+    Image.new("RGB", (4000, 1000)).save(image)
+    slides = [SlideModel(title="S", blocks=[ImageBlock(src=str(image))])] * 2
+    out = tmp_path / "out.pptx"
+    build_presentation(slides, out)
+
+    slide = Presentation(out).slides[1]
+    body = slide.placeholders[1]
+    picture = next(shape for shape in slide.shapes if shape.shape_type == MSO_SHAPE_TYPE.PICTURE)
+    assert (picture.left, picture.top, picture.width) == (body.left, body.top, body.width)
+    assert picture.height == body.width // 4
+
+
+def test_pictures_and_charts_on_one_slide_do_not_overlap_each_other_or_text(tmp_path):
+    first, second = tmp_path / "a.png", tmp_path / "b.png"
+    Image.new("RGB", (4000, 3000)).save(first)
+    Image.new("RGB", (3000, 4000), (200, 0, 0)).save(second)
+    slides = [
+        SlideModel(title="Title", blocks=[]),
+        SlideModel(
+            title="S",
+            blocks=[
+                TextBlock(text="", bullets=["a", "b"]),
+                ImageBlock(src=str(first)),
+                DiagramBlock(code="flowchart LR\n  A --> B --> C", lang="mermaid"),
+                ImageBlock(src=str(second)),
+                DiagramBlock(code="flowchart TD\n  X((x)) --> Y{y}", lang="mermaid"),
+            ],
+        ),
+    ]
+    slide = Presentation(BytesIO(build_presentation(slides))).slides[1]
+
+    def overlap(a, b):
+        return (
+            a.left < b.left + b.width and b.left < a.left + a.width
+            and a.top < b.top + b.height and b.top < a.top + a.height
+        )
+
+    body = slide.placeholders[1]
+    media = [
+        shape for shape in slide.shapes
+        if shape.shape_type in (MSO_SHAPE_TYPE.PICTURE, MSO_SHAPE_TYPE.GROUP)
+    ]
+    assert len(media) == 4
+    for n, shape in enumerate(media):
+        assert not overlap(shape, body)
+        assert not any(overlap(shape, other) for other in media[n + 1:])
+    area = slide.slide_layout.placeholders[1]
+    for shape in media:
+        assert area.left <= shape.left and shape.left + shape.width <= area.left + area.width
+        assert area.top <= shape.top and shape.top + shape.height <= area.top + area.height
+
+
+def test_pictures_fall_back_to_public_api(tmp_path, monkeypatch):
+    image = tmp_path / "big.png"
+    Image.new("RGB", (4000, 1000)).save(image)
+    slides = [SlideModel(title="S", blocks=[ImageBlock(src=str(image))])] * 2
+
+    def geometry(data):
+        slide = Presentation(BytesIO(data)).slides[1]
+        (picture,) = [shape for shape in slide.shapes if shape.shape_type == MSO_SHAPE_TYPE.PICTURE]
+        return picture.left, picture.top, picture.width, picture.height
+
+    indexed = build_presentation(slides)
+    monkeypatch.setattr(builder, "PPTX_INTERNALS", False)
+    assert geometry(build_presentation(slides)) == geometry(indexed)
+
+
+def test_sharded_build_matches_regular_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(builder, "SHARD_MIN_SLIDES", 2)
+    images = []
+    for n in range(3):
+        image = tmp_path / f"pic{n}.png"
+        Image.new("RGB", (40 + n, 30), (n * 50, 0, 0)).save(image)
+        images.append(image)
+    slides = [
+        SlideModel(
+            title=f"S{n}",
+            blocks=[TextBlock(text=f"t{n}"), ImageBlock(src=str(images[n % 3]))],
+            notes=f"n{n}" if n % 2 else None,
+        )
+        for n in range(9)
+    ]
+    regular, sharded = tmp_path / "regular.pptx", tmp_path / "sharded.pptx"
+    pooled = tmp_path / "pooled.pptx"
+    pool = TemplatePool()
+    build_presentation(slides, regular)
+    build_presentation(slides, sharded, workers=3)
+    build_presentation(slides, pooled, workers=3, pool=pool)
+    assert len(pool) == 1
+
+    package_parts = {
+        "[Content_Types].xml", "ppt/presentation.xml", "ppt/_rels/presentation.xml.rels",
+        "docProps/app.xml",
+    }
+    for merged in (sharded, pooled):
+        with zipfile.ZipFile(regular) as a, zipfile.ZipFile(merged) as b:
+            assert sorted(a.namelist()) == sorted(b.namelist())
+            for name in set(a.namelist()) - package_parts:
+                assert a.read(name) == b.read(name), name
+            app = b.read("docProps/app.xml")
+            assert b"<Slides>9</Slides>" in app and b"<Notes>4</Notes>" in app
+
+        prs = Presentation(merged)
+        assert [slide.shapes.title.text for slide in prs.slides] == [f"S{n}" for n in range(9)]
+        assert prs.slides[7].notes_slide.notes_text_frame.text == "n7"
+
+
+def test_compression_presets(tmp_path):
+    image = tmp_path / "pic.png"
+    Image.new("RGB", (40, 30), (10, 20, 30)).save(image)
+    slides = [SlideModel(title="S", blocks=[TextBlock(text="t"), ImageBlock(src=str(image))])]
+    default = zipfile.ZipFile(BytesIO(build_presentation(slides)))
+
+    for preset in ("fast", "small", "store"):
+        archive = zipfile.ZipFile(BytesIO(build_presentation(slides, compression=preset)))
+        assert archive.namelist() == default.namelist()
+        assert all(archive.read(name) == default.read(name) for name in archive.namelist())
+        info = {item.filename: item.compress_type for item in archive.infolist()}
+        assert info["ppt/media/image1.png"] == zipfile.ZIP_STORED
+        expected = zipfile.ZIP_STORED if preset == "store" else zipfile.ZIP_DEFLATED
+        assert info["ppt/slides/slide1.xml"] == expected
+
+    with pytest.raises(ValueError):
+        build_presentation(slides, compression="zstd")
+
+
+def test_mermaid_flowchart_is_drawn_with_connected_shapes():
+    code = "flowchart TD\n  A[Начало] --> B{Готово?}\n  B -->|да| C((Конец))\n  B -. нет .-> A"
+    slides = [
+        SlideModel(title="Title", blocks=[]),
+        SlideModel(title="Flow", blocks=[DiagramBlock(code=code, lang="mermaid")]),
+        SlideModel(title="Bad", blocks=[DiagramBlock(code="pie\n  'a': 1", lang="mermaid")]),
+    ]
+    prs = Presentation(BytesIO(build_presentation(slides)))
+
+    (group,) = [shape for shape in prs.slides[1].shapes if shape.shape_type == MSO_SHAPE_TYPE.GROUP]
+    nodes = {shape.text: shape for shape in group.shapes if shape.shape_type == MSO_SHAPE_TYPE.AUTO_SHAPE}
+    assert {text: shape.auto_shape_type for text, shape in nodes.items()} == {
+        "Начало": MSO_SHAPE.RECTANGLE, "Готово?": MSO_SHAPE.DIAMOND, "Конец": MSO_SHAPE.OVAL,
+    }
+    assert nodes["Начало"].top < nodes["Готово?"].top < nodes["Конец"].top
+
+    connectors = [shape for shape in group.shapes if shape.shape_type == MSO_SHAPE_TYPE.LINE]
+    links = [
+        (cxn.find(".//a:stCxn", cxn.nsmap).get("id"), cxn.find(".//a:endCxn", cxn.nsmap).get("id"))
+        for cxn in (connector._element for connector in connectors)
+    ]
+    ids = {text: str(shape.shape_id) for text, shape in nodes.items()}
+    assert links == [
+        (ids["Начало"], ids["Готово?"]), (ids["Готово?"], ids["Конец"]), (ids["Готово?"], ids["Начало"]),
+    ]
+    labels = [shape.text for shape in group.shapes if shape.shape_type == MSO_SHAPE_TYPE.TEXT_BOX]
+    assert labels == ["да", "нет"]
+    assert not any(shape.shape_type == MSO_SHAPE_TYPE.GROUP for shape in prs.slides[2].shapes)
@@ -0,0 +1,75 @@
+from pathlib import Path
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from helpers import FakeResponse
+from md2pptx import parser
+from md2pptx.cache import HttpCache, SlideCache, prune_lru
+from md2pptx.parser import parse_markdown
+
+
+def test_slide_cache_reuses_unchanged_slides(tmp_path, monkeypatch):
+    cache = SlideCache(tmp_path)
+    text = "# One\n\n- a\n---\nno title here\n---\n# Three"
+    first = parse_markdown(text, cache=cache)
+
+    calls = []
+    original = parser._parse_part
+    monkeypatch.setattr(parser, "_parse_part", lambda part, engine: calls.append(part) or original(part, engine))
+    edited = parse_markdown(text.replace("# Three", "# Three!"), cache=cache)
+
+    assert calls == ["# Three!"]
+    assert edited[:2] == first[:2]
+    assert edited[1].title == "Слайд 2"
+
+
+def test_prune_lru_removes_oldest(tmp_path):
+    for n, name in enumerate(["old", "mid", "new"]):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (n, n))
+    assert prune_lru(tmp_path, 20) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["mid", "new"]
+
+
+def test_streamed_images_prune_the_http_cache_once(tmp_path, monkeypatch):
+    from md2pptx import images
+    from md2pptx.cache import HttpCache
+    from md2pptx.parser import iter_slide_records
+
+    monkeypatch.setattr(images, "_download", lambda session, url, cache, folder: None)
+    cache = HttpCache(tmp_path)
+    prunes = []
+    monkeypatch.setattr(cache, "prune", lambda: prunes.append(1) or 0)
+
+    deck = "\n---\n".join(f"# {n}\n\n![](https://example.com/{n}.png)" for n in range(5))
+    assert len(list(iter_slide_records(deck, image_cache=cache))) == 5
+    assert prunes == [1]
+
+
+def test_streamed_not_modified_and_error_responses_are_closed(tmp_path):
+    class Session:
+        def __init__(self, responses):
+            self.responses = responses
+
+        def get(self, url, **kwargs):
+            assert kwargs["stream"]
+            return self.responses.pop(0)
+
+    cache = HttpCache(tmp_path)
+    fresh = FakeResponse(200, b"body", {"ETag": '"v1"'})
+    not_modified, missing = FakeResponse(304), FakeResponse(404)
+    session = Session([fresh, not_modified, missing])
+    url = "https://x/deck.md"
+
+    assert cache.fetch(session, url, max_bytes=100).read() == b"body"
+    assert cache.fetch(session, url, max_bytes=100, revalidate=True).read() == b"body"
+    assert not_modified.closed
+    with pytest.raises(requests.HTTPError):
+        cache.fetch(session, "https://x/missing.md", max_bytes=100)
+    assert missing.closed
@@ -0,0 +1,84 @@
+from io import BytesIO
+from pathlib import Path
+import subprocess
+import sys
+import zipfile
+
+from PIL import Image
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from pptx.oxml.slide import CT_NotesSlide, CT_Slide
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx import builder, compat, package
+from md2pptx.builder import build_presentation
+from md2pptx.models import DiagramBlock, SlideModel, TextBlock
+
+
+def test_pptx_internals_are_available(tmp_path):
+    # Если тест падает, python-pptx сменил закрытые API: обновите compat и PPTX_SUPPORTED
+    assert compat.PPTX_SUPPORTED[0] <= compat.PPTX_VERSION < compat.PPTX_SUPPORTED[1]
+    assert compat.missing_internals() == []
+    assert compat.PPTX_INTERNALS
+
+    image = tmp_path / "pic.png"
+    Image.new("RGB", (40, 30)).save(image)
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.notes_slide.notes_text_frame.text = "n"
+    picture = slide.shapes.add_picture(str(image), 0, 0)
+    part = slide.part.related_part(picture._element.blip_rId)
+    assert part._blob == image.read_bytes()
+    assert compat.native_size(part) == (picture.width, picture.height)
+    assert isinstance(slide.part._element, CT_Slide)
+    assert isinstance(slide.notes_slide.part._element, CT_NotesSlide)
+    # Кэши lazyproperty, которые сбрасывают release_slide и release_notes
+    assert slide.part.__dict__["slide"] is slide
+    assert slide.part.__dict__["notes_slide"] is slide.notes_slide
+    assert b"<Override" in compat.content_types_xml(prs.part.package.iter_parts())
+
+
+def test_moved_pptx_module_disables_internals_instead_of_failing_import():
+    # python-pptx загружен, но закрытый модуль "переехал": импорт md2pptx
+    # должен пройти, а PPTX_INTERNALS - сброситься
+    code = (
+        "import sys; import pptx; pptx.Presentation()\n"
+        "sys.modules['pptx.shapes.connector'] = None\n"
+        "import md2pptx.pipeline\n"
+        "from md2pptx import compat\n"
+        "print(compat.PPTX_INTERNALS, compat.missing_internals()[0].startswith('import:'))\n"
+    )
+    root = Path(__file__).resolve().parents[1]
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["False", "True"]
+
+
+def test_public_api_fallback_builds_the_same_slides(monkeypatch):
+    slides = [SlideModel(title=f"S{n}", blocks=[TextBlock(text="t")], notes="n") for n in range(3)]
+    monkeypatch.setattr(builder, "PPTX_INTERNALS", False)
+    monkeypatch.setattr(package, "PPTX_INTERNALS", False)
+    data = build_presentation(iter(slides), streaming=True, compression="fast")
+
+    prs = Presentation(BytesIO(data))
+    assert [slide.shapes.title.text for slide in prs.slides] == ["S0", "S1", "S2"]
+    assert zipfile.ZipFile(BytesIO(data)).testzip() is None
+
+
+def test_flowchart_falls_back_to_public_connect_api(monkeypatch):
+    monkeypatch.setattr(builder, "PPTX_INTERNALS", False)
+    code = "flowchart TD\n  A[a] --> B{b}\n  B --> C((c))"
+    slides = [
+        SlideModel(title="T", blocks=[]),
+        SlideModel(title="F", blocks=[DiagramBlock(code=code, lang="mermaid")]),
+    ]
+    slide = Presentation(BytesIO(build_presentation(slides))).slides[1]
+
+    (group,) = [shape for shape in slide.shapes if shape.shape_type == MSO_SHAPE_TYPE.GROUP]
+    first, second = [shape._element for shape in group.shapes if shape.shape_type == MSO_SHAPE_TYPE.LINE]
+    assert first.find(".//a:stCxn", first.nsmap) is not None
+    assert first.find(".//a:endCxn", first.nsmap) is not None
+    assert second.find(".//a:endCxn", second.nsmap) is None
+    assert first.find(".//a:tailEnd", first.nsmap) is None
@@ -0,0 +1,165 @@
+from io import BytesIO
+from pathlib import Path
+import sys
+import tempfile
+
+from PIL import Image
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx import diagrams
+from md2pptx.diagrams import (
+    DiagramCache, DiagramRenderer, FlowEdge, PlantUMLPipe, diagram_key, layout_flowchart,
+    parse_flowchart, render_diagrams, split_diagrams,
+)
+from md2pptx.models import DiagramRecord, ImageRecord, TextRecord
+from md2pptx.parser import iter_slide_records, parse_records
+from md2pptx.pipeline import convert_markdown
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+class FakeRenderer(DiagramRenderer):
+    name = "fake"
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def render_batch(self, sources):
+        self.batches.append(list(sources))
+        return [PNG + source.encode("utf-8") for source in sources]
+
+
+def test_split_diagrams_keeps_other_code_blocks():
+    text = "Текст\n\n```plantuml\nA -> B\n```\n\n~~~python\nprint(1)\n~~~\n\n```puml\n@startuml\nB -> C\n@enduml\n```\n"
+    rest, diagrams = split_diagrams(text)
+    assert diagrams == [("plantuml", "A -> B"), ("plantuml", "@startuml\nB -> C\n@enduml")]
+    assert "print(1)" in rest and "A -> B" not in rest
+
+
+def test_diagrams_are_rendered_in_one_batch_and_cached(tmp_path):
+    deck = "# Один\n\n```plantuml\nA -> B\n```\n\n---\n\n# Два\n\nТекст\n\n```plantuml\nB -> C\n```\n\n```uml\nA -> B\n```\n"
+    renderer = FakeRenderer()
+    cache = DiagramCache(tmp_path)
+
+    diagrams.set_renderer(renderer)
+    try:
+        slides = parse_records(deck, diagram_cache=cache)
+        assert renderer.batches == [["A -> B", "B -> C"]]
+        assert slides[1].blocks[0] == TextRecord(text="Текст")
+        first, second = slides[0].blocks[0], slides[1].blocks[1]
+        assert isinstance(first, ImageRecord)
+        assert Path(first.src) == cache.path(diagram_key("A -> B", renderer))
+        assert Path(first.src).read_bytes().startswith(PNG)
+        assert slides[1].blocks[2].src == first.src != second.src
+
+        # Неизмененные диаграммы повторно не рендерятся
+        assert parse_records(deck, diagram_cache=cache) == slides
+        assert len(renderer.batches) == 1
+
+        unresolved = parse_records(deck, resolve=False)
+        assert unresolved[0].blocks == [DiagramRecord(code="A -> B")]
+    finally:
+        diagrams.set_renderer(None)
+
+
+def test_uncached_diagrams_go_to_the_build_folder(tmp_path, monkeypatch):
+    paths = render_diagrams(["A -> B"], FakeRenderer(), folder=tmp_path / "build")
+    assert Path(paths["A -> B"]).parent == tmp_path / "build"
+
+    class PngRenderer(DiagramRenderer):
+        def render_batch(self, sources):
+            out = BytesIO()
+            Image.new("RGB", (4, 3)).save(out, "PNG")
+            return [out.getvalue() for _ in sources]
+
+    # convert_markdown удаляет свой временный каталог вместе с диаграммами
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    (tmp_path / "tmp").mkdir()
+    diagrams.set_renderer(PngRenderer())
+    try:
+        convert_markdown("# S\n\n```plantuml\nA -> B\n```\n")
+    finally:
+        diagrams.set_renderer(None)
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_plantuml_pipe_reuses_one_process_across_batches(tmp_path):
+    # Заглушка PlantUML: на каждую диаграмму сразу выдает "изображение" и разделитель
+    script = tmp_path / "plantuml.py"
+    log = tmp_path / "calls.log"
+    script.write_text(
+        "import sys\n"
+        f"open({str(log)!r}, 'a').write('call\\n')\n"
+        "delimiter = sys.argv[sys.argv.index('-pipedelimitor') + 1]\n"
+        "body = []\n"
+        "for line in sys.stdin:\n"
+        "    if line.strip() == '@enduml':\n"
+        "        sys.stdout.buffer.write(b'PNG' + body[-1].encode() + b'\\n' + delimiter.encode() + b'\\n')\n"
+        "        sys.stdout.flush()\n"
+        "    body.append(line.strip())\n",
+        encoding="utf-8",
+    )
+    with PlantUMLPipe([sys.executable, str(script)]) as renderer:
+        paths = render_diagrams(["A -> B", "B -> C", "A -> B"], renderer, DiagramCache(tmp_path))
+        assert [Path(path).read_bytes() for path in paths.values()] == [b"PNGA -> B\n", b"PNGB -> C\n"]
+
+        # Потоковый режим рендерит по слайдам, но тем же процессом
+        diagrams.set_renderer(renderer)
+        deck = "\n---\n".join(f"# {n}\n\n```plantuml\nX{n} -> Y\n```" for n in range(4))
+        slides = list(iter_slide_records(deck, diagram_cache=DiagramCache(tmp_path)))
+        assert [Path(slide.blocks[0].src).read_bytes() for slide in slides] == [
+            f"PNGX{n} -> Y\n".encode() for n in range(4)
+        ]
+        assert log.read_text() == "call\n"
+    diagrams.set_renderer(None)
+
+
+def test_parse_and_layout_flowchart():
+    chart = parse_flowchart(
+        "graph LR\n  %% комментарий\n  A[Старт] --> B{Да?} -->|да| C([Финиш])\n"
+        "  B -- нет --> D((Снова)) -.-> A\n  C ==> E; E --- F\n  style A fill:#f9f\n"
+    )
+    assert chart.direction == "LR"
+    assert [(node.id, node.label, node.shape) for node in chart.nodes.values()] == [
+        ("A", "Старт", "rect"), ("B", "Да?", "diamond"), ("C", "Финиш", "stadium"),
+        ("D", "Снова", "circle"), ("E", "E", "rect"), ("F", "F", "rect"),
+    ]
+    assert chart.edges[1] == FlowEdge("B", "C", "да")
+    assert chart.edges[2] == FlowEdge("B", "D", "нет")
+    assert chart.edges[3].style == "dotted" and chart.edges[4].style == "thick"
+    assert chart.edges[5] == FlowEdge("E", "F", arrow=False)
+
+    box = (100, 200, 9000000, 5000000)
+    boxes = layout_flowchart(chart, box)
+    # Слои идут слева направо, обратная связь цикла D -> A их не меняет
+    centers = {node: left + width // 2 for node, (left, _, width, _) in boxes.items()}
+    assert centers["A"] < centers["B"] < centers["C"] == centers["D"] < centers["E"] < centers["F"]
+    assert boxes["C"][1] != boxes["D"][1]
+    for left, top, width, height in boxes.values():
+        assert box[0] <= left and left + width <= box[0] + box[2]
+        assert box[1] <= top and top + height <= box[1] + box[3]
+
+
+def test_mermaid_blocks_stay_diagrams():
+    slides = parse_records("# Схема\n\n```mermaid\ngraph TD\nA --> B\n```\n")
+    assert slides[0].blocks == [DiagramRecord(code="graph TD\nA --> B", lang="mermaid")]
+
+
+def test_flowchart_keywords_are_matched_as_whole_words():
+    chart = parse_flowchart(
+        "flowchart LR\n  subgraph Flow\n  review --> endState\n  endState --> archive\n"
+        "  classifier --> styleGuide\n  end\n"
+    )
+    assert list(chart.nodes) == ["review", "endState", "archive", "classifier", "styleGuide"]
+    assert chart.edges[1] == FlowEdge("endState", "archive")
+
+
+def test_renderer_without_render_batch_cannot_be_created():
+    class Incomplete(DiagramRenderer):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -1,9 +1,15 @@
+import json
 from pathlib import Path
 import sys
 
+import requests
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from helpers import FakeResponse
+from md2pptx.cache import HttpCache
 from md2pptx.fetcher import fetch_markdown
+from md2pptx.httpclient import HttpClient
 
 
 def test_fetch_local(tmp_path):
@@ -11,3 +17,132 @@ def test_fetch_local(tmp_path):
     md.write_text("# Title")
     text = fetch_markdown(str(md))
     assert "Title" in text
+
+
+def test_gist_is_revalidated_from_cache(tmp_path, monkeypatch):
+    gist_id = "0123456789abcdef0123"
+    gist = {"files": {"deck.md": {"type": "text/markdown", "raw_url": "https://raw.example/deck.md"}}}
+    bodies = {
+        f"https://api.github.com/gists/{gist_id}": json.dumps(gist).encode(),
+        "https://raw.example/deck.md": "# Слайд".encode("utf-8"),
+    }
+    requests_seen = []
+
+    def fake_get(url, headers=None, **kwargs):
+        headers = headers or {}
+        requests_seen.append((url, headers.get("If-None-Match")))
+        etag = f'"{len(bodies[url])}"'
+        cache_headers = {"ETag": etag, "Cache-Control": "max-age=0"}
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(304, headers=cache_headers)
+        return FakeResponse(200, bodies[url], cache_headers)
+
+    client = HttpClient()
+    monkeypatch.setattr(client.session, "get", fake_get)
+    cache = HttpCache(tmp_path)
+
+    assert fetch_markdown(gist_id, client=client, cache=cache) == "# Слайд"
+    assert fetch_markdown(gist_id, client=client, cache=cache) == "# Слайд"
+    assert [etag is None for _, etag in requests_seen] == [True, True, False, False]
+
+
+def test_gist_uses_inline_content_and_assembles_files(monkeypatch):
+    gist_id = "0123456789abcdef0123"
+    gist = {"files": {
+        "2-end.md": {"content": "# End\n", "raw_url": "https://raw.example/2"},
+        "1-start.md": {"content": "# Sta", "truncated": True, "raw_url": "https://raw.example/1"},
+        "notes.txt": {"type": "text/plain", "content": "skip", "raw_url": "https://raw.example/3"},
+    }}
+    seen = []
+
+    def fake_get(url, **kwargs):
+        seen.append(url)
+        if url.startswith("https://api.github.com/"):
+            return FakeResponse(200, json.dumps(gist).encode())
+        return FakeResponse(200, b"# Start\n")
+
+    client = HttpClient()
+    monkeypatch.setattr(client.session, "get", fake_get)
+
+    assert fetch_markdown(gist_id, client=client, all_files=True) == "# Start\n\n---\n\n# End"
+    assert seen == [f"https://api.github.com/gists/{gist_id}", "https://raw.example/1"]
+
+    seen.clear()
+    del gist["files"]["1-start.md"]
+    assert fetch_markdown(gist_id, client=client) == "# End\n"
+    assert seen == [f"https://api.github.com/gists/{gist_id}"]
+
+
+def test_fetch_many_keeps_order_and_reports_errors(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    import time
+
+    from md2pptx.fetcher import fetch_many, fetch_many_async, fetch_markdown_async
+
+    local = tmp_path / "local.md"
+    local.write_text("# Local", encoding="utf-8")
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fake_get(url, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        if url.endswith("/missing.md"):
+            return FakeResponse(404)
+        return FakeResponse(200, url.rsplit("/", 1)[1].encode())
+
+    client = HttpClient()
+    monkeypatch.setattr(client.session, "get", fake_get)
+    sources = [f"https://example.com/{n}.md" for n in range(6)]
+    sources[2] = "https://example.com/missing.md"
+    sources.append(str(local))
+
+    for results in (
+        fetch_many(sources, concurrency=3, client=client),
+        asyncio.run(fetch_many_async(sources, concurrency=3, client=client)),
+    ):
+        assert [result.source for result in results] == sources
+        assert [result.ok for result in results] == [True, True, False, True, True, True, True]
+        assert isinstance(results[2].error, requests.HTTPError)
+        assert results[5].text == "5.md"
+        assert results[6].text == "# Local"
+    assert 1 < peak[0] <= 3
+
+    assert asyncio.run(fetch_markdown_async(str(local))) == "# Local"
+
+
+def test_changed_source_without_cache_control_is_refetched(tmp_path, monkeypatch):
+    from md2pptx.fetcher import iter_markdown
+
+    url = "https://example.com/deck.md"
+    state = {"body": b"# v1", "modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    requests_seen = []
+
+    def fake_get(url, headers=None, **kwargs):
+        headers = headers or {}
+        requests_seen.append(headers.get("If-Modified-Since"))
+        # Только Last-Modified: эвристическая свежесть не должна скрывать правку
+        cache_headers = {"Last-Modified": state["modified"]}
+        if headers.get("If-Modified-Since") == state["modified"]:
+            return FakeResponse(304, headers=cache_headers, url=url)
+        return FakeResponse(200, state["body"], cache_headers, url=url)
+
+    client = HttpClient()
+    monkeypatch.setattr(client.session, "get", fake_get)
+    cache = HttpCache(tmp_path)
+
+    assert fetch_markdown(url, client, cache) == "# v1"
+    assert fetch_markdown(url, client, cache) == "# v1"
+    assert requests_seen == [None, state["modified"]]
+
+    state.update(body=b"# v2", modified="Tue, 02 Jan 2024 00:00:00 GMT")
+    assert fetch_markdown(url, client, cache) == "# v2"
+    state["body"] = b"# v3"
+    state["modified"] = "Wed, 03 Jan 2024 00:00:00 GMT"
+    assert "".join(iter_markdown(url, client, cache)) == "# v3"
+    assert len(requests_seen) == 4
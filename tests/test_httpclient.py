@@ -0,0 +1,158 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from helpers import FakeResponse
+from md2pptx.fetcher import fetch_markdown
+from md2pptx.httpclient import HttpClient, RateLimitError
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_client(responses, **kwargs):
+    clock = Clock()
+    client = HttpClient(sleep=clock.sleep, clock=clock, **kwargs)
+    client.session = FakeSession(responses)
+    return client, clock
+
+
+def test_fetch_uses_client_with_default_timeout():
+    client, _ = make_client([FakeResponse(content=b"# Remote")])
+    assert fetch_markdown("https://example.com/deck.md", client=client) == "# Remote"
+    assert client.session.calls[0][1]["timeout"] == client.timeout
+
+
+def test_rate_limit_headers_pace_requests():
+    limited = {"X-RateLimit-Remaining": "1", "X-RateLimit-Reset": "1010"}
+    client, clock = make_client([FakeResponse(headers=limited), FakeResponse()])
+    client.get("https://api.github.com/gists/1")
+    client.get("https://api.github.com/gists/2")
+    assert clock.sleeps == [5.0]
+
+
+def test_exhausted_rate_limit_waits_for_reset_and_retries():
+    exhausted = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1030"}
+    client, clock = make_client([FakeResponse(403, headers=exhausted), FakeResponse(content=b"ok")])
+    assert client.get("https://api.github.com/gists/1").text == "ok"
+    assert clock.sleeps == [30.0]
+
+    client, _ = make_client([FakeResponse(403, headers=exhausted)], max_rate_limit_wait=10)
+    with pytest.raises(RateLimitError):
+        client.get("https://api.github.com/gists/1")
+
+
+def test_retries_server_errors_with_backoff():
+    statuses = [503, 502, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = statuses.pop(0)
+            body = b"# Deck" if status == 200 else b"busy"
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with HttpClient(backoff_factor=0.01) as client:
+            url = f"http://127.0.0.1:{server.server_port}/deck.md"
+            assert fetch_markdown(url, client=client) == "# Deck"
+        assert statuses == []
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_iter_markdown_streams_with_size_cap(tmp_path):
+    from md2pptx.cache import HttpCache
+    from md2pptx.fetcher import iter_markdown
+    from md2pptx.httpclient import ResponseTooLarge
+    from md2pptx.parser import iter_slides
+
+    deck = "\n\n---\n\n".join(f"# Слайд {n}\n\nТекст {n}" for n in range(50)).encode("utf-8")
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            requests_seen.append(self.path)
+            self.send_response(200)
+            self.send_header("Cache-Control", "max-age=60")
+            if self.path == "/chunked.md":
+                # Без Content-Length: размер проверяется по мере чтения
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for start in range(0, len(deck), 100):
+                    piece = deck[start:start + 100]
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self.send_header("Content-Length", str(len(deck)))
+                self.end_headers()
+                self.wfile.write(deck)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with HttpClient() as client:
+            chunks = list(iter_markdown(f"{base}/deck.md", client=client, chunk_size=7))
+            assert len(chunks) > 1
+            assert "".join(chunks) == deck.decode("utf-8")
+            slides = list(iter_slides(iter_markdown(f"{base}/chunked.md", client=client, chunk_size=7)))
+            assert [slide.title for slide in slides] == [f"Слайд {n}" for n in range(50)]
+
+            cache = HttpCache(tmp_path)
+            for _ in range(2):
+                assert "".join(iter_markdown(f"{base}/cached.md", client=client, cache=cache)) == deck.decode("utf-8")
+            # Исходник перепроверяется при каждой загрузке даже при свежей записи кэша
+            assert requests_seen.count("/cached.md") == 2
+
+        with HttpClient(max_bytes=len(deck) - 1) as client:
+            for path in ("/deck.md", "/chunked.md"):
+                with pytest.raises(ResponseTooLarge):
+                    list(iter_markdown(base + path, client=client))
+            with pytest.raises(ResponseTooLarge):
+                fetch_markdown(f"{base}/deck.md", client=client)
+    finally:
+        server.shutdown()
+        server.server_close()
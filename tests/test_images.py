@@ -0,0 +1,145 @@
+from pathlib import Path
+import sys
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from helpers import FakeResponse
+from md2pptx.cache import HttpCache
+from md2pptx.images import download_images
+from md2pptx.parser import parse_markdown
+
+
+def test_download_images_fetches_each_url_once(monkeypatch):
+    calls = []
+
+    def fake_get(session, url, **kwargs):
+        calls.append(url)
+        return FakeResponse(404 if "bad" in url else 200, b"img", url=url)
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    urls = ["https://x/a.png", "https://x/bad.png", "https://x/a.png"]
+    result = download_images(urls)
+
+    assert sorted(calls) == ["https://x/a.png", "https://x/bad.png"]
+    assert result["https://x/bad.png"] is None
+    assert Path(result["https://x/a.png"]).read_bytes() == b"img"
+
+
+def test_parse_markdown_skips_failed_remote_images(monkeypatch):
+    monkeypatch.setattr(
+        requests.Session, "get",
+        lambda session, url, **kwargs: FakeResponse(500 if "bad" in url else 200, b"img", url=url),
+    )
+    slides = parse_markdown("# S\n\n![ok](https://x/ok.png)\n\n![no](https://x/bad.png)")
+    images = [block for block in slides[0].blocks if hasattr(block, "src")]
+    assert [image.alt for image in images] == ["ok"]
+
+
+def test_image_cache_revalidates_with_etag(tmp_path, monkeypatch):
+    sent = []
+
+    def fake_get(session, url, headers=None, **kwargs):
+        sent.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return FakeResponse(304, url=url)
+        return FakeResponse(
+            200, b"img", url=url, headers={"ETag": '"v1"', "Cache-Control": "no-cache"}
+        )
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    cache = HttpCache(tmp_path)
+    first = download_images(["https://x/a.png"], cache=cache)["https://x/a.png"]
+    second = download_images(["https://x/a.png"], cache=cache)["https://x/a.png"]
+
+    assert first == second and Path(first).read_bytes() == b"img"
+    assert sent[1] == {"If-None-Match": '"v1"'}
+
+
+def test_fresh_cached_image_needs_no_request(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_get(session, url, **kwargs):
+        calls.append(url)
+        return FakeResponse(200, b"img", url=url, headers={"Cache-Control": "max-age=3600"})
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    cache = HttpCache(tmp_path)
+    download_images(["https://x/a.png"], cache=cache)
+    download_images(["https://x/a.png"], cache=cache)
+    assert calls == ["https://x/a.png"]
+
+
+def test_uncached_downloads_go_to_the_given_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        requests.Session, "get",
+        lambda session, url, **kwargs: FakeResponse(
+            200, b"img", url=url, headers={"Cache-Control": "no-store"}
+        ),
+    )
+    plain = download_images(["https://x/a.png"], folder=tmp_path / "build")
+    no_store = download_images(
+        ["https://x/b.png"], cache=HttpCache(tmp_path / "cache"), folder=tmp_path / "build"
+    )
+
+    assert Path(plain["https://x/a.png"]).parent == tmp_path / "build"
+    assert Path(no_store["https://x/b.png"]).parent == tmp_path / "build"
+    assert not (tmp_path / "cache" / "http" / "blobs").exists()
+
+
+def test_optimize_images_downscales_and_caches(tmp_path):
+    from PIL import Image
+
+    from md2pptx.images import ImageOptimizer, optimize_images
+    from md2pptx.models import ImageBlock, SlideModel
+
+    big = tmp_path / "big.jpg"
+    Image.new("RGB", (4000, 3000), (200, 30, 30)).save(big, quality=100)
+    slides = [SlideModel(title="S", blocks=[ImageBlock(src=str(big), alt="a")])]
+
+    first = optimize_images(slides, ImageOptimizer(dpi=100, cache_dir=tmp_path / "cache"))
+    out = first[0].blocks[0].src
+    with Image.open(out) as im:
+        assert im.size == (1000, 750)
+
+    second = optimize_images(slides, ImageOptimizer(dpi=100, cache_dir=tmp_path / "cache"))
+    assert second[0].blocks[0].src == out
+
+
+def test_optimizer_without_cache_dir_removes_temp_dir(tmp_path):
+    from PIL import Image
+
+    from md2pptx.images import ImageOptimizer
+
+    big = tmp_path / "big.jpg"
+    Image.new("RGB", (4000, 3000), (200, 30, 30)).save(big, quality=100)
+
+    with ImageOptimizer(dpi=100) as optimizer:
+        root = optimizer.root
+        out = optimizer.optimize(str(big))
+        assert Path(out).parent.parent == root
+        assert Path(out).exists()
+    assert not root.exists()
+
+
+def test_probe_image_reads_size_and_dpi_from_headers():
+    from io import BytesIO
+
+    from PIL import Image
+
+    from md2pptx.images import fit_size, probe_image
+
+    for fmt, kwargs, dpi in [
+        ("PNG", {"dpi": (144, 144)}, (144, 144)),
+        ("JPEG", {"dpi": (300, 150), "progressive": True}, (300, 150)),
+        ("GIF", {}, (72, 72)),
+    ]:
+        buffer = BytesIO()
+        Image.new("RGB", (320, 200)).save(buffer, fmt, **kwargs)
+        info = probe_image(buffer.getvalue())
+        assert (info.width, info.height, info.dpi) == (320, 200, dpi)
+    assert probe_image(b"not an image") is None
+
+    assert fit_size((4000, 2000), (1000, 1000)) == (1000, 500)
+    assert fit_size((100, 50), (1000, 1000)) == (100, 50)
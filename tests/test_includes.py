@@ -0,0 +1,69 @@
+from pathlib import Path
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx import includes
+from md2pptx.includes import IncludeError, IncludeResolver, find_includes
+
+
+def test_find_includes_skips_code_blocks(tmp_path):
+    text = "<!-- include: a.md -->\n```\n<!-- include: b.md -->\n```\n  <!--include:https://x.example/c.md-->"
+    base = str(tmp_path / "deck.md")
+    assert find_includes(text, base) == [
+        (0, str(tmp_path / "a.md")),
+        (4, "https://x.example/c.md"),
+    ]
+    assert find_includes("<!-- include: ../b.md -->", "https://x.example/a/deck.md") == [
+        (0, "https://x.example/b.md")
+    ]
+    with pytest.raises(IncludeError):
+        find_includes("<!-- include: b.md -->", "0123456789abcdef01234567")
+
+
+def test_resolver_expands_nested_includes_and_refetches_only_changes(tmp_path, monkeypatch):
+    (tmp_path / "parts").mkdir()
+    (tmp_path / "deck.md").write_text(
+        "# Deck\n\n<!-- include: parts/agenda.md -->\n\n---\n\n<!-- include: parts/footer.md -->\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "parts" / "agenda.md").write_text("- one\n<!-- include: item.md -->\n", encoding="utf-8")
+    (tmp_path / "parts" / "item.md").write_text("- two\n", encoding="utf-8")
+    (tmp_path / "parts" / "footer.md").write_text("<!-- include: https://x.example/legal.md -->", encoding="utf-8")
+
+    loaded = []
+    fetch_source = includes._fetch_source
+
+    def counting_fetch(source, client, cache, all_files=False, revalidate=True):
+        loaded.append(os.path.basename(source))
+        if source == "https://x.example/legal.md":
+            return "© Legal\n"
+        return fetch_source(source, client, cache, all_files, revalidate)
+
+    monkeypatch.setattr(includes, "_fetch_source", counting_fetch)
+    resolver = IncludeResolver()
+    deck = str(tmp_path / "deck.md")
+
+    expected = "# Deck\n\n- one\n- two\n\n---\n\n© Legal\n"
+    assert resolver.fetch(deck) == expected
+    assert sorted(loaded) == ["agenda.md", "deck.md", "footer.md", "item.md", "legal.md"]
+    assert resolver.dependencies(deck) == [
+        str(tmp_path / "parts" / name) for name in ("agenda.md", "item.md", "footer.md")
+    ] + ["https://x.example/legal.md"]
+
+    loaded.clear()
+    item = tmp_path / "parts" / "item.md"
+    item.write_text("- two, updated\n", encoding="utf-8")
+    os.utime(item, ns=(item.stat().st_atime_ns, item.stat().st_mtime_ns + 10**9))
+    assert resolver.fetch(deck) == expected.replace("- two", "- two, updated")
+    assert sorted(loaded) == ["item.md", "legal.md"]
+
+
+def test_include_cycles_are_reported(tmp_path):
+    (tmp_path / "a.md").write_text("<!-- include: b.md -->", encoding="utf-8")
+    (tmp_path / "b.md").write_text("<!-- include: a.md -->", encoding="utf-8")
+    with pytest.raises(IncludeError, match="cycle"):
+        IncludeResolver().fetch(str(tmp_path / "a.md"))
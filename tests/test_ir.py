@@ -0,0 +1,29 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx.ir import decode_ir, dump_ir, encode_ir, load_ir
+from md2pptx.models import DiagramRecord, ImageRecord, SlideRecord, TextRecord
+
+SLIDES = [
+    SlideRecord(title="Заголовок", blocks=[TextRecord(text="", bullets=["a", "б"]), TextRecord(text="p")]),
+    SlideRecord(title=None, blocks=[ImageRecord(src="https://x/a.png", alt="")], notes="n"),
+    SlideRecord(title="Схема", blocks=[DiagramRecord(code="A -> B")]),
+]
+
+
+@pytest.mark.parametrize("name", ["deck.m2pi", "deck.json"])
+def test_ir_round_trip(tmp_path, name):
+    path = tmp_path / name
+    dump_ir(SLIDES, path)
+    assert load_ir(path) == SLIDES
+
+
+def test_ir_rejects_unknown_version():
+    data = bytearray(encode_ir(SLIDES))
+    data[4] = 99
+    with pytest.raises(ValueError):
+        decode_ir(bytes(data))
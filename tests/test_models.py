@@ -0,0 +1,17 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx.models import (
+    ImageBlock, SlideModel, SlideRecord, TextBlock, TextRecord, to_models, to_records,
+)
+
+
+def test_records_round_trip_through_models():
+    slides = [SlideModel(title="T", blocks=[TextBlock(text="", bullets=["a"]), ImageBlock(src="x.png")])]
+    records = to_records(slides)
+    assert isinstance(records[0], SlideRecord)
+    assert records[0].blocks[0] == TextRecord(text="", bullets=["a"])
+    assert not hasattr(records[0].blocks[0], "__dict__")
+    assert to_models(records) == slides
@@ -3,10 +3,38 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from md2pptx.parser import parse_markdown
+from md2pptx.parser import iter_slides, parse_markdown
 
 
 def test_parse_simple():
     slides = parse_markdown("# Title\n\nContent")
     assert len(slides) == 1
     assert slides[0].title == "Title"
+
+
+def test_iter_slides_streams_chunks():
+    chunks = iter(["# One\n\nFirst", "\n--", "-\n# Two\n", "\nSecond\n---\n"])
+    slides = iter_slides(chunks)
+    first = next(slides)
+    assert first.title == "One"
+    assert [s.title for s in slides] == ["Two"]
+
+
+def test_iter_slides_matches_parse_markdown():
+    text = "# A\n\n- x\n- y\n---\n\nplain text\n---\n# C"
+    streamed = list(iter_slides(iter(text.splitlines(keepends=True))))
+    assert streamed == parse_markdown(text)
+
+
+def test_tree_engine_matches_html_engine():
+    text = (
+        "# Intro\n\nParagraph with *em* and `a < b & c`\n\n- one **two**\n- three\n"
+        "---\n**Bold title** tail\n\n1. first\n    - nested\n"
+        "---\nplain &copy; text <b>raw</b>\n\n![alt](missing.png)"
+    )
+    assert parse_markdown(text, engine="tree") == parse_markdown(text, engine="html")
+
+
+def test_parallel_parse_matches_serial():
+    text = "\n---\n".join(f"# Slide {n}\n\n- a{n}\n- b{n}\n\ntext {n}" for n in range(70))
+    assert parse_markdown(text, workers=2) == parse_markdown(text)
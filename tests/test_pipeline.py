@@ -0,0 +1,44 @@
+from pathlib import Path
+import sys
+from io import BytesIO
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pptx import Presentation
+
+from md2pptx import convert, convert_markdown
+
+MARKDOWN = "# First\n\nText\n\n---\n\n# Second\n\n- a\n- b\n"
+
+
+class WriteOnlyStream:
+    """Поток без seek/tell, как тело HTTP-ответа"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def test_convert_markdown_returns_bytes():
+    data = convert_markdown(MARKDOWN)
+    prs = Presentation(BytesIO(data))
+    assert [slide.shapes.title.text for slide in prs.slides] == ["First", "Second"]
+
+
+def test_convert_writes_to_any_binary_stream(tmp_path):
+    source = tmp_path / "deck.md"
+    source.write_text(MARKDOWN, encoding="utf-8")
+    expected = convert(str(source))
+
+    for streaming in (False, True):
+        stream = WriteOnlyStream()
+        assert convert(str(source), stream, streaming=streaming) is None
+        prs = Presentation(BytesIO(b"".join(stream.chunks)))
+        assert len(prs.slides) == 2
+    assert Presentation(BytesIO(expected)).slides[1].shapes.title.text == "Second"
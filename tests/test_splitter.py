@@ -0,0 +1,52 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from md2pptx import splitter
+from md2pptx.parser import parse_markdown, parse_slide
+from md2pptx.splitter import iter_line_parts, load_slide_index, read_slide, slide_offsets
+
+DECK = (
+    "---\ntitle: Deck\nauthor: me\n---\n"
+    "# One\n\n```yaml\na: 1\n---\nb: 2\n```\n"
+    "---\n\n---\n"
+    "# Two\n\n~~~~\n---\n~~~\n~~~~\n"
+    "---\n# Три\n"
+)
+
+
+def test_separators_inside_fences_and_front_matter_are_ignored():
+    parts = [DECK[start:end].strip() for start, end in slide_offsets(DECK)]
+    assert len(parts) == 3
+    assert parts[0].startswith("# One") and "b: 2" in parts[0]
+    assert list(iter_line_parts(DECK.split("\n"))) == parts
+    assert [s.title for s in parse_markdown(DECK)] == ["One", "Two", "Три"]
+
+
+def test_leading_separator_without_yaml_is_not_front_matter():
+    text = "---\n# One\n---\n# Two"
+    assert [s.title for s in parse_markdown(text)] == ["One", "Two"]
+
+
+def test_byte_index_is_reused_while_file_unchanged(tmp_path, monkeypatch):
+    deck = tmp_path / "deck.md"
+    deck.write_text(DECK, encoding="utf-8")
+    index = load_slide_index(deck, tmp_path / "cache")
+    assert read_slide(deck, 2, index) == "# Три"
+
+    monkeypatch.setattr(splitter, "build_slide_index", lambda path: [])
+    assert load_slide_index(deck, tmp_path / "cache") == index
+    assert parse_slide(deck, 1, cache_dir=tmp_path / "cache").title == "Two"
+
+
+def test_leading_slide_with_key_value_line_is_not_front_matter(capsys):
+    text = "---\nAgenda: today\n\n- item1\n- item2\n---\n# Two"
+    first, second = parse_markdown(text)
+    assert first.blocks[0].bullets == ["item1", "item2"] and second.title == "Two"
+    assert list(iter_line_parts(text.split("\n")))[0].startswith("Agenda: today")
+    assert "front matter" not in capsys.readouterr().out
+
+    front_matter = "---\ntitle: Deck\ntags:\n- a\n- b\nnotes: |\n  long\n---\n# One"
+    assert [s.title for s in parse_markdown(front_matter)] == ["One"]
+    assert "front matter" in capsys.readouterr().out
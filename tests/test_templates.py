@@ -0,0 +1,66 @@
+from pathlib import Path
+import sys
+import zipfile
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pptx.enum.shapes import PP_PLACEHOLDER
+
+from md2pptx.builder import build_presentation
+from md2pptx.models import SlideModel, TextBlock
+from md2pptx.templates import LayoutIndex, TemplatePool
+
+
+def test_layout_index():
+    pool = TemplatePool()
+    index = pool.get().index
+    assert index.title.position == 0
+    assert index.content.name == "Title and Content"
+    assert index.content.body_idx == 1
+    assert index.get("Blank").body_idx is None
+    assert index.get("Title Only") in index.with_placeholder(PP_PLACEHOLDER.TITLE)
+
+
+def test_layout_index_picks_layouts_by_placeholders():
+    from pptx import Presentation
+
+    prs = Presentation()
+    # Переставляем "Title Slide" и "Title and Content" в конец списка макетов
+    id_list = prs.slide_master._element.get_or_add_sldLayoutIdLst()
+    for entry in list(id_list)[:2]:
+        id_list.remove(entry)
+        id_list.append(entry)
+    index = LayoutIndex(prs)
+    assert index.layouts[0].name == "Section Header"
+    assert index.title.name == "Title Slide"
+    assert index.content.name == "Title and Content"
+    assert index.content.body_idx == 1
+
+
+def test_pool_loads_once_and_clones_are_independent():
+    pool = TemplatePool()
+    assert pool.get() is pool.get()
+    first, _ = pool.acquire()
+    second, _ = pool.acquire()
+    first.slides.add_slide(first.slide_layouts[1])
+    assert len(first.slides) == 1
+    assert len(second.slides) == 0
+    assert len(pool) == 1
+
+
+def test_pooled_build_matches_regular_build(tmp_path):
+    slides = [
+        SlideModel(title=f"S{n}", blocks=[TextBlock(text="t", bullets=["a", "b"])], notes="n")
+        for n in range(3)
+    ]
+    pool = TemplatePool()
+    regular, pooled, again = tmp_path / "a.pptx", tmp_path / "b.pptx", tmp_path / "c.pptx"
+    build_presentation(slides, regular)
+    build_presentation(slides, pooled, pool=pool)
+    build_presentation(slides, again, pool=pool)
+
+    with zipfile.ZipFile(regular) as a:
+        expected = {name: a.read(name) for name in a.namelist()}
+    for out in (pooled, again):
+        with zipfile.ZipFile(out) as b:
+            assert {name: b.read(name) for name in b.namelist()} == expected